@@ -8,6 +8,84 @@ class Settings:
     # Configurações do MongoDB (mantidas para compatibilidade)
     MONGODB_URL: str = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
     DATABASE_NAME: str = os.getenv("DATABASE_NAME", "rotafacil")
+
+    # Timeouts, reconexão e circuit breaker do cliente MongoDB
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "2000"))
+    MONGODB_CONNECT_TIMEOUT_MS: int = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "2000"))
+    MONGODB_SOCKET_TIMEOUT_MS: int = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", "20000"))
+    MONGODB_PING_TIMEOUT_MS: int = int(os.getenv("MONGODB_PING_TIMEOUT_MS", "2000"))
+    MONGODB_HEALTHCHECK_INTERVALO_S: float = float(os.getenv("MONGODB_HEALTHCHECK_INTERVALO_S", "5"))
+    MONGODB_RECONNECT_BASE_S: float = float(os.getenv("MONGODB_RECONNECT_BASE_S", "0.5"))
+    MONGODB_RECONNECT_MAX_S: float = float(os.getenv("MONGODB_RECONNECT_MAX_S", "30"))
+    MONGODB_CIRCUIT_LIMITE_FALHAS: int = int(os.getenv("MONGODB_CIRCUIT_LIMITE_FALHAS", "3"))
+
+    # Orçamentos de tempo (maxTimeMS) dos relatórios
+    ORCAMENTO_VIAGENS_PERIODO_MS: int = int(os.getenv("ORCAMENTO_VIAGENS_PERIODO_MS", "5000"))
+    ORCAMENTO_ESTATISTICAS_VEICULOS_MS: int = int(os.getenv("ORCAMENTO_ESTATISTICAS_VEICULOS_MS", "5000"))
+    ORCAMENTO_VIAGENS_ALUNO_MS: int = int(os.getenv("ORCAMENTO_VIAGENS_ALUNO_MS", "3000"))
+
+    # Log de consultas lentas
+    CONSULTA_LENTA_LIMIAR_MS: int = int(os.getenv("CONSULTA_LENTA_LIMIAR_MS", "100"))
+    CONSULTA_LENTA_BUFFER: int = int(os.getenv("CONSULTA_LENTA_BUFFER", "200"))
+    CONSULTA_LENTA_EXPLAIN: bool = os.getenv("CONSULTA_LENTA_EXPLAIN", "true").lower() == "true"
+    CONSULTA_LENTA_INTERVALO_EXPLAIN_S: float = float(os.getenv("CONSULTA_LENTA_INTERVALO_EXPLAIN_S", "60"))
+
+    # Server-Timing: fração das requisições medidas sem o cabeçalho X-Server-Timing
+    SERVER_TIMING_AMOSTRAGEM: float = float(os.getenv("SERVER_TIMING_AMOSTRAGEM", "0"))
+
+    # Profiler estatístico sob demanda
+    PERFIL_INTERVALO_MS: float = float(os.getenv("PERFIL_INTERVALO_MS", "5"))
+    PERFIL_CAPACIDADE: int = int(os.getenv("PERFIL_CAPACIDADE", "50"))
+
+    # Monitor de atraso do event loop e detector de bloqueios
+    LOOP_MONITOR_INTERVALO_MS: float = float(os.getenv("LOOP_MONITOR_INTERVALO_MS", "50"))
+    LOOP_BLOQUEIO_LIMIAR_MS: float = float(os.getenv("LOOP_BLOQUEIO_LIMIAR_MS", "100"))
+    LOOP_BLOQUEIO_BUFFER: int = int(os.getenv("LOOP_BLOQUEIO_BUFFER", "100"))
+
+    # Logging estruturado (JSON) via fila
+    LOG_NIVEL: str = os.getenv("LOG_NIVEL", "INFO").upper()
+    LOG_FILA_CAPACIDADE: int = int(os.getenv("LOG_FILA_CAPACIDADE", "10000"))
+    LOG_ACESSO_AMOSTRAGEM: float = float(os.getenv("LOG_ACESSO_AMOSTRAGEM", "1"))
+
+    # Posições GPS dos veículos (memória + trajeto reduzido no MongoDB)
+    POSICAO_HISTORICO: int = int(os.getenv("POSICAO_HISTORICO", "120"))
+    POSICAO_MAX_VIAGENS: int = int(os.getenv("POSICAO_MAX_VIAGENS", "20000"))
+    POSICAO_AMOSTRAGEM_TRAJETO_S: float = float(os.getenv("POSICAO_AMOSTRAGEM_TRAJETO_S", "15"))
+    POSICAO_PERSISTENCIA_INTERVALO_S: float = float(os.getenv("POSICAO_PERSISTENCIA_INTERVALO_S", "10"))
+    POSICAO_TTL_S: float = float(os.getenv("POSICAO_TTL_S", "10800"))
+
+    # Eventos das viagens em tempo real (WebSocket / SSE)
+    # "memoria" entrega só no próprio processo; "mongo" difunde entre workers por uma coleção capped
+    EVENTOS_BARRAMENTO: str = os.getenv("EVENTOS_BARRAMENTO", "memoria")
+    EVENTOS_COLECAO_TAMANHO_MB: int = int(os.getenv("EVENTOS_COLECAO_TAMANHO_MB", "16"))
+    EVENTOS_MAX_ASSINANTES: int = int(os.getenv("EVENTOS_MAX_ASSINANTES", "10000"))
+    EVENTOS_FILA_ASSINANTE: int = int(os.getenv("EVENTOS_FILA_ASSINANTE", "256"))
+    EVENTOS_HEARTBEAT_S: float = float(os.getenv("EVENTOS_HEARTBEAT_S", "15"))
+
+    # Manifesto diário do motorista (documento pré-calculado por motorista e dia)
+    MANIFESTO_DIAS_ANTECEDENCIA: int = int(os.getenv("MANIFESTO_DIAS_ANTECEDENCIA", "1"))
+    MANIFESTO_INTERVALO_S: float = float(os.getenv("MANIFESTO_INTERVALO_S", "900"))
+    MANIFESTO_JANELA_ALUNOS_DIAS: int = int(os.getenv("MANIFESTO_JANELA_ALUNOS_DIAS", "14"))
+
+    # Geração da escala recorrente de viagens
+    ESCALA_LOTE_TAMANHO: int = int(os.getenv("ESCALA_LOTE_TAMANHO", "1000"))
+
+    # Ocupação das viagens (contadores de embarque x capacidade do veículo)
+    OCUPACAO_RECONCILIACAO_S: float = float(os.getenv("OCUPACAO_RECONCILIACAO_S", "300"))
+    # Dias anteriores a hoje recalculados em cada passada (eventos reaplicados do spool após uma queda)
+    OCUPACAO_RECONCILIACAO_DIAS: int = int(os.getenv("OCUPACAO_RECONCILIACAO_DIAS", "3"))
+
+    # Relatórios exportados em fluxo (CSV / NDJSON)
+    RELATORIO_LOTE_TAMANHO: int = int(os.getenv("RELATORIO_LOTE_TAMANHO", "1000"))
+    RELATORIO_VIAGENS_POR_BLOCO: int = int(os.getenv("RELATORIO_VIAGENS_POR_BLOCO", "200"))
+
+    # Exportação colunar (Parquet / Arrow IPC) particionada por mês; requer pyarrow
+    EXPORTACAO_DIR: str = os.getenv("EXPORTACAO_DIR", "exportacao")
+    EXPORTACAO_FORMATO: str = os.getenv("EXPORTACAO_FORMATO", "parquet")
+    EXPORTACAO_COMPRESSAO: str = os.getenv("EXPORTACAO_COMPRESSAO", "zstd")
+    EXPORTACAO_LINHAS_POR_GRUPO: int = int(os.getenv("EXPORTACAO_LINHAS_POR_GRUPO", "100000"))
+    EXPORTACAO_MESES_ABERTOS: int = int(os.getenv("EXPORTACAO_MESES_ABERTOS", "1"))
+    EXPORTACAO_MARGEM_S: float = float(os.getenv("EXPORTACAO_MARGEM_S", "300"))
     
     # Configurações do SQLite
     SQLITE_DATABASE_URL: str = os.getenv("SQLITE_DATABASE_URL", "sqlite:///./rotafacil.db")
@@ -22,5 +100,20 @@ class Settings:
     SECRET_KEY: str = os.getenv("SECRET_KEY", "uma_chave_padrao_apenas_para_dev_nao_usar_em_producao")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_HOURS: int = 24
+    # E-mails (separados por vírgula) que recebem permissões de administrador no token
+    ADMIN_EMAILS: set = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
+
+    # Configurações da ingestão de frequências (write-behind)
+    FREQUENCIA_LOTE_TAMANHO: int = int(os.getenv("FREQUENCIA_LOTE_TAMANHO", "500"))
+    FREQUENCIA_LOTE_INTERVALO_MS: int = int(os.getenv("FREQUENCIA_LOTE_INTERVALO_MS", "200"))
+    FREQUENCIA_FILA_CAPACIDADE: int = int(os.getenv("FREQUENCIA_FILA_CAPACIDADE", "50000"))
+    # Tentativas de um evento rejeitado pelo banco antes de ir para o spool de rejeitados
+    FREQUENCIA_MAX_TENTATIVAS: int = int(os.getenv("FREQUENCIA_MAX_TENTATIVAS", "5"))
+
+    # Configurações do spool local usado quando o MongoDB está indisponível
+    SPOOL_DIR: str = os.getenv("SPOOL_DIR", "./spool")
+    SPOOL_FSYNC_INTERVALO_MS: int = int(os.getenv("SPOOL_FSYNC_INTERVALO_MS", "50"))
+    SPOOL_REPLAY_INTERVALO_S: float = float(os.getenv("SPOOL_REPLAY_INTERVALO_S", "5"))
+    SPOOL_REPLAY_LOTE: int = int(os.getenv("SPOOL_REPLAY_LOTE", "1000"))
 
 settings = Settings() 
\ No newline at end of file
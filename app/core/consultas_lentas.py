@@ -0,0 +1,187 @@
+"""
+Log de consultas lentas com captura automática de ``explain``.
+
+Um ``CommandListener`` observa as consultas enviadas ao MongoDB. Quando
+uma delas passa do limiar configurado, registra o formato do filtro (com
+os valores ocultos), o endpoint que a originou e a duração em um buffer
+circular limitado. Em seguida agenda, no event loop, um
+``explain("executionStats")`` do mesmo comando para resumir o plano
+escolhido, as chaves e os documentos examinados. Cada formato de
+consulta é explicado no máximo uma vez por intervalo, para que uma
+rajada de consultas lentas não gere uma rajada de explains.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from pymongo import monitoring
+
+from .config import settings
+from .contexto import endpoint_atual
+
+COMANDOS_MONITORADOS = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+
+# Campos de sessão/cluster que não podem ir para o comando de explain
+CAMPOS_INTERNOS = {"lsid", "$db", "$clusterTime", "$readPreference", "txnNumber",
+                   "autocommit", "startTransaction", "readConcern", "writeConcern", "comment"}
+
+CAMPOS_FILTRO = ("filter", "query", "pipeline", "updates", "deletes")
+
+# Formatos de consulta lembrados para limitar os explains (LRU)
+MAX_FORMATOS_CONHECIDOS = 1000
+
+
+def ocultar_valores(valor: Any) -> Any:
+    """Mantém a estrutura (campos e operadores) e substitui os valores por '?'"""
+    if isinstance(valor, dict):
+        return {chave: ocultar_valores(v) for chave, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        if valor and all(isinstance(item, dict) for item in valor):
+            return [ocultar_valores(item) for item in valor]
+        return ["?"] if valor else []
+    return "?"
+
+
+def _resumir_plano(estagio: Optional[Dict[str, Any]]) -> str:
+    """Resume a árvore do plano vencedor, ex.: 'FETCH > IXSCAN {motorista_id: 1}'"""
+    partes = []
+    while estagio:
+        nome = estagio.get("stage", "?")
+        if "keyPattern" in estagio:
+            chaves = ", ".join(f"{k}: {v}" for k, v in estagio["keyPattern"].items())
+            nome += f" {{{chaves}}}"
+        partes.append(nome)
+        estagio = estagio.get("inputStage") or (estagio.get("inputStages") or [None])[0]
+    return " > ".join(partes) or "?"
+
+
+def _buscar(documento: Any, chave: str) -> Optional[Dict[str, Any]]:
+    """Busca recursivamente a primeira ocorrência de ``chave`` no explain"""
+    if isinstance(documento, dict):
+        if chave in documento:
+            return documento[chave]
+        valores = documento.values()
+    elif isinstance(documento, list):
+        valores = documento
+    else:
+        return None
+    for valor in valores:
+        encontrado = _buscar(valor, chave)
+        if encontrado is not None:
+            return encontrado
+    return None
+
+
+def resumir_explain(explain: Dict[str, Any]) -> Dict[str, Any]:
+    """Extrai plano, chaves examinadas e documentos examinados de um explain"""
+    planner = _buscar(explain, "queryPlanner") or {}
+    estatisticas = _buscar(explain, "executionStats") or {}
+    plano = planner.get("winningPlan", {})
+    # Consultas em SBE guardam o plano em winningPlan.queryPlan
+    plano = plano.get("queryPlan", plano)
+    return {
+        "plano": _resumir_plano(plano),
+        "chaves_examinadas": estatisticas.get("totalKeysExamined"),
+        "documentos_examinados": estatisticas.get("totalDocsExamined"),
+        "documentos_retornados": estatisticas.get("nReturned"),
+        "tempo_execucao_ms": estatisticas.get("executionTimeMillis"),
+    }
+
+
+class ConsultasLentas(monitoring.CommandListener):
+    def __init__(self,
+                 limiar_ms: int = settings.CONSULTA_LENTA_LIMIAR_MS,
+                 capacidade: int = settings.CONSULTA_LENTA_BUFFER,
+                 explain: bool = settings.CONSULTA_LENTA_EXPLAIN,
+                 intervalo_explain_s: float = settings.CONSULTA_LENTA_INTERVALO_EXPLAIN_S):
+        self.limiar_micros = limiar_ms * 1000
+        self.explain = explain
+        self.intervalo_explain = intervalo_explain_s
+        self.registros: deque = deque(maxlen=capacidade)
+        self._comandos: Dict[Any, Any] = {}
+        self._ultimo_explain: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client = None
+
+    def configurar(self, loop: asyncio.AbstractEventLoop, client):
+        """Define o event loop e o cliente usados para executar os explains"""
+        self._loop = loop
+        self._client = client
+
+    # ---------- CommandListener ----------
+    def started(self, event):
+        if event.command_name not in COMANDOS_MONITORADOS:
+            return
+        with self._lock:
+            self._comandos[(event.connection_id, event.request_id)] = (event.command, endpoint_atual())
+
+    def _retirar(self, event):
+        with self._lock:
+            return self._comandos.pop((event.connection_id, event.request_id), None)
+
+    def succeeded(self, event):
+        if event.command_name not in COMANDOS_MONITORADOS:
+            return
+        dados = self._retirar(event)
+        if dados is None or event.duration_micros < self.limiar_micros:
+            return
+        self._registrar(event, *dados)
+
+    def failed(self, event):
+        if event.command_name not in COMANDOS_MONITORADOS:
+            return
+        dados = self._retirar(event)
+        if dados is None or event.duration_micros < self.limiar_micros:
+            return
+        self._registrar(event, *dados)
+
+    # ---------- registro ----------
+    def _registrar(self, event, comando, endpoint: str):
+        colecao = comando.get(event.command_name)
+        formato = {campo: ocultar_valores(comando[campo]) for campo in CAMPOS_FILTRO if campo in comando}
+        registro = {
+            "data_hora": datetime.now(timezone.utc).isoformat(),
+            "endpoint": endpoint,
+            "colecao": colecao if isinstance(colecao, str) else None,
+            "comando": event.command_name,
+            "duracao_ms": round(event.duration_micros / 1000, 2),
+            "formato": formato,
+            "explain": None,
+        }
+        self.registros.append(registro)
+
+        chave = f"{event.database_name}.{registro['colecao']}.{event.command_name}.{formato}"
+        agora = time.monotonic()
+        with self._lock:
+            if agora - self._ultimo_explain.get(chave, 0) < self.intervalo_explain:
+                return
+            self._ultimo_explain[chave] = agora
+            self._ultimo_explain.move_to_end(chave)
+            if len(self._ultimo_explain) > MAX_FORMATOS_CONHECIDOS:
+                self._ultimo_explain.popitem(last=False)
+        if self.explain and self._loop is not None and event.command_name in ("find", "aggregate", "count", "distinct"):
+            comando_explain = {k: v for k, v in comando.items() if k not in CAMPOS_INTERNOS}
+            asyncio.run_coroutine_threadsafe(
+                self._explicar(registro, event.database_name, comando_explain), self._loop
+            )
+
+    async def _explicar(self, registro: Dict[str, Any], database_name: str, comando: Dict[str, Any]):
+        try:
+            resultado = await self._client[database_name].command(
+                {"explain": comando, "verbosity": "executionStats"}
+            )
+            registro["explain"] = resumir_explain(resultado)
+        except Exception as e:
+            registro["explain"] = {"erro": str(e)}
+
+    def listar(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Registros mais recentes primeiro"""
+        return list(reversed(self.registros))[:limit]
+
+
+consultas_lentas = ConsultasLentas()
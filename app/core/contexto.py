@@ -0,0 +1,105 @@
+"""
+Contexto da requisição HTTP corrente.
+
+O middleware guarda em uma ``ContextVar`` o ``scope`` ASGI, o request id
+e o tempo acumulado no MongoDB; como o Motor copia o contexto ao executar
+operações na thread do driver, os listeners do pymongo conseguem saber
+qual requisição originou cada comando. Ao final, o middleware emite o log
+de acesso estruturado.
+"""
+
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+
+from pymongo import monitoring
+
+from .logs import registrar_acesso
+
+CABECALHO_REQUEST_ID = b"x-request-id"
+
+
+class ContextoRequisicao:
+    def __init__(self, scope: dict, request_id: str):
+        self.scope = scope
+        self.request_id = request_id
+        self.mongo_ms = 0.0
+        self.mongo_comandos = 0
+        self._lock = threading.Lock()
+
+    def adicionar_mongo(self, duracao_ms: float):
+        with self._lock:
+            self.mongo_ms += duracao_ms
+            self.mongo_comandos += 1
+
+    def rota(self) -> str:
+        """Template da rota (ex.: /api/v1/rotas/{rota_id}) ou o caminho bruto"""
+        rota = self.scope.get("route")
+        return getattr(rota, "path", None) or self.scope.get("path", "-")
+
+
+contexto_atual: ContextVar[Optional[ContextoRequisicao]] = ContextVar("contexto_atual", default=None)
+
+
+def endpoint_atual() -> str:
+    """Endpoint da requisição corrente (método + template da rota)"""
+    contexto = contexto_atual.get()
+    if contexto is None:
+        return "-"
+    return f"{contexto.scope.get('method', '-')} {contexto.rota()}"
+
+
+class ContextoMongoListener(monitoring.CommandListener):
+    """Soma no contexto da requisição o tempo gasto em comandos do MongoDB"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        contexto = contexto_atual.get()
+        if contexto is not None:
+            contexto.adicionar_mongo(event.duration_micros / 1000)
+
+    def failed(self, event):
+        self.succeeded(event)
+
+
+def _request_id(scope) -> str:
+    """Reaproveita o X-Request-ID do cliente/proxy ou gera um novo"""
+    for nome, valor in scope.get("headers", []):
+        if nome == CABECALHO_REQUEST_ID and 0 < len(valor) <= 128:
+            return valor.decode("latin-1")
+    return uuid.uuid4().hex
+
+
+class ContextoRequisicaoMiddleware:
+    """Middleware ASGI que publica o contexto da requisição e registra o acesso"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        contexto = ContextoRequisicao(scope, _request_id(scope))
+        token = contexto_atual.set(contexto)
+        inicio = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((CABECALHO_REQUEST_ID, contexto.request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            registrar_acesso(contexto, status, (time.perf_counter() - inicio) * 1000)
+            contexto_atual.reset(token)
@@ -0,0 +1,163 @@
+"""
+Logging estruturado (JSON) e não bloqueante.
+
+Os handlers da aplicação apenas colocam o registro em uma fila limitada
+(``QueueHandler``); a formatação JSON e a escrita em stdout acontecem em
+uma thread separada (``QueueListener``). Se a fila encher, o registro é
+descartado e contado, em vez de bloquear o event loop.
+
+Os logs de acesso incluem request id, rota, status, duração e tempo no
+MongoDB. Requisições bem-sucedidas podem ser amostradas
+(``LOG_ACESSO_AMOSTRAGEM``); erros (status >= 400) são sempre registrados.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+from prometheus_client import Counter
+
+from .config import settings
+
+LOGS_DESCARTADOS = Counter("log_records_dropped_total", "Registros de log descartados com a fila cheia")
+
+CAMPOS_PADRAO = set(vars(logging.LogRecord("", 0, "", 0, "", (), None)).keys()) | {"message", "asctime"}
+
+access_logger = logging.getLogger("rotafacil.acesso")
+LOGGERS_UVICORN = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+_listener = None
+_estado_anterior = None
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        dados = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for chave, valor in vars(record).items():
+            if chave not in CAMPOS_PADRAO and not chave.startswith("_"):
+                dados[chave] = valor
+        if record.exc_info:
+            dados["exc"] = self.formatException(record.exc_info)
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class ContextoFilter(logging.Filter):
+    """Anexa o request id da requisição corrente (capturado na thread de origem)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        from .contexto import contexto_atual
+        if not hasattr(record, "request_id"):
+            contexto = contexto_atual.get()
+            if contexto is not None:
+                record.request_id = contexto.request_id
+        return True
+
+
+class QueueHandlerSemBloqueio(logging.handlers.QueueHandler):
+    """QueueHandler que descarta o registro quando a fila está cheia"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve a mensagem e a exceção agora; o JSON é montado na thread do listener
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc = record.exc_text
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOGS_DESCARTADOS.inc()
+
+
+def configurar_logging():
+    """
+    Direciona todos os logs (inclusive do uvicorn) para a fila JSON.
+
+    Chamado na inicialização do servidor (lifespan), não na importação:
+    scripts e testes que importam ``main`` mantêm a configuração própria.
+    """
+    global _listener, _estado_anterior
+    if _listener is not None:
+        return
+
+    raiz = logging.getLogger()
+    _estado_anterior = (
+        raiz.handlers[:], raiz.level,
+        {nome: (logging.getLogger(nome).handlers[:], logging.getLogger(nome).propagate,
+                logging.getLogger(nome).disabled) for nome in LOGGERS_UVICORN},
+    )
+
+    fila = queue.Queue(maxsize=settings.LOG_FILA_CAPACIDADE)
+    saida = logging.StreamHandler(sys.stdout)
+    saida.setFormatter(JSONFormatter())
+    _listener = logging.handlers.QueueListener(fila, saida, respect_handler_level=False)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    handler = QueueHandlerSemBloqueio(fila)
+    handler.addFilter(ContextoFilter())
+
+    raiz.handlers = [handler]
+    raiz.setLevel(settings.LOG_NIVEL)
+
+    # O log de acesso do uvicorn é substituído pelo middleware de contexto
+    for nome in LOGGERS_UVICORN:
+        logger_uvicorn = logging.getLogger(nome)
+        logger_uvicorn.handlers = []
+        logger_uvicorn.propagate = True
+    logging.getLogger("uvicorn.access").disabled = True
+
+
+def encerrar_logging():
+    """Esvazia a fila JSON e restaura a configuração de logging anterior"""
+    global _listener, _estado_anterior
+    if _listener is None:
+        return
+    handlers, nivel, uvicorn = _estado_anterior
+    raiz = logging.getLogger()
+    raiz.handlers = handlers
+    raiz.setLevel(nivel)
+    for nome, (handlers_uvicorn, propagate, disabled) in uvicorn.items():
+        logger_uvicorn = logging.getLogger(nome)
+        logger_uvicorn.handlers = handlers_uvicorn
+        logger_uvicorn.propagate = propagate
+        logger_uvicorn.disabled = disabled
+    atexit.unregister(_listener.stop)
+    _listener.stop()
+    _listener = None
+    _estado_anterior = None
+
+
+def registrar_acesso(contexto, status: int, duracao_ms: float):
+    """Registra a requisição concluída, amostrando as bem-sucedidas"""
+    if status < 400 and random.random() >= settings.LOG_ACESSO_AMOSTRAGEM:
+        return
+    nivel = logging.ERROR if status >= 500 else logging.WARNING if status >= 400 else logging.INFO
+    access_logger.log(
+        nivel,
+        "requisicao",
+        extra={
+            "request_id": contexto.request_id,
+            "metodo": contexto.scope.get("method"),
+            "rota": contexto.rota(),
+            "caminho": contexto.scope.get("path"),
+            "status": status,
+            "duracao_ms": round(duracao_ms, 2),
+            "db_ms": round(contexto.mongo_ms, 2),
+            "db_comandos": contexto.mongo_comandos,
+        }
+    )
@@ -0,0 +1,184 @@
+"""
+Métricas Prometheus da API.
+
+- Comandos do MongoDB (via ``CommandListener`` do pymongo): duração por
+  coleção e operação, e contagem de falhas.
+- Pool de conexões (via ``ConnectionPoolListener``): tempo de espera no
+  checkout e conexões em uso.
+- Requisições HTTP (middleware ASGI): latência por rota, requisições em
+  andamento e erros.
+
+Os listeners do pymongo rodam na thread do driver e apenas atualizam
+contadores em memória, mantendo o custo baixo o bastante para produção.
+"""
+
+import threading
+import time
+
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from pymongo import monitoring
+
+BUCKETS_MONGO = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_HTTP = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+MONGO_COMANDO_DURACAO = Histogram(
+    "mongo_command_duration_seconds",
+    "Duração dos comandos enviados ao MongoDB",
+    ["collection", "command"],
+    buckets=BUCKETS_MONGO
+)
+MONGO_COMANDO_FALHAS = Counter(
+    "mongo_command_failures_total",
+    "Comandos do MongoDB que falharam",
+    ["collection", "command"]
+)
+MONGO_POOL_ESPERA = Histogram(
+    "mongo_pool_wait_seconds",
+    "Tempo de espera para obter uma conexão do pool",
+    buckets=BUCKETS_MONGO
+)
+MONGO_POOL_EM_USO = Gauge(
+    "mongo_pool_connections_in_use",
+    "Conexões do pool atualmente em uso"
+)
+MONGO_POOL_CHECKOUT_FALHAS = Counter(
+    "mongo_pool_checkout_failures_total",
+    "Falhas ao obter conexão do pool",
+    ["reason"]
+)
+HTTP_DURACAO = Histogram(
+    "http_request_duration_seconds",
+    "Latência das requisições HTTP por rota",
+    ["method", "route", "status"],
+    buckets=BUCKETS_HTTP
+)
+HTTP_EM_ANDAMENTO = Gauge(
+    "http_requests_in_flight",
+    "Requisições HTTP em andamento",
+    ["method"]
+)
+HTTP_ERROS = Counter(
+    "http_request_errors_total",
+    "Requisições HTTP com status 5xx ou exceção não tratada",
+    ["method", "route", "status"]
+)
+
+# Comandos de handshake/monitoramento que não interessam nas métricas
+COMANDOS_IGNORADOS = {"hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue", "endSessions"}
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Registra duração e falhas dos comandos por coleção e operação"""
+
+    def __init__(self):
+        self._colecoes = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name in COMANDOS_IGNORADOS:
+            return
+        colecao = event.command.get(event.command_name)
+        if not isinstance(colecao, str):
+            colecao = "-"
+        with self._lock:
+            self._colecoes[(event.connection_id, event.request_id)] = colecao
+
+    def _colecao(self, event) -> str:
+        with self._lock:
+            return self._colecoes.pop((event.connection_id, event.request_id), "-")
+
+    def succeeded(self, event):
+        if event.command_name in COMANDOS_IGNORADOS:
+            return
+        MONGO_COMANDO_DURACAO.labels(self._colecao(event), event.command_name).observe(
+            event.duration_micros / 1_000_000
+        )
+
+    def failed(self, event):
+        if event.command_name in COMANDOS_IGNORADOS:
+            return
+        colecao = self._colecao(event)
+        MONGO_COMANDO_DURACAO.labels(colecao, event.command_name).observe(event.duration_micros / 1_000_000)
+        MONGO_COMANDO_FALHAS.labels(colecao, event.command_name).inc()
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Mede a espera no checkout e as conexões em uso"""
+
+    # O checkout começa e termina na mesma thread do driver
+    _local = threading.local()
+
+    def connection_check_out_started(self, event):
+        self._local.inicio = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        inicio = getattr(self._local, "inicio", None)
+        if inicio is not None:
+            MONGO_POOL_ESPERA.observe(time.perf_counter() - inicio)
+            self._local.inicio = None
+        MONGO_POOL_EM_USO.inc()
+
+    def connection_check_out_failed(self, event):
+        self._local.inicio = None
+        MONGO_POOL_CHECKOUT_FALHAS.labels(str(event.reason)).inc()
+
+    def connection_checked_in(self, event):
+        MONGO_POOL_EM_USO.dec()
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_created(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_closed(self, event): pass
+
+
+def mongo_event_listeners() -> list:
+    """Listeners a registrar no ``AsyncIOMotorClient``"""
+    return [MongoCommandMetrics(), MongoPoolMetrics()]
+
+
+def _rota(scope) -> str:
+    # Usa o template da rota (/rotas/{rota_id}) para não explodir a cardinalidade
+    rota = scope.get("route")
+    return getattr(rota, "path", None) or "nao_encontrada"
+
+
+class PrometheusMiddleware:
+    """Middleware ASGI de latência, requisições em andamento e erros"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        metodo = scope["method"]
+        status = {"codigo": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["codigo"] = message["status"]
+            await send(message)
+
+        em_andamento = HTTP_EM_ANDAMENTO.labels(metodo)
+        em_andamento.inc()
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duracao = time.perf_counter() - inicio
+            em_andamento.dec()
+            rota = _rota(scope)
+            codigo = str(status["codigo"])
+            HTTP_DURACAO.labels(metodo, rota, codigo).observe(duracao)
+            if status["codigo"] >= 500:
+                HTTP_ERROS.labels(metodo, rota, codigo).inc()
+
+
+def gerar_metricas():
+    """Retorna (conteúdo, content-type) no formato texto do Prometheus"""
+    return generate_latest(), CONTENT_TYPE_LATEST
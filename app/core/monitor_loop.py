@@ -0,0 +1,108 @@
+"""
+Monitor de atraso do event loop e detector de chamadas bloqueantes.
+
+Uma tarefa no próprio loop acorda a cada ``intervalo`` e mede quanto
+acordou atrasada (lag de agendamento), atualizando um "batimento".
+Uma thread de vigilância verifica o batimento: se o loop ficar sem
+bater por mais que o limiar, captura a pilha da thread do loop — ou
+seja, o callback que está bloqueando — e, quando o loop volta, registra
+a duração total do bloqueio. Tudo é exportado como métricas Prometheus
+e os bloqueios recentes ficam em um buffer circular.
+"""
+
+import asyncio
+import threading
+import time
+import sys
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from .config import settings
+from .profiler import pilha_thread
+
+LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "Atraso de agendamento do event loop",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+LOOP_LAG_ATUAL = Gauge("event_loop_lag_current_seconds", "Último atraso medido do event loop")
+LOOP_BLOQUEIOS = Counter("event_loop_blocking_total", "Bloqueios do event loop acima do limiar")
+LOOP_BLOQUEIO_DURACAO = Histogram(
+    "event_loop_blocking_duration_seconds",
+    "Duração dos bloqueios do event loop",
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+
+class MonitorLoop:
+    def __init__(self,
+                 intervalo_ms: float = settings.LOOP_MONITOR_INTERVALO_MS,
+                 limiar_bloqueio_ms: float = settings.LOOP_BLOQUEIO_LIMIAR_MS,
+                 capacidade: int = settings.LOOP_BLOQUEIO_BUFFER):
+        self.intervalo = intervalo_ms / 1000
+        self.limiar = limiar_bloqueio_ms / 1000
+        self.bloqueios: deque = deque(maxlen=capacidade)
+        self._batimento = time.monotonic()
+        self._thread_loop: Optional[int] = None
+        self._tarefa: Optional[asyncio.Task] = None
+        self._vigia: Optional[threading.Thread] = None
+        self._parar = threading.Event()
+
+    def start(self):
+        if self._tarefa is not None:
+            return
+        self._thread_loop = threading.get_ident()
+        self._batimento = time.monotonic()
+        self._parar.clear()
+        self._tarefa = asyncio.create_task(self._medir_lag())
+        self._vigia = threading.Thread(target=self._vigiar, name="vigia-event-loop", daemon=True)
+        self._vigia.start()
+
+    async def stop(self):
+        self._parar.set()
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+            self._tarefa = None
+
+    async def _medir_lag(self):
+        while True:
+            inicio = time.monotonic()
+            await asyncio.sleep(self.intervalo)
+            agora = time.monotonic()
+            lag = max(0.0, agora - inicio - self.intervalo)
+            LOOP_LAG.observe(lag)
+            LOOP_LAG_ATUAL.set(lag)
+            self._batimento = agora
+
+    def _vigiar(self):
+        bloqueio: Optional[Dict[str, Any]] = None
+        while not self._parar.wait(self.limiar / 2):
+            parado = time.monotonic() - self._batimento - self.intervalo
+            if parado >= self.limiar:
+                if bloqueio is None:
+                    frame = sys._current_frames().get(self._thread_loop)
+                    bloqueio = {
+                        "data_hora": datetime.now(timezone.utc).isoformat(),
+                        "duracao_ms": None,
+                        "pilha": pilha_thread(frame) if frame is not None else [],
+                    }
+                    self.bloqueios.append(bloqueio)
+                    LOOP_BLOQUEIOS.inc()
+                bloqueio["duracao_ms"] = round(parado * 1000, 1)
+            elif bloqueio is not None:
+                LOOP_BLOQUEIO_DURACAO.observe(bloqueio["duracao_ms"] / 1000)
+                bloqueio = None
+
+    def listar(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Bloqueios mais recentes primeiro"""
+        return list(reversed(self.bloqueios))[:limit]
+
+
+monitor_loop = MonitorLoop()
@@ -0,0 +1,206 @@
+"""
+Profiler estatístico sob demanda, sem dependências externas.
+
+Uma thread amostra periodicamente a pilha da thread do event loop
+(``sys._current_frames``) e produz pilhas no formato "collapsed"
+(``a;b;c N``), aceito por flamegraph.pl, speedscope e similares.
+
+- Perfil por requisição: com ``X-Profile: 1`` e um token de administrador,
+  a task da requisição é acompanhada. Quando ela está executando, a pilha
+  da thread é registrada (CPU); quando está suspensa, registra-se a cadeia
+  de ``await`` da coroutine com a folha ``[await ...]``, mostrando onde o
+  tempo de espera é gasto. O resultado fica disponível pelo id devolvido
+  no cabeçalho ``X-Profile-Id``.
+- Perfil global: por N segundos, amostra todo o tráfego do worker.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional
+
+import jwt
+
+from .config import settings
+
+
+def _nome_frame(frame) -> str:
+    codigo = frame.f_code
+    return f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})"
+
+
+def pilha_thread(frame) -> List[str]:
+    """Pilha de uma thread, da raiz para a folha"""
+    pilha = []
+    while frame is not None:
+        pilha.append(_nome_frame(frame))
+        frame = frame.f_back
+    pilha.reverse()
+    return pilha
+
+
+def pilha_await(coro) -> List[str]:
+    """Cadeia de ``await`` de uma coroutine suspensa, da raiz para a folha"""
+    pilha = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        pilha.append(_nome_frame(frame))
+        proximo = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+        if proximo is not None and not hasattr(proximo, "cr_frame") and not hasattr(proximo, "gi_frame"):
+            pilha.append(f"[await {type(proximo).__name__}]")
+            break
+        coro = proximo
+    return pilha
+
+
+class Perfil:
+    def __init__(self, descricao: str):
+        self.id = uuid.uuid4().hex
+        self.descricao = descricao
+        self.pilhas: Counter = Counter()
+        self.amostras = 0
+        self.inicio = time.time()
+        self.fim: Optional[float] = None
+
+    def adicionar(self, pilha: List[str]):
+        if pilha:
+            self.pilhas[";".join(pilha)] += 1
+            self.amostras += 1
+
+    def collapsed(self) -> str:
+        """Pilhas no formato collapsed, uma por linha"""
+        return "\n".join(f"{pilha} {n}" for pilha, n in self.pilhas.most_common()) + "\n"
+
+
+class Amostrador:
+    def __init__(self,
+                 intervalo_ms: float = settings.PERFIL_INTERVALO_MS,
+                 capacidade: int = settings.PERFIL_CAPACIDADE):
+        self.intervalo = intervalo_ms / 1000
+        self._thread_loop: Optional[int] = None
+        self._tarefas: Dict[asyncio.Task, Perfil] = {}
+        self._globais: List[Perfil] = []
+        self._concluidos: "OrderedDict[str, Perfil]" = OrderedDict()
+        self._capacidade = capacidade
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def _garantir_thread(self):
+        self._thread_loop = threading.get_ident()
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._executar, name="amostrador-perfil", daemon=True)
+            self._thread.start()
+
+    def _ativo(self) -> bool:
+        with self._lock:
+            return bool(self._tarefas or self._globais)
+
+    def _executar(self):
+        while self._ativo():
+            frame = sys._current_frames().get(self._thread_loop)
+            pilha_loop = pilha_thread(frame) if frame is not None else []
+            with self._lock:
+                for perfil in self._globais:
+                    perfil.adicionar(pilha_loop)
+                for tarefa, perfil in self._tarefas.items():
+                    coro = tarefa.get_coro()
+                    if getattr(coro, "cr_running", False):
+                        perfil.adicionar(pilha_loop)
+                    else:
+                        perfil.adicionar(pilha_await(coro))
+            time.sleep(self.intervalo)
+
+    def _concluir(self, perfil: Perfil):
+        perfil.fim = time.time()
+        self._concluidos[perfil.id] = perfil
+        while len(self._concluidos) > self._capacidade:
+            self._concluidos.popitem(last=False)
+
+    # ---------- perfil por requisição ----------
+    def iniciar_tarefa(self, tarefa: asyncio.Task, descricao: str) -> Perfil:
+        perfil = Perfil(descricao)
+        with self._lock:
+            self._tarefas[tarefa] = perfil
+        self._garantir_thread()
+        return perfil
+
+    def finalizar_tarefa(self, tarefa: asyncio.Task):
+        with self._lock:
+            perfil = self._tarefas.pop(tarefa, None)
+            if perfil is not None:
+                self._concluir(perfil)
+
+    # ---------- perfil global ----------
+    async def perfil_global(self, segundos: float) -> Perfil:
+        """Amostra todo o tráfego do worker por ``segundos``"""
+        perfil = Perfil(f"global {segundos}s")
+        with self._lock:
+            self._globais.append(perfil)
+        self._garantir_thread()
+        try:
+            await asyncio.sleep(segundos)
+        finally:
+            with self._lock:
+                self._globais.remove(perfil)
+                self._concluir(perfil)
+        return perfil
+
+    def obter(self, perfil_id: str) -> Optional[Perfil]:
+        with self._lock:
+            return self._concluidos.get(perfil_id)
+
+
+amostrador = Amostrador()
+
+
+def token_admin(token: Optional[str]) -> bool:
+    """Indica se o JWT é válido e pertence a um administrador"""
+    if not token:
+        return False
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except jwt.InvalidTokenError:
+        return False
+    return bool(payload.get("admin"))
+
+
+class ProfilerMiddleware:
+    """Ativa o perfil da requisição com ``X-Profile: 1`` e token de administrador"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers", []))
+        if headers.get(b"x-profile") not in (b"1", b"true"):
+            await self.app(scope, receive, send)
+            return
+        autorizacao = headers.get(b"authorization", b"").decode("latin-1")
+        token = autorizacao[7:] if autorizacao.lower().startswith("bearer ") else None
+        if not token_admin(token):
+            await self.app(scope, receive, send)
+            return
+
+        tarefa = asyncio.current_task()
+        perfil = amostrador.iniciar_tarefa(tarefa, f"{scope['method']} {scope['path']}")
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers_resposta = list(message.get("headers", []))
+                headers_resposta.append((b"x-profile-id", perfil.id.encode()))
+                message = {**message, "headers": headers_resposta}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            amostrador.finalizar_tarefa(tarefa)
@@ -0,0 +1,36 @@
+"""
+Referências entre documentos (``rota_id``, ``viagem_id``, ...).
+
+As referências são gravadas como ``ObjectId`` (``com_referencias`` desfaz
+a serialização do ``PyObjectId`` em string feita por ``model_dump``).
+Viagens e frequências gravadas pela API antes disso guardam os ids como
+string, então as consultas por referência usam ``ambas_formas`` e as
+chaves em memória são normalizadas com ``oid``.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+
+CAMPOS_REFERENCIA = ("rota_id", "motorista_id", "veiculo_id", "aluno_id", "viagem_id")
+
+
+def oid(valor: Any) -> Optional[ObjectId]:
+    """Referência como ``ObjectId`` (``None`` se não for um id válido)"""
+    if isinstance(valor, ObjectId):
+        return valor
+    return ObjectId(valor) if ObjectId.is_valid(valor) else None
+
+
+def ambas_formas(ids: Iterable[Any]) -> List[Any]:
+    """Valores para ``$in`` que casam a referência gravada como ``ObjectId`` ou como string"""
+    ids = [i for i in map(oid, ids) if i is not None]
+    return ids + [str(i) for i in ids]
+
+
+def com_referencias(documento: Dict[str, Any]) -> Dict[str, Any]:
+    """Converte para ``ObjectId`` as referências de um documento vindo de ``model_dump``"""
+    for campo in CAMPOS_REFERENCIA:
+        if documento.get(campo) is not None:
+            documento[campo] = oid(documento[campo])
+    return documento
@@ -0,0 +1,198 @@
+"""
+Cabeçalho ``Server-Timing`` com a divisão do tempo de cada requisição.
+
+Fases medidas:
+
+- ``deps``: leitura do corpo e resolução das dependências do FastAPI;
+- ``mongo``: tempo dos comandos no MongoDB (via ``CommandListener``);
+- ``pydantic``: validação dos documentos em modelos no ``CRUDService``;
+- ``resposta``: validação pelo ``response_model`` e ``jsonable_encoder``;
+- ``json``: codificação final do corpo em JSON;
+- ``total``: do início da requisição até o envio dos cabeçalhos.
+
+A medição é opcional: ativa quando o cliente envia ``X-Server-Timing: 1``
+ou por amostragem (``SERVER_TIMING_AMOSTRAGEM``). Fora disso os spans
+custam apenas a leitura de uma ``ContextVar``.
+
+``deps`` e ``resposta`` vêm da classe de rota ``RotaCronometrada``
+(``APIRouter(route_class=...)``): o handler da rota marca o próprio início
+e fim, e o endpoint envolvido marca quando começa e termina. O que vem
+antes do endpoint é ``deps``; o que vem depois, descontado o ``json``, é
+``resposta``.
+"""
+
+import asyncio
+import functools
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from pymongo import monitoring
+
+from .config import settings
+
+CABECALHO_ATIVACAO = b"x-server-timing"
+
+
+class Temporizador:
+    """Acumula a duração (ms) e a contagem de cada fase"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.fases: Dict[str, List[float]] = {}
+        self.marcas: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def adicionar(self, fase: str, duracao_ms: float):
+        with self._lock:
+            acumulado = self.fases.setdefault(fase, [0.0, 0])
+            acumulado[0] += duracao_ms
+            acumulado[1] += 1
+
+    def duracao(self, fase: str) -> float:
+        with self._lock:
+            return self.fases.get(fase, [0.0, 0])[0]
+
+    def cabecalho(self) -> str:
+        partes = []
+        for fase, (duracao, quantidade) in self.fases.items():
+            partes.append(f'{fase};dur={duracao:.2f};desc="{quantidade}x"')
+        total = (time.perf_counter() - self.inicio) * 1000
+        partes.append(f"total;dur={total:.2f}")
+        return ", ".join(partes)
+
+
+temporizador_atual: ContextVar[Optional[Temporizador]] = ContextVar("temporizador_atual", default=None)
+
+
+@contextmanager
+def span(fase: str):
+    """Mede um trecho de código se a requisição corrente estiver sendo medida"""
+    temporizador = temporizador_atual.get()
+    if temporizador is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        temporizador.adicionar(fase, (time.perf_counter() - inicio) * 1000)
+
+
+class ServerTimingMongoListener(monitoring.CommandListener):
+    """Soma o tempo dos comandos do MongoDB na fase ``mongo``"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        temporizador = temporizador_atual.get()
+        if temporizador is not None:
+            temporizador.adicionar("mongo", event.duration_micros / 1000)
+
+    def failed(self, event):
+        self.succeeded(event)
+
+
+class JSONResponseCronometrada(JSONResponse):
+    """JSONResponse que registra o tempo de codificação na fase ``json``"""
+
+    def render(self, content) -> bytes:
+        with span("json"):
+            return super().render(content)
+
+
+def _marcar(evento: str):
+    temporizador = temporizador_atual.get()
+    if temporizador is not None:
+        temporizador.marcas[evento] = time.perf_counter()
+
+
+def _cronometrar_endpoint(endpoint: Callable) -> Callable:
+    """Envolve o endpoint para marcar seu início e fim (mantém a assinatura)"""
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def endpoint_cronometrado(*args, **kwargs):
+            _marcar("inicio_endpoint")
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _marcar("fim_endpoint")
+    else:
+        @functools.wraps(endpoint)
+        def endpoint_cronometrado(*args, **kwargs):
+            _marcar("inicio_endpoint")
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _marcar("fim_endpoint")
+    return endpoint_cronometrado
+
+
+class RotaCronometrada(APIRoute):
+    """Rota que separa o tempo de dependências (``deps``) e de resposta (``resposta``)"""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _cronometrar_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def handler_cronometrado(request):
+            temporizador = temporizador_atual.get()
+            if temporizador is None:
+                return await handler(request)
+            temporizador.marcas = marcas = {}
+            json_antes = temporizador.duracao("json")
+            inicio = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                fim = time.perf_counter()
+                # Sem marca de início: a requisição parou na validação ou em uma dependência
+                temporizador.adicionar("deps", (marcas.get("inicio_endpoint", fim) - inicio) * 1000)
+                if "fim_endpoint" in marcas:
+                    json_ms = temporizador.duracao("json") - json_antes
+                    temporizador.adicionar("resposta", max(0.0, (fim - marcas["fim_endpoint"]) * 1000 - json_ms))
+
+        return handler_cronometrado
+
+
+class ServerTimingMiddleware:
+    """Middleware ASGI que ativa a medição e emite o cabeçalho Server-Timing"""
+
+    def __init__(self, app, amostragem: float = settings.SERVER_TIMING_AMOSTRAGEM):
+        self.app = app
+        self.amostragem = amostragem
+
+    def _ativo(self, scope) -> bool:
+        for nome, valor in scope.get("headers", []):
+            if nome == CABECALHO_ATIVACAO:
+                return valor not in (b"0", b"false")
+        return self.amostragem > 0 and random.random() < self.amostragem
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._ativo(scope):
+            await self.app(scope, receive, send)
+            return
+
+        temporizador = Temporizador()
+        token = temporizador_atual.set(temporizador)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", temporizador.cabecalho().encode("latin-1")))
+                headers.append((b"timing-allow-origin", b"*"))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            temporizador_atual.reset(token)
@@ -0,0 +1,471 @@
+"""
+Gerador de dados sintéticos em escala realista.
+
+Gera escolas com milhares de alunos, centenas de rotas com paradas em
+torno de cada escola, a frota e os motoristas necessários e um período
+letivo de viagens com as frequências de embarque e desembarque. Os dados
+são referencialmente válidos (toda viagem aponta para rota, motorista e
+veículo existentes; toda frequência para aluno e viagem existentes) e
+sem conflitos de agenda: no mesmo turno cada motorista e cada veículo
+atendem uma única rota.
+
+Tudo é determinístico a partir da semente, inclusive os ``_id``: rodar
+de novo com os mesmos parâmetros produz os mesmos documentos, e as
+inserções duplicadas são ignoradas — uma execução interrompida pode ser
+retomada sem ``--limpar``. Nada depende da data em que o gerador roda: o
+período começa em ``INICIO_PADRAO`` e o status das viagens é calculado
+em relação a um "hoje" de referência (``--hoje``; por padrão o último
+dia letivo do período, com as viagens da manhã em andamento).
+
+As tabelas de dimensão são inseridas com ``insert_many`` concorrentes; as
+viagens e frequências de cada dia letivo são geradas e inseridas em
+paralelo por um pool de processos, cada um com sua própria conexão.
+
+Uso:
+    python -m app.dados_sinteticos --escala media --limpar
+    python -m app.dados_sinteticos --escolas 20 --alunos-por-escola 3000 --dias 200 --workers 8
+"""
+
+import argparse
+import asyncio
+import calendar
+import math
+import multiprocessing
+import os
+import random
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
+
+from .core.config import settings
+from .migrations import run_migrations
+from .models.pydantic_models import StatusVeiculo, StatusViagem, TipoIncidente, TipoRegistro
+from .services.geometria_rotas import calcular_geometria
+
+SENHA_PADRAO = "test123"
+
+COLECOES = ("alunos", "motoristas", "veiculos", "rotas", "viagens", "frequencias")
+
+ESCALAS: Dict[str, Dict[str, Any]] = {
+    "exemplo": {"escolas": 1, "alunos_por_escola": 80, "dias": 5},
+    "pequena": {"escolas": 3, "alunos_por_escola": 400, "dias": 20},
+    "media": {"escolas": 10, "alunos_por_escola": 1500, "dias": 100},
+    # ~100 mil alunos, 2.500 rotas, 500 mil viagens e ~37 milhões de frequências
+    "grande": {"escolas": 25, "alunos_por_escola": 4000, "dias": 200},
+}
+
+INICIO_PADRAO = date(2026, 2, 2)
+
+TURNOS = ("Manhã", "Tarde")
+HORARIO_PARTIDA = {"Manhã": (6, 15), "Tarde": (12, 30)}
+MINUTOS_ENTRE_PARADAS = 3
+
+NOMES = ("Ana", "João", "Maria", "Pedro", "Lucas", "Julia", "Gabriel", "Beatriz", "Rafael", "Larissa",
+         "Mateus", "Camila", "Felipe", "Isabela", "Gustavo", "Mariana", "Thiago", "Letícia", "Bruno", "Sofia")
+SOBRENOMES = ("Silva", "Santos", "Oliveira", "Souza", "Lima", "Pereira", "Ferreira", "Costa", "Rodrigues",
+              "Almeida", "Nascimento", "Carvalho", "Araújo", "Ribeiro", "Gomes", "Barbosa", "Rocha", "Dias")
+LOGRADOUROS = ("Rua das Flores", "Av. Brasil", "Rua São José", "Av. Amazonas", "Rua Boa Vista",
+               "Rua Sete de Setembro", "Av. Constantino Nery", "Rua Rio Negro", "Av. Djalma Batista")
+MODELOS_VEICULO = ("Mercedes-Benz OF-1519", "Volkswagen Volksbus 15.190", "Marcopolo Volare W9",
+                   "Iveco Daily Minibus", "Agrale MA 10.0")
+NECESSIDADES = ("Cadeirante", "Deficiência visual", "Deficiência auditiva", "TEA")
+DESCRICOES_INCIDENTE = {
+    TipoIncidente.MECANICO: "Pneu furado no trajeto",
+    TipoIncidente.TRAFEGO: "Congestionamento na via principal",
+    TipoIncidente.CLIMATICO: "Chuva forte, trajeto mais lento",
+    TipoIncidente.OUTRO: "Aluno passou mal durante o trajeto",
+}
+
+
+@dataclass
+class ConfiguracaoDados:
+    semente: int = 42
+    escolas: int = 3
+    alunos_por_escola: int = 400
+    alunos_por_rota: int = 40
+    pontos_por_rota: int = 12
+    dias: int = 20
+    inicio: date = INICIO_PADRAO
+    hoje: Optional[date] = None  # Referência do status das viagens; padrão: último dia letivo
+    presenca: float = 0.92
+    taxa_cancelamento: float = 0.02
+    taxa_incidente: float = 0.03
+    reserva_frota: float = 0.1
+    centro: Tuple[float, float] = (-3.1190, -60.0217)
+    raio_km: float = 15.0
+    lote: int = 5000
+    workers: int = os.cpu_count() or 4
+
+
+# ---------- utilitários determinísticos ----------
+
+def _rng(semente: int, *partes: Any) -> random.Random:
+    """Gerador independente por fluxo (dimensão, dia), estável entre execuções"""
+    return random.Random(":".join(str(p) for p in (semente, *partes)))
+
+
+def _object_id(rng: random.Random, quando: datetime) -> ObjectId:
+    """ObjectId determinístico com o timestamp do documento (datas ingênuas em UTC)"""
+    return ObjectId(struct.pack(">I", calendar.timegm(quando.utctimetuple())) + rng.randbytes(8))
+
+
+def _deslocar(lat: float, lon: float, distancia_km: float, angulo: float) -> Tuple[float, float]:
+    dlat = distancia_km / 111.32 * math.cos(angulo)
+    dlon = distancia_km / (111.32 * math.cos(math.radians(lat))) * math.sin(angulo)
+    return round(lat + dlat, 6), round(lon + dlon, 6)
+
+
+def _meia_noite(dia: date) -> datetime:
+    return datetime.combine(dia, datetime.min.time())
+
+
+def dias_letivos(inicio: date, quantidade: int) -> List[date]:
+    """Os ``quantidade`` primeiros dias úteis a partir de ``inicio``"""
+    dias = []
+    dia = inicio
+    while len(dias) < quantidade:
+        if dia.weekday() < 5:
+            dias.append(dia)
+        dia += timedelta(days=1)
+    return dias
+
+
+# ---------- dimensões ----------
+
+def _gerar_rota(rng: random.Random, config: ConfiguracaoDados, escola: Dict[str, Any],
+                indice: int, turno: str, criado_em: datetime) -> Dict[str, Any]:
+    """Paradas em um trajeto com ruído partindo da periferia e terminando na escola"""
+    distancia = rng.uniform(2, config.raio_km / 2)
+    angulo = rng.uniform(0, 2 * math.pi)
+    lat, lon = _deslocar(escola["lat"], escola["lon"], distancia, angulo)
+    passos = config.pontos_por_rota - 1
+    pontos = []
+    for ordem in range(1, passos + 1):
+        fracao = (ordem - 1) / passos
+        alvo_lat = lat + (escola["lat"] - lat) * fracao
+        alvo_lon = lon + (escola["lon"] - lon) * fracao
+        p_lat, p_lon = _deslocar(alvo_lat, alvo_lon, rng.uniform(0, 0.4), rng.uniform(0, 2 * math.pi))
+        pontos.append({
+            "nome_ponto": f"Parada {ordem}",
+            "endereco": f"{rng.choice(LOGRADOUROS)}, {rng.randint(1, 3000)}",
+            "lat": p_lat,
+            "lon": p_lon,
+            "ordem": ordem,
+        })
+    pontos.append({
+        "nome_ponto": escola["nome"],
+        "endereco": escola["endereco"],
+        "lat": escola["lat"],
+        "lon": escola["lon"],
+        "ordem": passos + 1,
+    })
+    return {
+        "_id": _object_id(rng, criado_em),
+        "nome_rota": f"{escola['nome']} - Rota {indice + 1} ({turno})",
+        "descricao": f"Rota {indice + 1} da {escola['nome']}, turno {turno.lower()}",
+        "turno": turno,
+        "ativa": True,
+        "pontos_de_parada": pontos,
+        "num_pontos": len(pontos),
+        "geometria": calcular_geometria(pontos),
+    }
+
+
+def gerar_dimensoes(config: ConfiguracaoDados, senha_hash: str) -> Tuple[Dict[str, List[Dict[str, Any]]], List[Dict[str, Any]]]:
+    """
+    Gera alunos, motoristas, veículos e rotas, e o plano de viagens de cada
+    rota (motorista, veículo e alunos com a parada de embarque).
+    """
+    criado_em = _meia_noite(config.inicio - timedelta(days=30))
+    rng_escolas = _rng(config.semente, "escolas")
+    rng_rotas = _rng(config.semente, "rotas")
+    rng_alunos = _rng(config.semente, "alunos")
+
+    documentos: Dict[str, List[Dict[str, Any]]] = {"alunos": [], "motoristas": [], "veiculos": [], "rotas": []}
+    plano: List[Dict[str, Any]] = []
+    rotas_por_turno = {turno: 0 for turno in TURNOS}
+    numero_aluno = 0
+
+    for e in range(config.escolas):
+        lat, lon = _deslocar(*config.centro, rng_escolas.uniform(0, config.raio_km), rng_escolas.uniform(0, 2 * math.pi))
+        escola = {
+            "nome": f"Escola {e + 1}",
+            "endereco": f"{rng_escolas.choice(LOGRADOUROS)}, {rng_escolas.randint(1, 3000)}",
+            "lat": lat,
+            "lon": lon,
+        }
+        n_rotas = math.ceil(config.alunos_por_escola / config.alunos_por_rota)
+        for r in range(n_rotas):
+            turno = TURNOS[r % len(TURNOS)]
+            rota = _gerar_rota(rng_rotas, config, escola, r, turno, criado_em)
+            documentos["rotas"].append(rota)
+
+            inscritos = min(config.alunos_por_rota, config.alunos_por_escola - r * config.alunos_por_rota)
+            alunos_rota = []
+            for _ in range(inscritos):
+                nome = f"{rng_alunos.choice(NOMES)} {rng_alunos.choice(SOBRENOMES)} {rng_alunos.choice(SOBRENOMES)}"
+                aluno = {
+                    "_id": _object_id(rng_alunos, criado_em),
+                    "nome_completo": nome,
+                    "email": f"aluno{numero_aluno}@escola{e + 1}.rotafacil.dev",
+                    "senha_hash": senha_hash,
+                    "matricula": f"{config.inicio.year}{numero_aluno:07d}",
+                    "telefone": f"(92) 9{rng_alunos.randint(8000, 9999)}-{rng_alunos.randint(0, 9999):04d}",
+                    "necessidade_especial": rng_alunos.choice(NECESSIDADES) if rng_alunos.random() < 0.03 else None,
+                    "ponto_embarque_preferencial_id": None,
+                }
+                documentos["alunos"].append(aluno)
+                # Embarca em uma parada da rota (a última é a própria escola)
+                alunos_rota.append((aluno["_id"], rng_alunos.randint(1, config.pontos_por_rota - 1)))
+                numero_aluno += 1
+
+            plano.append({
+                "rota_id": rota["_id"],
+                "turno": turno,
+                "num_pontos": rota["num_pontos"],
+                "posicao_turno": rotas_por_turno[turno],
+                "alunos": alunos_rota,
+            })
+            rotas_por_turno[turno] += 1
+
+    # Em cada turno, a k-ésima rota usa o motorista k e o veículo k: sem conflitos de agenda
+    rng_frota = _rng(config.semente, "frota")
+    necessarios = max(rotas_por_turno.values())
+    for k in range(math.ceil(necessarios * (1 + config.reserva_frota))):
+        reserva = k >= necessarios
+        documentos["motoristas"].append({
+            "_id": _object_id(rng_frota, criado_em),
+            "nome_completo": f"{rng_frota.choice(NOMES)} {rng_frota.choice(SOBRENOMES)}",
+            "email": f"motorista{k}@rotafacil.dev",
+            "senha_hash": senha_hash,
+            "cnh": f"{rng_frota.randint(0, 10 ** 11 - 1):011d}",
+            "data_admissao": _meia_noite(config.inicio - timedelta(days=rng_frota.randint(60, 3000))),
+            "status_ativo": not reserva or rng_frota.random() < 0.7,
+        })
+        status = StatusVeiculo.DISPONIVEL
+        if reserva:
+            status = rng_frota.choice([StatusVeiculo.DISPONIVEL, StatusVeiculo.EM_MANUTENCAO, StatusVeiculo.INATIVO])
+        documentos["veiculos"].append({
+            "_id": _object_id(rng_frota, criado_em),
+            "placa": f"{''.join(rng_frota.choices('ABCDEFGHIJKLMNOPQRSTUVWXYZ', k=3))}{k % 10}"
+                     f"{rng_frota.choice('ABCDEFGHIJ')}{rng_frota.randint(0, 99):02d}",
+            "modelo": rng_frota.choice(MODELOS_VEICULO),
+            "capacidade_passageiros": config.alunos_por_rota + rng_frota.choice([0, 4, 8]),
+            "status_manutencao": status.value,
+            "adaptado_pcd": rng_frota.random() < 0.2,
+            "ano_fabricacao": rng_frota.randint(2010, config.inicio.year),
+        })
+
+    for item in plano:
+        item["motorista_id"] = documentos["motoristas"][item["posicao_turno"]]["_id"]
+        item["veiculo_id"] = documentos["veiculos"][item["posicao_turno"]]["_id"]
+    return documentos, plano
+
+
+# ---------- fatos (executado nos processos do pool) ----------
+
+_estado_worker: Dict[str, Any] = {}
+
+
+def _iniciar_worker(mongodb_url: str, database: str, config: ConfiguracaoDados, plano: List[Dict[str, Any]]):
+    _estado_worker["db"] = MongoClient(mongodb_url)[database]
+    _estado_worker["config"] = config
+    _estado_worker["plano"] = plano
+
+
+def _inserir(colecao, documentos: List[Dict[str, Any]]) -> int:
+    """insert_many não ordenado que ignora documentos já existentes (retomada)"""
+    if not documentos:
+        return 0
+    try:
+        return len(colecao.insert_many(documentos, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        outros = [erro for erro in e.details.get("writeErrors", []) if erro.get("code") != 11000]
+        if outros:
+            raise
+        return e.details.get("nInserted", 0)
+
+
+def viagens_do_dia(config: ConfiguracaoDados, plano: List[Dict[str, Any]], dia: date,
+                    hoje: date) -> Iterator[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    """Viagem de cada rota no dia e as frequências correspondentes"""
+    rng = _rng(config.semente, "dia", dia.isoformat())
+    for item in plano:
+        hora, minuto = HORARIO_PARTIDA[item["turno"]]
+        partida = datetime.combine(dia, datetime.min.time()).replace(hour=hora, minute=minuto)
+        partida += timedelta(minutes=rng.randint(-5, 10))
+
+        if dia > hoje:
+            status = StatusViagem.AGENDADA
+        elif dia == hoje:
+            status = StatusViagem.EM_ANDAMENTO if item["turno"] == "Manhã" else StatusViagem.AGENDADA
+        elif rng.random() < config.taxa_cancelamento:
+            status = StatusViagem.CANCELADA
+        else:
+            status = StatusViagem.CONCLUIDA
+
+        incidentes = []
+        if status in (StatusViagem.CONCLUIDA, StatusViagem.EM_ANDAMENTO) and rng.random() < config.taxa_incidente:
+            tipo = rng.choice(list(TipoIncidente))
+            incidentes.append({
+                "descricao": DESCRICOES_INCIDENTE[tipo],
+                "tipo": tipo.value,
+                "data_hora": partida + timedelta(minutes=rng.randint(1, 40)),
+            })
+
+        viagem = {
+            "_id": _object_id(rng, partida),
+            "data_viagem": _meia_noite(dia),
+            "status": status.value,
+            "rota_id": item["rota_id"],
+            "motorista_id": item["motorista_id"],
+            "veiculo_id": item["veiculo_id"],
+            "incidentes": incidentes,
+        }
+
+        frequencias = []
+        if status in (StatusViagem.CONCLUIDA, StatusViagem.EM_ANDAMENTO):
+            chegada = partida + timedelta(minutes=item["num_pontos"] * MINUTOS_ENTRE_PARADAS)
+            for aluno_id, ordem in item["alunos"]:
+                if rng.random() >= config.presenca:
+                    continue
+                embarque = partida + timedelta(minutes=ordem * MINUTOS_ENTRE_PARADAS, seconds=rng.randint(0, 90))
+                frequencias.append({
+                    "_id": _object_id(rng, embarque),
+                    "aluno_id": aluno_id,
+                    "viagem_id": viagem["_id"],
+                    "data_hora_embarque": embarque,
+                    "tipo_registro": TipoRegistro.EMBARQUE.value,
+                })
+                if status == StatusViagem.CONCLUIDA:
+                    desembarque = chegada + timedelta(seconds=rng.randint(0, 120))
+                    frequencias.append({
+                        "_id": _object_id(rng, desembarque),
+                        "aluno_id": aluno_id,
+                        "viagem_id": viagem["_id"],
+                        "data_hora_embarque": desembarque,
+                        "tipo_registro": TipoRegistro.DESEMBARQUE.value,
+                    })
+        yield viagem, frequencias
+
+
+def _gerar_dia(dia: date, hoje: date) -> Tuple[int, int]:
+    """Gera e insere as viagens e frequências de um dia letivo"""
+    db = _estado_worker["db"]
+    config: ConfiguracaoDados = _estado_worker["config"]
+    viagens: List[Dict[str, Any]] = []
+    buffer: List[Dict[str, Any]] = []
+    total_frequencias = 0
+    for viagem, frequencias in viagens_do_dia(config, _estado_worker["plano"], dia, hoje):
+        viagens.append(viagem)
+        buffer.extend(frequencias)
+        if len(buffer) >= config.lote:
+            total_frequencias += _inserir(db.frequencias, buffer)
+            buffer = []
+    total_frequencias += _inserir(db.frequencias, buffer)
+    return _inserir(db.viagens, viagens), total_frequencias
+
+
+# ---------- orquestração ----------
+
+async def _inserir_concorrente(colecao, documentos: List[Dict[str, Any]], lote: int, concorrencia: int) -> int:
+    semaforo = asyncio.Semaphore(concorrencia)
+
+    async def inserir(parte):
+        async with semaforo:
+            try:
+                resultado = await colecao.insert_many(parte, ordered=False)
+                return len(resultado.inserted_ids)
+            except BulkWriteError as e:
+                if any(erro.get("code") != 11000 for erro in e.details.get("writeErrors", [])):
+                    raise
+                return e.details.get("nInserted", 0)
+
+    partes = [documentos[i:i + lote] for i in range(0, len(documentos), lote)]
+    return sum(await asyncio.gather(*(inserir(parte) for parte in partes)))
+
+
+async def gerar(config: ConfiguracaoDados, mongodb_url: str, database: str, limpar: bool = False) -> Dict[str, int]:
+    """Gera o conjunto completo e retorna a quantidade inserida por coleção"""
+    from .services.crud_services import pwd_context
+
+    client = AsyncIOMotorClient(mongodb_url)
+    db = client[database]
+    inseridos: Dict[str, int] = {}
+    try:
+        if limpar:
+            for colecao in COLECOES:
+                await db.drop_collection(colecao)
+
+        inicio = time.perf_counter()
+        # Todos os usuários sintéticos compartilham a senha: um único hash bcrypt
+        documentos, plano = gerar_dimensoes(config, pwd_context.hash(SENHA_PADRAO))
+        for colecao, docs in documentos.items():
+            inseridos[colecao] = await _inserir_concorrente(db[colecao], docs, config.lote, config.workers)
+            print(f"   {colecao}: {inseridos[colecao]} de {len(docs)} inseridos")
+
+        dias = dias_letivos(config.inicio, config.dias)
+        hoje = config.hoje or dias[-1]
+        loop = asyncio.get_running_loop()
+        contexto = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=config.workers, mp_context=contexto,
+                                 initializer=_iniciar_worker,
+                                 initargs=(mongodb_url, database, config, plano)) as executor:
+            resultados = await asyncio.gather(*(
+                loop.run_in_executor(executor, _gerar_dia, dia, hoje) for dia in dias
+            ))
+        inseridos["viagens"] = sum(r[0] for r in resultados)
+        inseridos["frequencias"] = sum(r[1] for r in resultados)
+        duracao = time.perf_counter() - inicio
+        print(f"   viagens: {inseridos['viagens']}, frequencias: {inseridos['frequencias']} "
+              f"({len(dias)} dias letivos, {inseridos['frequencias'] / max(duracao, 1e-9):,.0f} frequências/s)")
+
+        # Índices depois da carga: mais rápido do que mantê-los durante o insert
+        await run_migrations(db)
+    finally:
+        client.close()
+    return inseridos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos determinísticos para o RotaFácil")
+    parser.add_argument("--escala", choices=ESCALAS, default="pequena")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--escolas", type=int)
+    parser.add_argument("--alunos-por-escola", type=int)
+    parser.add_argument("--alunos-por-rota", type=int)
+    parser.add_argument("--pontos-por-rota", type=int)
+    parser.add_argument("--dias", type=int, help="Quantidade de dias letivos")
+    parser.add_argument("--inicio", type=date.fromisoformat, help="Primeiro dia do período (AAAA-MM-DD)")
+    parser.add_argument("--hoje", type=date.fromisoformat,
+                        help="Data de referência do status das viagens (padrão: último dia letivo)")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--lote", type=int, help="Documentos por insert_many")
+    parser.add_argument("--mongodb-url", default=settings.MONGODB_URL)
+    parser.add_argument("--database", default=settings.DATABASE_NAME)
+    parser.add_argument("--limpar", action="store_true", help="Remove as coleções antes de gerar")
+    args = parser.parse_args()
+
+    parametros = dict(ESCALAS[args.escala], semente=args.semente)
+    for campo in ("escolas", "alunos_por_escola", "alunos_por_rota", "pontos_por_rota", "dias", "inicio", "hoje", "workers", "lote"):
+        valor: Optional[Any] = getattr(args, campo)
+        if valor is not None:
+            parametros[campo] = valor
+    config = ConfiguracaoDados(**parametros)
+
+    print(f"🗄️ Gerando dados sintéticos em {args.database}: {asdict(config)}")
+    inicio = time.perf_counter()
+    asyncio.run(gerar(config, args.mongodb_url, args.database, args.limpar))
+    print(f"✅ Concluído em {time.perf_counter() - inicio:.1f}s (senha de todos os usuários: {SENHA_PADRAO})")
+
+
+if __name__ == "__main__":
+    main()
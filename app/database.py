@@ -1,44 +1,197 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from bson.codec_options import TypeEncoder, TypeRegistry
+from pymongo import monitoring
+from fastapi import HTTPException
 from .core.config import settings
+from .migrations import run_migrations
+from .core.metricas import mongo_event_listeners
+from .core.consultas_lentas import consultas_lentas
+from .core.server_timing import ServerTimingMongoListener
+from .core.contexto import ContextoMongoListener
+import asyncio
+import datetime
 import logging
+import math
+import random
+import time
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class CodificadorData(TypeEncoder):
+    """``date`` não é um tipo BSON: grava (e filtra) como datetime à meia-noite"""
+    python_type = datetime.date
+
+    def transform_python(self, valor):
+        return datetime.datetime.combine(valor, datetime.time.min)
+
+registro_tipos = TypeRegistry([CodificadorData()])
+
 class Database:
     client: AsyncIOMotorClient = None
     db = None
     is_connected = False
+    migrations_done = False
+    # Estado do supervisor de conexão / circuit breaker
+    supervisor: asyncio.Task = None
+    falhas_consecutivas = 0
+    proxima_verificacao = 0.0
+    ultima_verificacao_ok = None
+    ultimo_erro = None
+    evento_falha: asyncio.Event = None
 
 db = Database()
 
-async def connect_to_mongo():
-    """Conecta ao MongoDB usando motor"""
+class SucessoMongoListener(monitoring.CommandListener):
+    """Um comando bem-sucedido encerra a sequência de falhas de conexão"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        db.falhas_consecutivas = 0
+
+    def failed(self, event):
+        pass
+
+async def _ping() -> bool:
+    """Executa um ping com tempo limite; registra o erro em caso de falha"""
     try:
-        db.client = AsyncIOMotorClient(settings.MONGODB_URL, serverSelectionTimeoutMS=5000)
-        # Test the connection
-        await db.client.admin.command('ping')
-        db.db = db.client[settings.DATABASE_NAME]
-        db.is_connected = True
+        await asyncio.wait_for(
+            db.client.admin.command('ping'),
+            timeout=settings.MONGODB_PING_TIMEOUT_MS / 1000
+        )
+        db.ultima_verificacao_ok = time.time()
+        db.ultimo_erro = None
+        return True
+    except Exception as e:
+        db.ultimo_erro = str(e) or e.__class__.__name__
+        return False
+
+async def _marcar_conectado():
+    if not db.is_connected:
         logger.info(f"Conectado ao MongoDB: {settings.MONGODB_URL}")
         logger.info(f"Database: {settings.DATABASE_NAME}")
+    db.is_connected = True
+    db.falhas_consecutivas = 0
+    if not db.migrations_done:
+        # Com falha, as migrações são repetidas na próxima verificação bem-sucedida
+        db.migrations_done = await run_migrations(db.db)
+
+def _marcar_desconectado():
+    if db.is_connected:
+        logger.error(f"Conexão com MongoDB perdida: {db.ultimo_erro}")
+    db.is_connected = False
+
+def _backoff(tentativa: int) -> float:
+    """Backoff exponencial com jitter (entre metade e o valor cheio)"""
+    espera = min(settings.MONGODB_RECONNECT_MAX_S, settings.MONGODB_RECONNECT_BASE_S * (2 ** tentativa))
+    return espera * random.uniform(0.5, 1.0)
+
+async def _supervisionar():
+    """Verifica a conexão periodicamente e reconecta com backoff quando cai"""
+    tentativa = 0
+    while True:
+        if await _ping():
+            await _marcar_conectado()
+            tentativa = 0
+            espera = settings.MONGODB_HEALTHCHECK_INTERVALO_S
+        else:
+            _marcar_desconectado()
+            espera = _backoff(tentativa)
+            tentativa += 1
+            logger.warning(f"MongoDB indisponível, nova tentativa em {espera:.1f}s")
+        db.proxima_verificacao = time.monotonic() + espera
+        try:
+            # Uma falha reportada pelas requisições antecipa a verificação
+            await asyncio.wait_for(db.evento_falha.wait(), timeout=espera)
+        except asyncio.TimeoutError:
+            pass
+        db.evento_falha.clear()
+
+async def connect_to_mongo():
+    """Conecta ao MongoDB usando motor e inicia o supervisor de conexão"""
+    try:
+        db.client = AsyncIOMotorClient(
+            settings.MONGODB_URL,
+            serverSelectionTimeoutMS=settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+            connectTimeoutMS=settings.MONGODB_CONNECT_TIMEOUT_MS,
+            socketTimeoutMS=settings.MONGODB_SOCKET_TIMEOUT_MS,
+            type_registry=registro_tipos,
+            event_listeners=mongo_event_listeners() + [consultas_lentas, ServerTimingMongoListener(), ContextoMongoListener(), SucessoMongoListener()]
+        )
+        db.db = db.client[settings.DATABASE_NAME]
+        consultas_lentas.configurar(asyncio.get_running_loop(), db.client)
+        # Test the connection
+        if await _ping():
+            await _marcar_conectado()
+        else:
+            logger.error(f"Erro ao conectar ao MongoDB: {db.ultimo_erro}")
     except Exception as e:
         logger.error(f"Erro ao conectar ao MongoDB: {e}")
         db.is_connected = False
         # Don't raise the exception, just log it
         # This allows the app to start even without database connection
+    if db.client is not None:
+        db.evento_falha = asyncio.Event()
+        db.supervisor = asyncio.create_task(_supervisionar())
 
 async def close_mongo_connection():
     """Fecha a conexão com o MongoDB"""
+    if db.supervisor:
+        db.supervisor.cancel()
+        try:
+            await db.supervisor
+        except asyncio.CancelledError:
+            pass
+        db.supervisor = None
     if db.client:
         db.client.close()
         db.is_connected = False
         logger.info("Conexão com MongoDB fechada")
 
+def registrar_falha_conexao(erro: Exception):
+    """
+    Registra uma falha de conexão observada por uma requisição.
+
+    Ao atingir o limite de falhas consecutivas o circuito abre: o banco é
+    marcado como indisponível e o supervisor verifica a conexão imediatamente.
+    Qualquer comando bem-sucedido (``SucessoMongoListener``) zera a contagem.
+    """
+    db.falhas_consecutivas += 1
+    db.ultimo_erro = str(erro)
+    if db.falhas_consecutivas >= settings.MONGODB_CIRCUIT_LIMITE_FALHAS:
+        _marcar_desconectado()
+        if db.evento_falha is not None:
+            db.evento_falha.set()
+
+def retry_after_segundos() -> int:
+    """Segundos estimados até a próxima tentativa de reconexão"""
+    return max(1, math.ceil(db.proxima_verificacao - time.monotonic()))
+
+def estado_conexao() -> dict:
+    """Resumo do estado da conexão para os endpoints de health check"""
+    return {
+        "conectado": db.is_connected,
+        "circuito": "fechado" if db.is_connected else "aberto",
+        "falhas_consecutivas": db.falhas_consecutivas,
+        "ultima_verificacao_ok": db.ultima_verificacao_ok,
+        "ultimo_erro": db.ultimo_erro,
+        "retry_after": None if db.is_connected else retry_after_segundos()
+    }
+
 def get_database():
     """Retorna a instância do banco de dados"""
     if not db.is_connected:
         logger.warning("Tentativa de acessar banco de dados sem conexão")
         return None
-    return db.db 
\ No newline at end of file
+    return db.db
+
+def exigir_database():
+    """Dependência que falha rápido com 503 enquanto o circuito está aberto"""
+    if not db.is_connected:
+        raise HTTPException(
+            status_code=503,
+            detail="Banco de dados temporariamente indisponível",
+            headers={"Retry-After": str(retry_after_segundos())}
+        )
+    return db.db
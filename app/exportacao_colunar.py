@@ -0,0 +1,478 @@
+"""
+Exportação dos dados operacionais para arquivos colunares (Parquet ou
+Arrow IPC) particionados por mês, para análises fora do banco.
+
+Layout em ``--destino`` (partições no estilo Hive)::
+
+    viagens/mes=2026-03/viagens.parquet
+    viagens_incidentes/mes=2026-03/incidentes.parquet
+    frequencias/mes=2026-03/parte-<marca>-<fatia>.parquet
+    alunos.parquet, motoristas.parquet, veiculos.parquet,
+    rotas.parquet, pontos_de_parada.parquet
+    _marca_dagua.json
+
+A exportação é incremental a partir de uma marca d'água (um ``ObjectId``
+limite gravado em ``_marca_dagua.json`` só quando tudo termina bem):
+
+- frequências são só inseridas: cada execução exporta os ``_id`` entre a
+  marca anterior e a nova (com ``EXPORTACAO_MARGEM_S`` de folga para
+  inserções em andamento) em novos arquivos ``parte-*``, agrupados pelo
+  mês do embarque. Os nomes dependem da marca anterior, então repetir
+  uma execução interrompida sobrescreve as partes em vez de duplicá-las;
+- frequências reaplicadas do spool depois de uma queda chegam com o
+  ``_id`` gerado antes dela, possivelmente abaixo da marca: as que têm
+  ``reaplicado_em`` desde o início da execução anterior e ``_id`` abaixo
+  da marca anterior vão para uma parte ``parte-<marca>-reaplicadas``.
+  Uma frequência reaplicada enquanto a execução anterior lia a mesma
+  faixa pode sair duas vezes (``frequencia_id`` distingue as cópias);
+- viagens mudam (status, incidentes): os meses ainda abertos
+  (``EXPORTACAO_MESES_ABERTOS`` antes da última execução em diante) e os
+  meses com viagens novas desde a marca são regravados inteiros;
+- as tabelas de dimensão são pequenas e regravadas a cada execução
+  (sem ``senha_hash``).
+
+Cada partição é uma tarefa de um pool de processos: o worker tem a sua
+própria conexão, lê a partição pelo índice (``data_viagem`` ou ``_id``) e
+codifica/comprime em grupos de ``EXPORTACAO_LINHAS_POR_GRUPO`` linhas,
+sem manter a partição inteira em memória. Os arquivos são escritos em um
+temporário e renomeados, então um leitor nunca vê um arquivo pela metade.
+
+Requer ``pyarrow`` (dependência opcional, não usada pela API).
+
+Uso:
+    python -m app.exportacao_colunar --destino exportacao
+    python -m app.exportacao_colunar --formato arrow --workers 8 --completa
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from pymongo import MongoClient
+
+from .core.config import settings
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:  # Dependência opcional: só a exportação precisa dela
+    pa = None
+
+ARQUIVO_MARCA = "_marca_dagua.json"
+EXTENSOES = {"parquet": "parquet", "arrow": "arrow"}
+COMPRESSOES_ARROW = ("zstd", "lz4")
+
+# Colunas de cada tabela: (nome, tipo)
+TABELAS: Dict[str, List[Tuple[str, str]]] = {
+    "viagens": [
+        ("viagem_id", "texto"), ("data_viagem", "data"), ("status", "texto"), ("rota_id", "texto"),
+        ("motorista_id", "texto"), ("veiculo_id", "texto"), ("num_incidentes", "inteiro"),
+    ],
+    "viagens_incidentes": [
+        ("viagem_id", "texto"), ("data_viagem", "data"), ("rota_id", "texto"),
+        ("tipo", "texto"), ("descricao", "texto"), ("data_hora", "instante"),
+    ],
+    "frequencias": [
+        ("frequencia_id", "texto"), ("aluno_id", "texto"), ("viagem_id", "texto"),
+        ("tipo_registro", "texto"), ("data_hora_embarque", "instante"),
+    ],
+    "alunos": [
+        ("aluno_id", "texto"), ("nome_completo", "texto"), ("email", "texto"), ("matricula", "texto"),
+        ("telefone", "texto"), ("necessidade_especial", "texto"), ("ponto_embarque_preferencial_id", "texto"),
+    ],
+    "motoristas": [
+        ("motorista_id", "texto"), ("nome_completo", "texto"), ("email", "texto"), ("cnh", "texto"),
+        ("data_admissao", "data"), ("status_ativo", "logico"),
+    ],
+    "veiculos": [
+        ("veiculo_id", "texto"), ("placa", "texto"), ("modelo", "texto"), ("capacidade_passageiros", "inteiro"),
+        ("status_manutencao", "texto"), ("adaptado_pcd", "logico"), ("ano_fabricacao", "inteiro"),
+    ],
+    "rotas": [
+        ("rota_id", "texto"), ("nome_rota", "texto"), ("descricao", "texto"), ("turno", "texto"),
+        ("ativa", "logico"), ("num_pontos", "inteiro"),
+    ],
+    "pontos_de_parada": [
+        ("rota_id", "texto"), ("ordem", "inteiro"), ("nome_ponto", "texto"), ("endereco", "texto"),
+        ("lat", "real"), ("lon", "real"),
+    ],
+}
+
+
+@dataclass
+class ConfiguracaoExportacao:
+    destino: str = settings.EXPORTACAO_DIR
+    formato: str = settings.EXPORTACAO_FORMATO
+    compressao: str = settings.EXPORTACAO_COMPRESSAO
+    linhas_por_grupo: int = settings.EXPORTACAO_LINHAS_POR_GRUPO
+    meses_abertos: int = settings.EXPORTACAO_MESES_ABERTOS
+    margem_s: float = settings.EXPORTACAO_MARGEM_S
+    workers: int = os.cpu_count() or 1
+
+
+def _esquema(tabela: str) -> "pa.Schema":
+    tipos = {
+        "texto": pa.string(), "data": pa.date32(), "instante": pa.timestamp("ms"),
+        "inteiro": pa.int32(), "real": pa.float64(), "logico": pa.bool_(),
+    }
+    return pa.schema([(nome, tipos[tipo]) for nome, tipo in TABELAS[tabela]])
+
+
+def _texto(valor: Any) -> Optional[str]:
+    return None if valor is None else str(valor)
+
+
+def _data(valor: Any) -> Optional[date]:
+    return valor.date() if isinstance(valor, datetime) else valor
+
+
+def _mes(valor: datetime) -> str:
+    return f"{valor.year:04d}-{valor.month:02d}"
+
+
+def _limites_mes(mes: str) -> Tuple[datetime, datetime]:
+    ano, numero = map(int, mes.split("-"))
+    inicio = datetime(ano, numero, 1)
+    fim = datetime(ano + numero // 12, numero % 12 + 1, 1)
+    return inicio, fim
+
+
+def meses_entre(inicio: datetime, fim: datetime) -> List[str]:
+    """Meses de ``inicio`` a ``fim``, inclusive"""
+    meses = []
+    atual = datetime(inicio.year, inicio.month, 1)
+    while atual <= fim:
+        meses.append(_mes(atual))
+        atual = _limites_mes(_mes(atual))[1]
+    return meses
+
+
+class _Escritor:
+    """Grava uma tabela em grupos de linhas, sem manter a partição inteira em memória"""
+
+    def __init__(self, config: ConfiguracaoExportacao, tabela: str, caminho: str):
+        self.config = config
+        self.esquema = _esquema(tabela)
+        self.caminho = f"{caminho}.{EXTENSOES[config.formato]}"
+        self._temporario = self.caminho + ".tmp"
+        self._colunas: Dict[str, List[Any]] = {nome: [] for nome in self.esquema.names}
+        self._pendentes = 0
+        self._gravador = None
+        self.linhas = 0
+
+    def adicionar(self, linha: Dict[str, Any]):
+        for nome, valores in self._colunas.items():
+            valores.append(linha.get(nome))
+        self._pendentes += 1
+        if self._pendentes >= self.config.linhas_por_grupo:
+            self._descarregar()
+
+    def _abrir(self):
+        os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+        if self.config.formato == "parquet":
+            self._gravador = pq.ParquetWriter(self._temporario, self.esquema, compression=self.config.compressao)
+        else:
+            opcoes = ipc.IpcWriteOptions(compression=self.config.compressao)
+            self._gravador = ipc.new_file(self._temporario, self.esquema, options=opcoes)
+
+    def _descarregar(self):
+        if not self._pendentes:
+            return
+        if self._gravador is None:
+            self._abrir()
+        self._gravador.write_table(pa.Table.from_pydict(self._colunas, schema=self.esquema))
+        self.linhas += self._pendentes
+        self._colunas = {nome: [] for nome in self.esquema.names}
+        self._pendentes = 0
+
+    def fechar(self) -> int:
+        """Conclui o arquivo; uma partição que ficou vazia tem o arquivo anterior removido"""
+        self._descarregar()
+        if self._gravador is None:
+            if os.path.exists(self.caminho):
+                os.remove(self.caminho)
+            return 0
+        self._gravador.close()
+        os.replace(self._temporario, self.caminho)
+        return self.linhas
+
+    def abortar(self):
+        if self._gravador is not None:
+            self._gravador.close()
+            os.remove(self._temporario)
+
+
+# ---------- tarefas executadas nos processos do pool ----------
+_estado_worker: Dict[str, Any] = {}
+
+
+def _iniciar_worker(mongodb_url: str, database: str, config: ConfiguracaoExportacao):
+    _estado_worker["db"] = MongoClient(mongodb_url)[database]
+    _estado_worker["config"] = config
+
+
+def _gravar(escritores: Iterable[_Escritor], preencher: Callable[[], None]) -> int:
+    # ``escritores`` pode ser uma visão que cresce durante o preenchimento (dict.values())
+    try:
+        preencher()
+    except BaseException:
+        for escritor in escritores:
+            escritor.abortar()
+        raise
+    return sum(escritor.fechar() for escritor in escritores)
+
+
+def exportar_viagens_mes(mes: str) -> int:
+    """Regrava as viagens (e os incidentes achatados) de um mês"""
+    db, config = _estado_worker["db"], _estado_worker["config"]
+    particao = f"mes={mes}"
+    viagens = _Escritor(config, "viagens", os.path.join(config.destino, "viagens", particao, "viagens"))
+    incidentes = _Escritor(
+        config, "viagens_incidentes", os.path.join(config.destino, "viagens_incidentes", particao, "incidentes")
+    )
+    inicio, fim = _limites_mes(mes)
+
+    def preencher():
+        cursor = db.viagens.find({"data_viagem": {"$gte": inicio, "$lt": fim}}, batch_size=config.linhas_por_grupo)
+        for viagem in cursor:
+            base = {
+                "viagem_id": str(viagem["_id"]),
+                "data_viagem": _data(viagem["data_viagem"]),
+                "rota_id": _texto(viagem.get("rota_id")),
+            }
+            lista = viagem.get("incidentes") or []
+            viagens.adicionar({
+                **base,
+                "status": viagem.get("status"),
+                "motorista_id": _texto(viagem.get("motorista_id")),
+                "veiculo_id": _texto(viagem.get("veiculo_id")),
+                "num_incidentes": len(lista),
+            })
+            for incidente in lista:
+                incidentes.adicionar({
+                    **base,
+                    "tipo": incidente.get("tipo"),
+                    "descricao": incidente.get("descricao"),
+                    "data_hora": incidente.get("data_hora"),
+                })
+
+    return _gravar([viagens, incidentes], preencher)
+
+
+def _gravar_frequencias(filtro: Dict[str, Any], nome: str) -> int:
+    """Grava as frequências do filtro em partes ``nome`` agrupadas pelo mês do embarque"""
+    db, config = _estado_worker["db"], _estado_worker["config"]
+    escritores: Dict[str, _Escritor] = {}
+
+    def preencher():
+        for frequencia in db.frequencias.find(filtro, batch_size=config.linhas_por_grupo):
+            data_hora = frequencia.get("data_hora_embarque")
+            mes = _mes(data_hora or frequencia["_id"].generation_time)
+            if mes not in escritores:
+                escritores[mes] = _Escritor(
+                    config, "frequencias", os.path.join(config.destino, "frequencias", f"mes={mes}", nome)
+                )
+            escritores[mes].adicionar({
+                "frequencia_id": str(frequencia["_id"]),
+                "aluno_id": _texto(frequencia.get("aluno_id")),
+                "viagem_id": _texto(frequencia.get("viagem_id")),
+                "tipo_registro": frequencia.get("tipo_registro"),
+                "data_hora_embarque": data_hora,
+            })
+
+    return _gravar(escritores.values(), preencher)
+
+
+def exportar_frequencias(fatia: str, marca_inicio: Optional[str], marca_fim: str) -> int:
+    """
+    Exporta as frequências inseridas entre as marcas cujo ``_id`` é do mês
+    ``fatia`` (leitura pelo índice de ``_id``), agrupadas pelo mês do embarque.
+    """
+    inicio_mes, fim_mes = _limites_mes(fatia)
+    limite_inferior = ObjectId.from_datetime(inicio_mes)
+    if marca_inicio:
+        limite_inferior = max(limite_inferior, ObjectId(marca_inicio))
+    limite_superior = min(ObjectId.from_datetime(fim_mes), ObjectId(marca_fim))
+    return _gravar_frequencias(
+        {"_id": {"$gte": limite_inferior, "$lt": limite_superior}}, f"parte-{marca_inicio or 'inicial'}-{fatia}"
+    )
+
+
+def exportar_frequencias_reaplicadas(marca_inicio: str, desde: datetime, ate: datetime) -> int:
+    """
+    Exporta as frequências reaplicadas do spool entre ``desde`` e ``ate``
+    com ``_id`` abaixo da marca anterior, que a faixa de ``_id`` não cobre
+    (leitura pelo índice de ``reaplicado_em``).
+    """
+    return _gravar_frequencias(
+        {"reaplicado_em": {"$gte": desde, "$lt": ate}, "_id": {"$lt": ObjectId(marca_inicio)}},
+        f"parte-{marca_inicio}-reaplicadas"
+    )
+
+
+def exportar_dimensao(colecao: str) -> int:
+    """Regrava uma tabela de dimensão inteira (rotas geram também os pontos de parada)"""
+    db, config = _estado_worker["db"], _estado_worker["config"]
+    chave = f"{colecao[:-1]}_id"
+    colunas = [nome for nome, _ in TABELAS[colecao] if nome != chave]
+    tabela = _Escritor(config, colecao, os.path.join(config.destino, colecao))
+    escritores = [tabela]
+    pontos = None
+    if colecao == "rotas":
+        pontos = _Escritor(config, "pontos_de_parada", os.path.join(config.destino, "pontos_de_parada"))
+        escritores.append(pontos)
+
+    def preencher():
+        for documento in db[colecao].find({}, {"senha_hash": 0, "geometria": 0}, batch_size=config.linhas_por_grupo):
+            linha = {chave: str(documento["_id"])}
+            for nome in colunas:
+                valor = documento.get(nome)
+                linha[nome] = _texto(valor) if isinstance(valor, ObjectId) else _data(valor)
+            tabela.adicionar(linha)
+            if pontos is not None:
+                for ponto in documento.get("pontos_de_parada") or []:
+                    pontos.adicionar({"rota_id": linha["rota_id"], **ponto})
+
+    return _gravar(escritores, preencher)
+
+
+# ---------- planejamento (processo principal) ----------
+def ler_marca(destino: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(destino, ARQUIVO_MARCA), encoding="utf-8") as arquivo:
+            return json.load(arquivo)
+    except FileNotFoundError:
+        return {}
+
+
+def gravar_marca(destino: str, marca: Dict[str, Any]):
+    caminho = os.path.join(destino, ARQUIVO_MARCA)
+    with open(caminho + ".tmp", "w", encoding="utf-8") as arquivo:
+        json.dump(marca, arquivo, indent=2)
+    os.replace(caminho + ".tmp", caminho)
+
+
+def planejar(db, config: ConfiguracaoExportacao, marca: Dict[str, Any],
+             limite: ObjectId, agora: datetime) -> List[Tuple[Callable[..., int], tuple]]:
+    """Lista as tarefas (função, argumentos) desta execução iniciada em ``agora``"""
+    marca_anterior = ObjectId(marca["limite"]) if marca.get("limite") else None
+    tarefas: List[Tuple[Callable[..., int], tuple]] = [
+        (exportar_dimensao, (colecao,)) for colecao in ("alunos", "motoristas", "veiculos", "rotas")
+    ]
+
+    # Viagens: meses abertos e meses com viagens novas desde a marca (ou todos, na primeira vez)
+    meses_viagens: Set[str] = set()
+    if marca_anterior is None:
+        primeira = db.viagens.find_one({}, {"data_viagem": 1}, sort=[("data_viagem", 1)])
+        ultima = db.viagens.find_one({}, {"data_viagem": 1}, sort=[("data_viagem", -1)])
+        if primeira:
+            meses_viagens.update(meses_entre(primeira["data_viagem"], ultima["data_viagem"]))
+    else:
+        abertos_desde = marca_anterior.generation_time.replace(tzinfo=None) - timedelta(days=31 * config.meses_abertos)
+        meses_viagens.update(meses_entre(abertos_desde, agora))
+        novos = db.viagens.aggregate([
+            {"$match": {"_id": {"$gte": marca_anterior}}},
+            {"$group": {"_id": {"$dateToString": {"format": "%Y-%m", "date": "$data_viagem"}}}},
+        ])
+        meses_viagens.update(grupo["_id"] for grupo in novos if grupo["_id"])
+    tarefas += [(exportar_viagens_mes, (mes,)) for mes in sorted(meses_viagens)]
+
+    # Frequências: fatias mensais do intervalo de _id entre as marcas
+    if marca_anterior is None:
+        primeira = db.frequencias.find_one({}, {"_id": 1}, sort=[("_id", 1)])
+        inicio = primeira["_id"].generation_time.replace(tzinfo=None) if primeira else None
+    else:
+        inicio = marca_anterior.generation_time.replace(tzinfo=None)
+    if inicio is not None:
+        fim = limite.generation_time.replace(tzinfo=None)
+        tarefas += [
+            (exportar_frequencias, (fatia, str(marca_anterior) if marca_anterior else None, str(limite)))
+            for fatia in meses_entre(inicio, fim)
+        ]
+
+    # Frequências reaplicadas do spool desde a execução anterior (marcas antigas não têm
+    # "inicio": o instante da marca é anterior a ele, então só amplia a janela)
+    if marca_anterior is not None:
+        desde = (datetime.fromisoformat(marca["inicio"]) if marca.get("inicio")
+                 else marca_anterior.generation_time.replace(tzinfo=None))
+        filtro = {"reaplicado_em": {"$gte": desde, "$lt": agora}, "_id": {"$lt": marca_anterior}}
+        if db.frequencias.find_one(filtro, {"_id": 1}):
+            tarefas.append((exportar_frequencias_reaplicadas, (str(marca_anterior), desde, agora)))
+    return tarefas
+
+
+def exportar(config: ConfiguracaoExportacao, mongodb_url: str, database: str, completa: bool = False) -> Dict[str, int]:
+    """Executa uma exportação (incremental, a menos que ``completa``) e avança a marca d'água"""
+    if pa is None:
+        raise RuntimeError("A exportação colunar requer o pacote pyarrow (pip install pyarrow)")
+    if config.formato == "arrow" and config.compressao not in COMPRESSOES_ARROW:
+        raise ValueError(f"Arrow IPC aceita apenas as compressões {', '.join(COMPRESSOES_ARROW)}")
+    os.makedirs(config.destino, exist_ok=True)
+
+    marca = {} if completa else ler_marca(config.destino)
+    if marca and marca.get("formato") != config.formato:
+        marca = {}  # Mudou o formato: as partições precisam ser regravadas
+    if not marca:
+        # Exportação completa: partes de frequências de execuções anteriores duplicariam as linhas
+        shutil.rmtree(os.path.join(config.destino, "frequencias"), ignore_errors=True)
+    # Margem: inserções ainda em andamento podem ter _id um pouco anterior ao instante atual
+    agora = datetime.utcnow()
+    limite = ObjectId.from_datetime(agora - timedelta(seconds=config.margem_s))
+
+    client = MongoClient(mongodb_url)
+    try:
+        tarefas = planejar(client[database], config, marca, limite, agora)
+    finally:
+        client.close()
+
+    linhas: Dict[str, int] = {}
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=config.workers, mp_context=contexto,
+                             initializer=_iniciar_worker, initargs=(mongodb_url, database, config)) as executor:
+        futuros = {executor.submit(funcao, *argumentos): (funcao, argumentos) for funcao, argumentos in tarefas}
+        for futuro in as_completed(futuros):
+            funcao, argumentos = futuros[futuro]
+            nome = f"{funcao.__name__}({', '.join(str(a) for a in argumentos[:1])})"
+            linhas[nome] = futuro.result()  # Uma falha interrompe sem avançar a marca
+            print(f"   {nome}: {linhas[nome]} linhas")
+
+    gravar_marca(config.destino, {
+        "limite": str(limite),
+        "inicio": agora.isoformat(),
+        "formato": config.formato,
+        "executado_em": datetime.utcnow().isoformat(),
+    })
+    return linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta os dados do RotaFácil para Parquet/Arrow particionado por mês")
+    parser.add_argument("--destino", default=settings.EXPORTACAO_DIR)
+    parser.add_argument("--formato", choices=EXTENSOES, default=settings.EXPORTACAO_FORMATO)
+    parser.add_argument("--compressao", default=settings.EXPORTACAO_COMPRESSAO)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--completa", action="store_true", help="Ignora a marca d'água e exporta tudo")
+    parser.add_argument("--mongodb-url", default=settings.MONGODB_URL)
+    parser.add_argument("--database", default=settings.DATABASE_NAME)
+    args = parser.parse_args()
+
+    config = ConfiguracaoExportacao(
+        destino=args.destino, formato=args.formato, compressao=args.compressao, workers=args.workers
+    )
+    print(f"📦 Exportando {args.database} para {config.destino} ({config.formato}, {config.compressao})")
+    inicio = time.perf_counter()
+    linhas = exportar(config, args.mongodb_url, args.database, args.completa)
+    print(f"✅ {sum(linhas.values())} linhas em {len(linhas)} tarefas, {time.perf_counter() - inicio:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Índices e migrações de dados executados na inicialização da aplicação.
+
+Todas as operações são idempotentes: podem rodar a cada start sem
+efeito colateral quando o banco já está atualizado. Cada índice e cada
+migração roda isoladamente: uma falha é registrada com o nome do passo
+e não impede os demais.
+
+A remoção de frequências duplicadas apaga dados e por isso nunca roda
+sozinha: enquanto houver duplicatas o índice único
+``aluno_viagem_tipo_unique`` não é criado (fica registrado no log) até
+que a remoção seja executada explicitamente::
+
+    python -m app.migrations --deduplicar-frequencias
+
+Os registros removidos são gravados antes em um arquivo NDJSON
+(``--arquivo``), de onde podem ser recuperados.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime
+
+from bson import json_util
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING
+
+from .core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# (coleção, chaves, opções) dos índices usados pelas consultas da API
+INDICES = [
+    ("rotas", [("num_pontos", DESCENDING)], {"name": "num_pontos_desc"}),
+    ("frequencias",
+     [("aluno_id", ASCENDING), ("viagem_id", ASCENDING), ("tipo_registro", ASCENDING)],
+     {"name": "aluno_viagem_tipo_unique", "unique": True}),
+    # Trajetos: um documento (bucket) por viagem e hora
+    ("trajetos", [("viagem_id", ASCENDING), ("hora", ASCENDING)],
+     {"name": "viagem_hora_unique", "unique": True}),
+    # Manifestos: um documento por motorista e dia, corrigido por viagem, rota, veículo e aluno
+    ("manifestos", [("motorista_id", ASCENDING), ("data", ASCENDING)],
+     {"name": "motorista_data_unique", "unique": True}),
+    ("manifestos", [("data", ASCENDING)], {"name": "data"}),
+    ("manifestos", [("viagens.viagem_id", ASCENDING)], {"name": "viagens_viagem_id"}),
+    # Montagem dos manifestos: viagens do dia e embarques recentes de cada rota
+    ("viagens", [("data_viagem", ASCENDING)], {"name": "data_viagem"}),
+    ("viagens", [("rota_id", ASCENDING), ("data_viagem", ASCENDING)], {"name": "rota_data_viagem"}),
+    ("frequencias", [("viagem_id", ASCENDING), ("tipo_registro", ASCENDING)], {"name": "viagem_tipo"}),
+    # Exportação colunar: frequências reaplicadas do spool com _id anterior à marca d'água
+    ("frequencias", [("reaplicado_em", ASCENDING)], {"name": "reaplicado_em", "sparse": True}),
+    # Conflitos de agendamento: viagens de cada motorista e veículo no período
+    ("viagens", [("motorista_id", ASCENDING), ("data_viagem", ASCENDING)], {"name": "motorista_data_viagem"}),
+    ("viagens", [("veiculo_id", ASCENDING), ("data_viagem", ASCENDING)], {"name": "veiculo_data_viagem"}),
+    # Ocupação: painel de viagens do dia (e só as lotadas)
+    ("ocupacao_viagens", [("data_viagem", ASCENDING), ("lotada", ASCENDING)], {"name": "data_viagem_lotada"}),
+]
+
+
+INDICE_FREQUENCIA_UNICA = "aluno_viagem_tipo_unique"
+
+_GRUPOS_DUPLICADOS = [
+    {"$group": {
+        "_id": {"aluno_id": "$aluno_id", "viagem_id": "$viagem_id", "tipo_registro": "$tipo_registro"},
+        "ids": {"$push": "$_id"},
+        "total": {"$sum": 1},
+    }},
+    {"$match": {"total": {"$gt": 1}}},
+]
+
+
+async def tem_frequencias_duplicadas(database) -> bool:
+    """Indica se há frequências repetidas (aluno, viagem, tipo) que impedem o índice único"""
+    cursor = database.frequencias.aggregate(_GRUPOS_DUPLICADOS + [{"$limit": 1}], allowDiskUse=True)
+    async for _ in cursor:
+        return True
+    return False
+
+
+async def ensure_indexes(database) -> list:
+    """Cria os índices usados pelas consultas da API; retorna os nomes dos que falharam"""
+    falhas = []
+    for colecao, chaves, opcoes in INDICES:
+        try:
+            if opcoes["name"] == INDICE_FREQUENCIA_UNICA \
+                    and INDICE_FREQUENCIA_UNICA not in await database.frequencias.index_information() \
+                    and await tem_frequencias_duplicadas(database):
+                logger.warning(f"Índice frequencias.{INDICE_FREQUENCIA_UNICA} não criado: há frequências "
+                               "duplicadas; execute python -m app.migrations --deduplicar-frequencias")
+                continue
+            await database[colecao].create_index(chaves, **opcoes)
+        except Exception as e:
+            logger.error(f"Erro ao criar o índice {colecao}.{opcoes['name']}: {e}")
+            falhas.append(opcoes["name"])
+    return falhas
+
+
+async def _exportar_e_remover(database, ids: list, arquivo) -> int:
+    """Grava as frequências no arquivo (com fsync) e só então as remove do banco"""
+    async for frequencia in database.frequencias.find({"_id": {"$in": ids}}):
+        arquivo.write(json_util.dumps(frequencia) + "\n")
+    arquivo.flush()
+    os.fsync(arquivo.fileno())
+    return (await database.frequencias.delete_many({"_id": {"$in": ids}})).deleted_count
+
+
+async def deduplicar_frequencias(database, caminho: str, tamanho_lote: int = 1000) -> int:
+    """
+    Remove frequências repetidas (aluno, viagem, tipo) para que o índice
+    único possa ser criado; mantém o registro recebido primeiro (menor ``_id``).
+    Os removidos são gravados antes em ``caminho`` (NDJSON, acrescentado).
+    Não faz nada se o índice já existe.
+    """
+    if INDICE_FREQUENCIA_UNICA in await database.frequencias.index_information():
+        return 0
+    cursor = database.frequencias.aggregate(_GRUPOS_DUPLICADOS, allowDiskUse=True)
+    removidas = 0
+    excedentes = []
+    with open(caminho, "a", encoding="utf-8") as arquivo:
+        async for grupo in cursor:
+            excedentes.extend(sorted(grupo["ids"])[1:])
+            if len(excedentes) >= tamanho_lote:
+                removidas += await _exportar_e_remover(database, excedentes, arquivo)
+                excedentes = []
+        if excedentes:
+            removidas += await _exportar_e_remover(database, excedentes, arquivo)
+    if removidas:
+        logger.warning(f"Migração frequências: {removidas} registros duplicados removidos (cópia em {caminho})")
+    return removidas
+
+
+async def backfill_num_pontos(database) -> int:
+    """Preenche ``num_pontos`` nas rotas criadas antes do campo existir"""
+    result = await database.rotas.update_many(
+        {"num_pontos": {"$exists": False}},
+        [{"$set": {"num_pontos": {"$size": {"$ifNull": ["$pontos_de_parada", []]}}}}]
+    )
+    return result.modified_count
+
+
+async def run_migrations(database) -> bool:
+    """Executa índices e backfills pendentes; retorna False se algum passo falhou"""
+    # Falha de migração não deve impedir a API de atender requisições
+    ok = not await ensure_indexes(database)
+    try:
+        atualizadas = await backfill_num_pontos(database)
+        if atualizadas:
+            logger.info(f"Migração num_pontos: {atualizadas} rotas atualizadas")
+    except Exception as e:
+        logger.error(f"Erro na migração num_pontos: {e}")
+        ok = False
+    if not ok:
+        logger.error("Migrações concluídas com falhas; veja os erros acima")
+    return ok
+
+
+async def _executar(args):
+    client = AsyncIOMotorClient(args.mongodb_url)
+    try:
+        database = client[args.database]
+        if args.deduplicar_frequencias:
+            removidas = await deduplicar_frequencias(database, args.arquivo)
+            print(f"   frequências duplicadas removidas: {removidas} (cópia em {args.arquivo})")
+        return await run_migrations(database)
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cria os índices e executa as migrações do RotaFácil")
+    parser.add_argument("--deduplicar-frequencias", action="store_true",
+                        help="Remove as frequências duplicadas (mantém a primeira) antes de criar os índices")
+    parser.add_argument("--arquivo", default=f"frequencias_duplicadas-{datetime.now():%Y%m%d%H%M%S}.ndjson",
+                        help="Onde gravar as frequências removidas")
+    parser.add_argument("--mongodb-url", default=settings.MONGODB_URL)
+    parser.add_argument("--database", default=settings.DATABASE_NAME)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print(f"🗄️ Executando migrações em {args.database}")
+    if not asyncio.run(_executar(args)):
+        raise SystemExit("❌ Migrações concluídas com falhas; veja os erros acima")
+    print("✅ Migrações concluídas")
+
+
+if __name__ == "__main__":
+    main()
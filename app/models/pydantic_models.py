@@ -221,12 +221,32 @@ class RotaUpdate(BaseModel):
             raise ValueError('Uma rota deve ter pelo menos 2 pontos de parada')
         return v
 
+# Geometria pré-calculada da rota (armazenada no documento)
+class GeometriaRota(BaseModel):
+    distancia_total_km: float
+    distancias_segmentos_km: List[float]
+    bbox: List[float]  # [min_lon, min_lat, max_lon, max_lat]
+    polyline: str
+
 class Rota(BaseDocument):
     nome_rota: str
     descricao: str
     turno: str
     ativa: bool
     pontos_de_parada: List[PontoDeParada]
+    num_pontos: Optional[int] = None
+    geometria: Optional[GeometriaRota] = None
+
+# Modelo para resultado da otimização da ordem dos pontos de parada
+class ResultadoOtimizacaoRota(BaseModel):
+    rota_id: str
+    nome_rota: str
+    pontos_de_parada: List[PontoDeParada]
+    distancia_original_km: float
+    distancia_otimizada_km: float
+    economia_km: float
+    ordem_alterada: bool
+    aplicada: bool = False
 
 # Modelos para Incidentes (embutidos em Viagem)
 class Incidente(BaseModel):
@@ -259,6 +279,70 @@ class Viagem(BaseDocument):
     veiculo_id: PyObjectId
     incidentes: List[Incidente] = []
 
+# Modelos para geração da escala recorrente de viagens
+class AtribuicaoEscala(BaseModel):
+    rota_id: PyObjectId
+    motorista_id: PyObjectId
+    veiculo_id: PyObjectId
+    dias_semana: List[int] = Field([0, 1, 2, 3, 4], min_length=1, description="0 = segunda-feira")
+
+    @field_validator('dias_semana')
+    @classmethod
+    def validate_dias_semana(cls, v):
+        if any(dia < 0 or dia > 6 for dia in v):
+            raise ValueError('Dias da semana devem estar entre 0 (segunda) e 6 (domingo)')
+        return sorted(set(v))
+
+class EscalaViagensRequest(BaseModel):
+    data_inicio: date
+    data_fim: date
+    atribuicoes: List[AtribuicaoEscala] = Field(..., min_length=1, max_length=5000)
+    turnos: Optional[List[str]] = None
+    feriados: List[date] = []
+    pular_conflitos: bool = Field(False, description="Gerar o restante da escala ignorando as viagens em conflito")
+
+    @field_validator('data_fim')
+    @classmethod
+    def validate_periodo(cls, v, info):
+        inicio = info.data.get('data_inicio')
+        if inicio and v < inicio:
+            raise ValueError('data_fim deve ser igual ou posterior a data_inicio')
+        if inicio and (v - inicio).days > 366:
+            raise ValueError('O período da escala não pode passar de um ano')
+        return v
+
+class ConflitoEscala(BaseModel):
+    tipo: str
+    recurso_id: str
+    rota_id: str
+    data_viagem: date
+    turno: Optional[str] = None
+    viagem_conflitante_id: Optional[str] = None
+
+class EscalaViagensResponse(BaseModel):
+    dry_run: bool
+    dias_com_viagem: int
+    criadas: int
+    existentes: int
+    atribuicoes_fora_dos_turnos: int
+    conflitos: int = 0
+    amostra: List[ViagemCreate] = []
+    amostra_conflitos: List[ConflitoEscala] = []
+
+# Ocupação da viagem (alunos a bordo x capacidade do veículo)
+class OcupacaoViagem(BaseModel):
+    viagem_id: str
+    rota_id: str
+    veiculo_id: str
+    data_viagem: date
+    embarques: int = 0
+    desembarques: int = 0
+    a_bordo: int = 0
+    capacidade: Optional[int] = None
+    taxa_ocupacao: Optional[float] = None
+    lotada: bool = False
+    atualizado_em: Optional[datetime] = None
+
 # Modelos para Frequência
 class FrequenciaCreate(BaseModel):
     aluno_id: PyObjectId
@@ -278,6 +362,32 @@ class Frequencia(BaseDocument):
     data_hora_embarque: datetime
     tipo_registro: TipoRegistro
 
+class FrequenciaLote(BaseModel):
+    eventos: List[FrequenciaCreate] = Field(..., min_length=1, max_length=5000)
+
+class IngestaoFrequenciaResponse(BaseModel):
+    aceitos: int
+    fila: int
+
+# Posições GPS dos veículos durante a viagem
+class PosicaoGPS(BaseModel):
+    lat: float = Field(..., ge=-90, le=90)
+    lon: float = Field(..., ge=-180, le=180)
+    data_hora: datetime
+    velocidade_kmh: Optional[float] = Field(None, ge=0, le=200)
+    direcao: Optional[float] = Field(None, ge=0, lt=360)
+
+class LotePosicoes(BaseModel):
+    pontos: List[PosicaoGPS] = Field(..., min_length=1, max_length=1000)
+
+class IngestaoPosicoesResponse(BaseModel):
+    aceitos: int
+    descartados: int
+
+class PosicaoViagem(PosicaoGPS):
+    viagem_id: str
+    recebido_em: datetime
+
 # Modelo para Viagem Detalhada (com informações relacionadas)
 class ViagemDetalhada(BaseModel):
     id: PyObjectId = Field(alias="_id")
@@ -293,6 +403,51 @@ class ViagemDetalhada(BaseModel):
         json_encoders={ObjectId: str}
     )
 
+# Modelos para o Manifesto diário do motorista (documento pré-calculado)
+class ManifestoRota(BaseModel):
+    id: str
+    nome_rota: str
+    turno: str
+    pontos_de_parada: List[PontoDeParada]
+    geometria: Optional[GeometriaRota] = None
+
+class ManifestoVeiculo(BaseModel):
+    id: str
+    placa: str
+    modelo: str
+    capacidade_passageiros: int
+    adaptado_pcd: bool
+    status_manutencao: StatusVeiculo
+
+class ManifestoAluno(BaseModel):
+    id: str
+    nome_completo: str
+    matricula: str
+    telefone: Optional[str] = None
+    necessidade_especial: Optional[str] = None
+    ponto_embarque_preferencial_id: Optional[str] = None
+
+class ManifestoMotoristaInfo(BaseModel):
+    id: str
+    nome_completo: str
+    cnh: str
+
+class ManifestoViagem(BaseModel):
+    viagem_id: str
+    status: StatusViagem
+    rota: Optional[ManifestoRota] = None
+    veiculo: Optional[ManifestoVeiculo] = None
+    alunos_esperados: List[ManifestoAluno] = []
+    incidentes: List[Incidente] = []
+
+class ManifestoMotorista(BaseModel):
+    motorista_id: str
+    data: date
+    versao: int
+    gerado_em: datetime
+    motorista: ManifestoMotoristaInfo
+    viagens: List[ManifestoViagem] = []
+
 # Modelos para Paginação
 class PaginatedResponse(BaseModel):
     items: List[Any]
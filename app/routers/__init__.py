@@ -3,4 +3,8 @@ from . import router_motorista
 from . import router_veiculo
 from . import router_rota
 from . import router_viagem
-from . import router_auth 
\ No newline at end of file
+from . import router_auth 
+from . import router_frequencia
+from . import router_admin
+from . import router_eventos
+from . import router_relatorio
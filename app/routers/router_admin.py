@@ -0,0 +1,50 @@
+from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi.responses import PlainTextResponse
+
+from ..core.consultas_lentas import consultas_lentas
+from ..core.profiler import amostrador
+from ..core.monitor_loop import monitor_loop
+from ..core.server_timing import RotaCronometrada
+from .router_auth import exigir_admin
+
+router = APIRouter(prefix="/admin", tags=["Administração"], dependencies=[Depends(exigir_admin)], route_class=RotaCronometrada)
+
+# Consultas que passaram do limiar de lentidão, com resumo do explain
+@router.get("/consultas-lentas")
+async def listar_consultas_lentas(
+    limit: int = Query(50, ge=1, le=1000, description="Quantidade máxima de registros")
+):
+    """Listar as consultas lentas mais recentes (valores dos filtros ocultos)"""
+    return {
+        "limiar_ms": consultas_lentas.limiar_micros // 1000,
+        "registros": consultas_lentas.listar(limit)
+    }
+
+# Profiler estatístico de todo o tráfego do worker por N segundos
+@router.post("/perfil", response_class=PlainTextResponse)
+async def perfilar_trafego(
+    segundos: float = Query(10, gt=0, le=60, description="Duração da amostragem em segundos")
+):
+    """Amostrar o event loop e retornar as pilhas no formato collapsed (flame graph)"""
+    perfil = await amostrador.perfil_global(segundos)
+    return PlainTextResponse(perfil.collapsed(), headers={"X-Profile-Id": perfil.id})
+
+# Perfil de uma requisição feita com o cabeçalho X-Profile: 1
+@router.get("/perfis/{perfil_id}", response_class=PlainTextResponse)
+async def obter_perfil(perfil_id: str):
+    """Obter as pilhas (formato collapsed) de um perfil concluído"""
+    perfil = amostrador.obter(perfil_id)
+    if not perfil:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+    return PlainTextResponse(perfil.collapsed())
+
+# Bloqueios recentes do event loop com a pilha do callback bloqueante
+@router.get("/loop-bloqueios")
+async def listar_bloqueios_loop(
+    limit: int = Query(50, ge=1, le=1000, description="Quantidade máxima de registros")
+):
+    """Listar os bloqueios do event loop acima do limiar configurado"""
+    return {
+        "limiar_ms": monitor_loop.limiar * 1000,
+        "registros": monitor_loop.listar(limit)
+    }
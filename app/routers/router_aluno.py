@@ -1,16 +1,19 @@
 from fastapi import APIRouter, HTTPException, Query, Depends
 from typing import List, Optional, Any
 from bson import ObjectId
+from pymongo.errors import ConnectionFailure
 
-from ..database import get_database
+from ..database import exigir_database
 from ..models.pydantic_models import (
     Aluno, AlunoCreate, AlunoUpdate, PaginatedResponse
 )
 from ..services.crud_services import CRUDService
+from ..services.manifestos import ManifestoService
+from ..core.server_timing import RotaCronometrada
 
-router = APIRouter(prefix="/alunos", tags=["Alunos"])
+router = APIRouter(prefix="/alunos", tags=["Alunos"], route_class=RotaCronometrada)
 
-def get_crud_service(db: Any = Depends(get_database)) -> CRUDService:
+def get_crud_service(db: Any = Depends(exigir_database)) -> CRUDService:
     return CRUDService(db)
 
 # F1: Inserir uma entidade
@@ -22,6 +25,8 @@ async def criar_aluno(
     """Criar um novo aluno"""
     try:
         return await crud.create_aluno(aluno)
+    except ConnectionFailure:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Erro ao criar aluno: {str(e)}")
 
@@ -56,6 +61,7 @@ async def atualizar_aluno(
     aluno = await crud.update_aluno(aluno_id, aluno_update)
     if not aluno:
         raise HTTPException(status_code=404, detail="Aluno não encontrado")
+    await ManifestoService(crud.db).atualizar_aluno(aluno)
     return aluno
 
 # F3: CRUD completo - DELETE
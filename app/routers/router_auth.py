@@ -4,23 +4,27 @@ from typing import Any, Optional
 from datetime import datetime, timedelta
 import jwt
 from bson import ObjectId
+from pymongo.errors import ConnectionFailure
 
-from ..database import get_database
+from ..database import exigir_database
 from ..models.pydantic_models import LoginRequest, LoginResponse, UserInfo
 from ..core.config import settings
+from ..core.server_timing import RotaCronometrada
 
-router = APIRouter(prefix="/auth", tags=["Autenticação"])
+router = APIRouter(prefix="/auth", tags=["Autenticação"], route_class=RotaCronometrada)
 
 # Configuração do esquema OAuth2 para JWT
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
-def get_crud_service(db: Any = Depends(get_database)):
+def get_crud_service(db: Any = Depends(exigir_database)):
     from ..services.crud_services import CRUDService
     return CRUDService(db)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Criar token JWT"""
     to_encode = data.copy()
+    if to_encode.get("email", "").lower() in settings.ADMIN_EMAILS:
+        to_encode["admin"] = True
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
@@ -30,6 +34,18 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+def exigir_admin(token: str = Depends(oauth2_scheme)) -> dict:
+    """Dependência que exige um token JWT válido de administrador"""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Token expirado")
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Token inválido")
+    if not payload.get("admin"):
+        raise HTTPException(status_code=403, detail="Acesso restrito a administradores")
+    return payload
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verificar senha com bcrypt"""
     from passlib.context import CryptContext
@@ -89,6 +105,8 @@ async def login(
             detail="Email ou senha incorretos"
         )
         
+    except ConnectionFailure:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -112,6 +130,8 @@ async def register_aluno(
         login_data = LoginRequest(email=aluno_data["email"], senha=aluno_data["senha"])
         return await login(login_data, crud)
         
+    except ConnectionFailure:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=400,
@@ -135,6 +155,8 @@ async def register_motorista(
         login_data = LoginRequest(email=motorista_data["email"], senha=motorista_data["senha"])
         return await login(login_data, crud)
         
+    except ConnectionFailure:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=400,
@@ -180,5 +202,7 @@ async def get_current_user(
         raise HTTPException(status_code=401, detail="Token expirado")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Token inválido")
+    except ConnectionFailure:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao obter usuário: {str(e)}") 
\ No newline at end of file
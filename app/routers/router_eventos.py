@@ -0,0 +1,91 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, Query, WebSocket, status
+from fastapi.responses import StreamingResponse
+from typing import List
+
+from ..core.config import settings
+from ..services.eventos_viagem import (
+    difusor_eventos, AssinanteLento, LimiteAssinantesError
+)
+from ..core.server_timing import RotaCronometrada
+
+router = APIRouter(prefix="/eventos", tags=["Eventos"], route_class=RotaCronometrada)
+
+async def _fluxo_sse(viagens: List[str], rotas: List[str]):
+    # A assinatura é feita dentro do gerador para que o finally sempre a cancele
+    try:
+        assinante = difusor_eventos.assinar(viagens, rotas, "sse")
+    except LimiteAssinantesError:
+        yield 'event: encerrado\ndata: {"motivo": "limite de assinantes"}\n\n'
+        return
+    try:
+        yield "retry: 3000\n\n"
+        while not assinante.encerrado:
+            mensagens = await assinante.aguardar(settings.EVENTOS_HEARTBEAT_S)
+            if mensagens:
+                yield "".join(mensagem.sse for mensagem in mensagens)
+            else:
+                # Comentário SSE: mantém a conexão aberta em proxies com timeout de inatividade
+                yield ": keepalive\n\n"
+    except AssinanteLento:
+        yield 'event: encerrado\ndata: {"motivo": "assinante lento"}\n\n'
+    finally:
+        difusor_eventos.cancelar(assinante)
+
+# Assinatura via Server-Sent Events
+@router.get("/sse")
+async def assinar_eventos_sse(
+    viagem_id: List[str] = Query([], description="Viagens a acompanhar"),
+    rota_id: List[str] = Query([], description="Rotas a acompanhar")
+):
+    """Receber mudanças de status, incidentes e embarques das viagens ou rotas (text/event-stream)"""
+    if not viagem_id and not rota_id:
+        raise HTTPException(status_code=400, detail="Informe ao menos um viagem_id ou rota_id")
+    if difusor_eventos.lotado:
+        raise HTTPException(status_code=503, detail="Limite de assinantes atingido neste servidor",
+                            headers={"Retry-After": "5"})
+    return StreamingResponse(
+        _fluxo_sse(viagem_id, rota_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Assinatura via WebSocket
+@router.websocket("/ws")
+async def assinar_eventos_ws(
+    websocket: WebSocket,
+    viagem_id: List[str] = Query([]),
+    rota_id: List[str] = Query([])
+):
+    """Receber os mesmos eventos do SSE, um JSON por mensagem"""
+    if not viagem_id and not rota_id:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    try:
+        assinante = difusor_eventos.assinar(viagem_id, rota_id, "websocket")
+    except LimiteAssinantesError:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+
+    async def receber():
+        # O cliente não envia comandos; só interessa saber quando desconecta
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+        assinante.encerrar()
+
+    receptor = None
+    # O try começa logo após assinar: se o handshake falhar, a assinatura é cancelada
+    try:
+        await websocket.accept()
+        receptor = asyncio.create_task(receber())
+        while not assinante.encerrado:
+            for mensagem in await assinante.aguardar():
+                await websocket.send_text(mensagem.json)
+    except AssinanteLento:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="assinante lento")
+    except Exception:
+        pass  # Conexão encerrada durante o envio
+    finally:
+        if receptor is not None:
+            receptor.cancel()
+        difusor_eventos.cancelar(assinante)
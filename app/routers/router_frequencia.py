@@ -0,0 +1,86 @@
+from fastapi import APIRouter, HTTPException, Query, Depends
+from typing import List, Any
+
+from ..database import exigir_database
+from ..models.pydantic_models import (
+    Frequencia, FrequenciaCreate, FrequenciaLote,
+    IngestaoFrequenciaResponse, PaginatedResponse
+)
+from ..services.crud_services import CRUDService
+from ..services.ingestao_frequencias import ingestor_frequencias, FilaCheiaError
+from ..core.server_timing import RotaCronometrada
+
+router = APIRouter(prefix="/frequencias", tags=["Frequências"], route_class=RotaCronometrada)
+
+def get_crud_service(db: Any = Depends(exigir_database)) -> CRUDService:
+    return CRUDService(db)
+
+async def _enfileirar(eventos: List[FrequenciaCreate]) -> IngestaoFrequenciaResponse:
+    try:
+        aceitos = ingestor_frequencias.enfileirar(eventos)
+    except FilaCheiaError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    return IngestaoFrequenciaResponse(aceitos=aceitos, fila=ingestor_frequencias.tamanho_fila)
+
+# F1: Registrar um evento de embarque/desembarque (gravação assíncrona em lote)
+@router.post("/", response_model=IngestaoFrequenciaResponse, status_code=202)
+async def registrar_frequencia(frequencia: FrequenciaCreate):
+    """Registrar um evento de frequência (idempotente por aluno, viagem e tipo)"""
+    return await _enfileirar([frequencia])
+
+# Registro em lote de eventos de frequência
+@router.post("/lote", response_model=IngestaoFrequenciaResponse, status_code=202)
+async def registrar_frequencias_lote(lote: FrequenciaLote):
+    """Registrar vários eventos de frequência de uma só vez"""
+    return await _enfileirar(lote.eventos)
+
+# F2: Listar todas as entidades
+@router.get("/", response_model=List[Frequencia])
+async def listar_frequencias(
+    crud: CRUDService = Depends(get_crud_service)
+):
+    """Listar todas as frequências"""
+    return await crud.get_frequencias()
+
+# F4: Mostrar quantidade de entidades
+@router.get("/quantidade/total")
+async def contar_frequencias(
+    crud: CRUDService = Depends(get_crud_service)
+):
+    """Contar total de frequências"""
+    total = await crud.count_frequencias()
+    return {"total_frequencias": total}
+
+# F5: Implementar paginação
+@router.get("/pagina/", response_model=PaginatedResponse)
+async def listar_frequencias_paginadas(
+    page: int = Query(0, ge=0, description="Número da página (começa em 0)"),
+    limit: int = Query(10, ge=1, le=100, description="Itens por página"),
+    crud: CRUDService = Depends(get_crud_service)
+):
+    """Listar frequências com paginação"""
+    return await crud.get_paginated("frequencias", page, limit)
+
+# F3: CRUD completo - GET por ID
+@router.get("/{frequencia_id}", response_model=Frequencia)
+async def obter_frequencia(
+    frequencia_id: str,
+    crud: CRUDService = Depends(get_crud_service)
+):
+    """Obter uma frequência específica por ID"""
+    frequencia = await crud.get_frequencia(frequencia_id)
+    if not frequencia:
+        raise HTTPException(status_code=404, detail="Frequência não encontrada")
+    return frequencia
+
+# F3: CRUD completo - DELETE
+@router.delete("/{frequencia_id}")
+async def deletar_frequencia(
+    frequencia_id: str,
+    crud: CRUDService = Depends(get_crud_service)
+):
+    """Deletar uma frequência"""
+    success = await crud.delete_frequencia(frequencia_id)
+    if not success:
+        raise HTTPException(status_code=404, detail="Frequência não encontrada")
+    return {"message": "Frequência deletada com sucesso"}
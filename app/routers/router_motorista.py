@@ -1,15 +1,19 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends, Request, Response
 from typing import List, Optional, Any
+from datetime import date
+from pymongo.errors import ConnectionFailure
 
-from ..database import get_database
+from ..database import exigir_database
 from ..models.pydantic_models import (
-    Motorista, MotoristaCreate, MotoristaUpdate, PaginatedResponse
+    Motorista, MotoristaCreate, MotoristaUpdate, PaginatedResponse, ManifestoMotorista
 )
 from ..services.crud_services import CRUDService
+from ..services.manifestos import ManifestoService
+from ..core.server_timing import RotaCronometrada
 
-router = APIRouter(prefix="/motoristas", tags=["Motoristas"])
+router = APIRouter(prefix="/motoristas", tags=["Motoristas"], route_class=RotaCronometrada)
 
-def get_crud_service(db: Any = Depends(get_database)) -> CRUDService:
+def get_crud_service(db: Any = Depends(exigir_database)) -> CRUDService:
     return CRUDService(db)
 
 # F1: Inserir uma entidade
@@ -21,6 +25,8 @@ async def criar_motorista(
     """Criar um novo motorista"""
     try:
         return await crud.create_motorista(motorista)
+    except ConnectionFailure:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Erro ao criar motorista: {str(e)}")
 
@@ -109,6 +115,26 @@ async def obter_motorista(
         raise HTTPException(status_code=404, detail="Motorista não encontrado")
     return motorista
 
+# Manifesto do dia (documento pré-calculado: viagens, rota, veículo e alunos esperados)
+@router.get("/{motorista_id}/manifesto", response_model=ManifestoMotorista)
+async def obter_manifesto(
+    request: Request,
+    response: Response,
+    motorista_id: str,
+    data: Optional[date] = Query(None, description="Dia do manifesto (padrão: hoje)"),
+    db: Any = Depends(exigir_database)
+):
+    """Obter o manifesto diário do motorista (ETag por versão)"""
+    manifesto = await ManifestoService(db).obter(motorista_id, data or date.today())
+    if not manifesto:
+        raise HTTPException(status_code=404, detail="Motorista não encontrado")
+    etag = f'W/"{manifesto["versao"]}-{manifesto["gerado_em"].timestamp():.0f}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return manifesto
+
 # F3: CRUD completo - PUT (atualizar)
 @router.put("/{motorista_id}", response_model=Motorista)
 async def atualizar_motorista(
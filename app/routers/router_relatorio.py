@@ -0,0 +1,34 @@
+from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi.responses import StreamingResponse
+from typing import Optional, Any
+from datetime import date
+
+from bson import ObjectId
+
+from ..database import exigir_database
+from ..services.relatorios import RelatorioFrequencia, exportar_frequencia, FORMATOS
+from ..core.server_timing import RotaCronometrada
+
+router = APIRouter(prefix="/relatorios", tags=["Relatórios"], route_class=RotaCronometrada)
+
+# Frequência do período exportada em fluxo (memória constante, sem limite de linhas)
+@router.get("/frequencia")
+async def exportar_relatorio_frequencia(
+    inicio: date = Query(..., description="Primeiro dia das viagens"),
+    fim: date = Query(..., description="Último dia das viagens"),
+    rota: Optional[str] = Query(None, description="Restringir a uma rota"),
+    formato: str = Query("csv", pattern="^(csv|ndjson)$", description="csv ou ndjson"),
+    db: Any = Depends(exigir_database)
+):
+    """Exportar os embarques e desembarques de cada aluno nas viagens do período"""
+    if fim < inicio:
+        raise HTTPException(status_code=400, detail="fim deve ser igual ou posterior a inicio")
+    if rota is not None and not ObjectId.is_valid(rota):
+        raise HTTPException(status_code=400, detail="ID de rota inválido")
+    relatorio = RelatorioFrequencia(db, inicio, fim, rota)
+    nome = f"frequencia_{inicio.isoformat()}_{fim.isoformat()}.{formato}"
+    return StreamingResponse(
+        exportar_frequencia(relatorio, formato),
+        media_type=FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nome}"', "X-Accel-Buffering": "no"}
+    )
@@ -1,15 +1,20 @@
 from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi.responses import JSONResponse
 from typing import List, Optional, Any
+from bson import ObjectId
+from pymongo.errors import ConnectionFailure
 
-from ..database import get_database
+from ..database import exigir_database
 from ..models.pydantic_models import (
-    Rota, RotaCreate, RotaUpdate, PaginatedResponse
+    Rota, RotaCreate, RotaUpdate, PaginatedResponse, ResultadoOtimizacaoRota
 )
 from ..services.crud_services import CRUDService
+from ..services.manifestos import ManifestoService
+from ..core.server_timing import RotaCronometrada
 
-router = APIRouter(prefix="/rotas", tags=["Rotas"])
+router = APIRouter(prefix="/rotas", tags=["Rotas"], route_class=RotaCronometrada)
 
-def get_crud_service(db: Any = Depends(get_database)) -> CRUDService:
+def get_crud_service(db: Any = Depends(exigir_database)) -> CRUDService:
     return CRUDService(db)
 
 # F1: Inserir uma entidade
@@ -21,6 +26,8 @@ async def criar_rota(
     """Criar uma nova rota"""
     try:
         return await crud.create_rota(rota)
+    except ConnectionFailure:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Erro ao criar rota: {str(e)}")
 
@@ -40,12 +47,38 @@ async def listar_rotas_ativas(
     """Listar apenas rotas ativas"""
     try:
         return await crud.search_rotas(ativa=True)
+    except ConnectionFailure:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=503, 
             detail=f"Serviço temporariamente indisponível: {str(e)}"
         )
 
+# Otimização em lote da ordem dos pontos de todas as rotas ativas
+@router.post("/otimizar", response_model=List[ResultadoOtimizacaoRota])
+async def otimizar_rotas_ativas(
+    aplicar: bool = Query(False, description="Persistir a nova ordem dos pontos"),
+    crud: CRUDService = Depends(get_crud_service)
+):
+    """Calcular a ordem de visita otimizada para todas as rotas ativas"""
+    try:
+        resultados = await crud.otimizar_rotas_ativas(aplicar=aplicar)
+    except ConnectionFailure:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Serviço temporariamente indisponível: {str(e)}"
+        )
+    if aplicar:
+        manifestos = ManifestoService(crud.db)
+        for resultado in resultados:
+            rota = await crud.get_rota(resultado.rota_id)
+            if rota:
+                await manifestos.atualizar_rota(rota)
+    return resultados
+
 # F3: CRUD completo - GET por ID
 @router.get("/{rota_id}", response_model=Rota)
 async def obter_rota(
@@ -69,6 +102,7 @@ async def atualizar_rota(
     rota = await crud.update_rota(rota_id, rota_update)
     if not rota:
         raise HTTPException(status_code=404, detail="Rota não encontrada")
+    await ManifestoService(crud.db).atualizar_rota(rota)
     return rota
 
 # F3: CRUD completo - DELETE
@@ -83,6 +117,38 @@ async def deletar_rota(
         raise HTTPException(status_code=404, detail="Rota não encontrada")
     return {"message": "Rota deletada com sucesso"}
 
+# Geometria pré-calculada da rota em GeoJSON
+@router.get("/{rota_id}/geometria")
+async def obter_geometria_rota(
+    rota_id: str,
+    tolerancia_m: Optional[float] = Query(None, gt=0, description="Tolerância de simplificação em metros"),
+    crud: CRUDService = Depends(get_crud_service)
+):
+    """Obter a geometria da rota (LineString GeoJSON com distâncias e bbox)"""
+    geojson = await crud.get_geometria_rota(rota_id, tolerancia_m)
+    if not geojson:
+        raise HTTPException(status_code=404, detail="Rota não encontrada")
+    return JSONResponse(content=geojson, media_type="application/geo+json")
+
+# Otimização da ordem dos pontos de parada de uma rota
+@router.post("/{rota_id}/otimizar", response_model=ResultadoOtimizacaoRota)
+async def otimizar_rota(
+    rota_id: str,
+    aplicar: bool = Query(False, description="Persistir a nova ordem dos pontos"),
+    crud: CRUDService = Depends(get_crud_service)
+):
+    """Calcular a ordem de visita otimizada (início e fim fixos) de uma rota"""
+    if not ObjectId.is_valid(rota_id):
+        raise HTTPException(status_code=400, detail="ID de rota inválido")
+    resultado = await crud.otimizar_rota(rota_id, aplicar=aplicar)
+    if not resultado:
+        raise HTTPException(status_code=404, detail="Rota não encontrada")
+    if aplicar:
+        rota = await crud.get_rota(rota_id)
+        if rota:
+            await ManifestoService(crud.db).atualizar_rota(rota)
+    return resultado
+
 # F4: Mostrar quantidade de entidades
 @router.get("/quantidade/total")
 async def contar_rotas(
@@ -151,16 +217,8 @@ async def listar_rotas_por_turno(
 # Endpoint adicional: Rotas com mais pontos de parada
 @router.get("/mais-pontos/", response_model=List[Rota])
 async def listar_rotas_mais_pontos(
+    limit: int = Query(10, ge=1, le=100, description="Quantidade máxima de rotas"),
     crud: CRUDService = Depends(get_crud_service)
 ):
     """Listar rotas ordenadas por número de pontos de parada (decrescente)"""
-    db = crud.db
-    
-    pipeline = [
-        {"$addFields": {"num_pontos": {"$size": "$pontos_de_parada"}}},
-        {"$sort": {"num_pontos": -1}}
-    ]
-    
-    cursor = db.rotas.aggregate(pipeline)
-    rotas = await cursor.to_list(length=100)
-    return [Rota(**rota) for rota in rotas] 
\ No newline at end of file
+    return await crud.get_rotas_mais_pontos(limit)
@@ -1,16 +1,21 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends, Request
 from typing import List, Optional, Any
+from pymongo.errors import ConnectionFailure
 
-from ..database import get_database
+from ..database import exigir_database
 from ..models.pydantic_models import (
     Veiculo, VeiculoCreate, VeiculoUpdate, 
     PaginatedResponse, StatusVeiculo
 )
 from ..services.crud_services import CRUDService
+from ..services.manifestos import ManifestoService
+from ..services.orcamento_consultas import executar_com_orcamento
+from ..core.config import settings
+from ..core.server_timing import RotaCronometrada
 
-router = APIRouter(prefix="/veiculos", tags=["Veículos"])
+router = APIRouter(prefix="/veiculos", tags=["Veículos"], route_class=RotaCronometrada)
 
-def get_crud_service(db: Any = Depends(get_database)) -> CRUDService:
+def get_crud_service(db: Any = Depends(exigir_database)) -> CRUDService:
     return CRUDService(db)
 
 # F1: Inserir uma entidade
@@ -22,6 +27,8 @@ async def criar_veiculo(
     """Criar um novo veículo"""
     try:
         return await crud.create_veiculo(veiculo)
+    except ConnectionFailure:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Erro ao criar veículo: {str(e)}")
 
@@ -91,10 +98,18 @@ async def buscar_veiculos_por_texto(
 # F7: Consulta complexa - Estatísticas de veículos
 @router.get("/estatisticas/")
 async def obter_estatisticas_veiculos(
+    request: Request,
     crud: CRUDService = Depends(get_crud_service)
 ):
     """Obter estatísticas de uso dos veículos"""
-    return await crud.get_estatisticas_veiculos()
+    return await executar_com_orcamento(
+        request, crud.db,
+        lambda max_time_ms, comentario: crud.get_estatisticas_veiculos(
+            max_time_ms=max_time_ms, comentario=comentario
+        ),
+        settings.ORCAMENTO_ESTATISTICAS_VEICULOS_MS,
+        alternativa="Consulte as viagens por período em GET /api/v1/viagens/buscar/"
+    )
 
 # Endpoint adicional: Veículos disponíveis
 @router.get("/disponiveis/", response_model=List[Veiculo])
@@ -135,6 +150,7 @@ async def atualizar_veiculo(
     veiculo = await crud.update_veiculo(veiculo_id, veiculo_update)
     if not veiculo:
         raise HTTPException(status_code=404, detail="Veículo não encontrado")
+    await ManifestoService(crud.db).atualizar_veiculo(veiculo)
     return veiculo
 
 # F3: CRUD completo - DELETE
@@ -1,19 +1,44 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends, Request
+from fastapi.responses import JSONResponse
 from typing import List, Optional, Any
-from datetime import date
+from datetime import date, timedelta
+from pymongo.errors import ConnectionFailure
 
-from ..database import get_database
+from ..database import exigir_database, get_database
 from ..models.pydantic_models import (
     Viagem, ViagemCreate, ViagemUpdate, ViagemDetalhada,
-    PaginatedResponse, StatusViagem, Aluno
+    PaginatedResponse, StatusViagem, Aluno, Incidente,
+    PosicaoGPS, LotePosicoes, IngestaoPosicoesResponse, PosicaoViagem,
+    EscalaViagensRequest, EscalaViagensResponse, OcupacaoViagem
 )
-from ..services.crud_services import CRUDService
+from ..services.crud_services import CRUDService, IncidenteEmSpool
+from ..services.posicoes_veiculos import rastreador_posicoes, ViagemNaoRastreavel
+from ..services.eventos_viagem import difusor_eventos
+from ..services.manifestos import ManifestoService
+from ..services.escala_viagens import GeradorEscala, EscalaInvalida
+from ..services.conflitos_escala import ConflitoAgendamento, verificar_viagem
+from ..services.ocupacao_viagens import contador_ocupacao
+from ..services.orcamento_consultas import executar_com_orcamento
+from ..core.config import settings
+from ..core.server_timing import RotaCronometrada
 
-router = APIRouter(prefix="/viagens", tags=["Viagens"])
+router = APIRouter(prefix="/viagens", tags=["Viagens"], route_class=RotaCronometrada)
 
-def get_crud_service(db: Any = Depends(get_database)) -> CRUDService:
+CAMPOS_AGENDAMENTO = {"data_viagem", "rota_id", "motorista_id", "veiculo_id"}
+
+def get_crud_service(db: Any = Depends(exigir_database)) -> CRUDService:
+    return CRUDService(db)
+
+def get_crud_service_tolerante(db: Any = Depends(get_database)) -> CRUDService:
+    # Não falha com o banco indisponível: usado por gravações com fallback para o spool
     return CRUDService(db)
 
+def _erro_conflito(e: ConflitoAgendamento) -> HTTPException:
+    return HTTPException(status_code=409, detail={
+        "message": f"Motorista ou veículo indisponível: {e}",
+        "conflitos": [conflito.model_dump(mode="json") for conflito in e.conflitos],
+    })
+
 # F1: Inserir uma entidade
 @router.post("/", response_model=Viagem, status_code=201)
 async def criar_viagem(
@@ -21,10 +46,42 @@ async def criar_viagem(
     crud: CRUDService = Depends(get_crud_service)
 ):
     """Criar uma nova viagem"""
+    if viagem.status != StatusViagem.CANCELADA:
+        conflitos = await verificar_viagem(crud.db, viagem.model_dump())
+        if conflitos:
+            raise _erro_conflito(ConflitoAgendamento(conflitos))
     try:
-        return await crud.create_viagem(viagem)
+        criada = await crud.create_viagem(viagem)
+    except ConnectionFailure:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Erro ao criar viagem: {str(e)}")
+    await ManifestoService(crud.db).reconstruir_viagem(criada)
+    return criada
+
+# Geração em lote da escala recorrente (idempotente; dry_run só calcula)
+@router.post("/escala", response_model=EscalaViagensResponse)
+async def gerar_escala_viagens(
+    escala: EscalaViagensRequest,
+    dry_run: bool = Query(False, description="Apenas calcular o que seria criado"),
+    crud: CRUDService = Depends(get_crud_service)
+):
+    """Gerar as viagens de um período a partir das atribuições de rota, motorista e veículo"""
+    try:
+        resultado = await GeradorEscala(crud.db).gerar(escala, dry_run=dry_run)
+    except EscalaInvalida as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ConflitoAgendamento as e:
+        raise _erro_conflito(e)
+    if not dry_run and resultado.criadas:
+        # Manifestos já montados para os próximos dias passam a incluir as novas viagens
+        manifestos = ManifestoService(crud.db)
+        hoje = date.today()
+        for dias in range(settings.MANIFESTO_DIAS_ANTECEDENCIA + 1):
+            dia = hoje + timedelta(days=dias)
+            if escala.data_inicio <= dia <= escala.data_fim:
+                await manifestos.construir(dia)
+    return resultado
 
 # F2: Listar todas as entidades
 @router.get("/", response_model=List[Viagem])
@@ -75,12 +132,20 @@ async def buscar_viagens(
 # F7: Consulta complexa 3 - Viagens por período com estatísticas
 @router.get("/estatisticas/periodo/")
 async def obter_estatisticas_periodo(
+    request: Request,
     data_inicio: date = Query(..., description="Data de início do período"),
     data_fim: date = Query(..., description="Data de fim do período"),
     crud: CRUDService = Depends(get_crud_service)
 ):
     """Obter estatísticas de viagens por período"""
-    return await crud.get_viagens_por_periodo(data_inicio, data_fim)
+    return await executar_com_orcamento(
+        request, crud.db,
+        lambda max_time_ms, comentario: crud.get_viagens_por_periodo(
+            data_inicio, data_fim, max_time_ms=max_time_ms, comentario=comentario
+        ),
+        settings.ORCAMENTO_VIAGENS_PERIODO_MS,
+        alternativa="Reduza o intervalo de datas ou use GET /api/v1/viagens/pagina/"
+    )
 
 # Endpoint adicional: Viagens por status
 @router.get("/status/{status}", response_model=List[Viagem])
@@ -121,18 +186,46 @@ async def listar_viagens_por_rota(
 # Endpoint adicional: Viagens por aluno
 @router.get("/aluno/{aluno_id}", response_model=List[Viagem])
 async def listar_viagens_por_aluno(
+    request: Request,
     aluno_id: str,
     crud: CRUDService = Depends(get_crud_service)
 ):
     """Listar todas as viagens de um aluno específico"""
     try:
-        return await crud.search_viagens_por_aluno(aluno_id)
+        return await executar_com_orcamento(
+            request, crud.db,
+            lambda max_time_ms, comentario: crud.search_viagens_por_aluno(
+                aluno_id, max_time_ms=max_time_ms, comentario=comentario
+            ),
+            settings.ORCAMENTO_VIAGENS_ALUNO_MS,
+            alternativa="Use GET /api/v1/relatorios/frequencia?inicio=&fim=&formato=ndjson para exportar as frequências do período"
+        )
+    except HTTPException:
+        raise
+    except ConnectionFailure:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=503, 
             detail=f"Serviço temporariamente indisponível: {str(e)}"
         )
 
+# Posições atuais de todas as viagens acompanhadas (somente memória)
+@router.get("/posicoes/ativas", response_model=List[PosicaoViagem])
+async def listar_posicoes_ativas():
+    """Listar a última posição de cada viagem em andamento"""
+    return rastreador_posicoes.posicoes_ativas()
+
+# Ocupação de todas as viagens do dia (contadores mantidos na ingestão de frequências)
+@router.get("/ocupacao", response_model=List[OcupacaoViagem])
+async def listar_ocupacao(
+    data: Optional[date] = Query(None, description="Dia das viagens (padrão: hoje)"),
+    apenas_lotadas: bool = Query(False, description="Somente viagens acima da capacidade"),
+    crud: CRUDService = Depends(get_crud_service)
+):
+    """Listar alunos a bordo x capacidade das viagens do dia, das mais cheias para as mais vazias"""
+    return await contador_ocupacao.listar(crud.db, data or date.today(), apenas_lotadas)
+
 # F3: CRUD completo - GET por ID (DEVE VIR DEPOIS DAS ROTAS ESPECÍFICAS)
 @router.get("/{viagem_id}", response_model=Viagem)
 async def obter_viagem(
@@ -153,9 +246,30 @@ async def atualizar_viagem(
     crud: CRUDService = Depends(get_crud_service)
 ):
     """Atualizar uma viagem"""
+    campos = viagem_update.model_dump(exclude_unset=True).keys()
+    # Mudanças além de status/incidentes remontam o manifesto anterior e o novo
+    estrutural = bool(campos - {"status", "incidentes"})
+    # Uma viagem cancelada que volta a valer ocupa de novo motorista e veículo
+    reativacao = viagem_update.status not in (None, StatusViagem.CANCELADA)
+    anterior = await crud.get_viagem(viagem_id) if estrutural or reativacao else None
+    if anterior and (campos & CAMPOS_AGENDAMENTO or anterior.status == StatusViagem.CANCELADA):
+        resultante = {**anterior.model_dump(), **viagem_update.model_dump(exclude_unset=True)}
+        if resultante["status"] != StatusViagem.CANCELADA:
+            conflitos = await verificar_viagem(crud.db, resultante, ignorar=[anterior.id])
+            if conflitos:
+                raise _erro_conflito(ConflitoAgendamento(conflitos))
     viagem = await crud.update_viagem(viagem_id, viagem_update)
     if not viagem:
         raise HTTPException(status_code=404, detail="Viagem não encontrada")
+    if estrutural:
+        contador_ocupacao.esquecer(viagem_id)
+    manifestos = ManifestoService(crud.db)
+    if estrutural or "incidentes" in campos:
+        await manifestos.reconstruir_viagem(viagem, anterior)
+    elif "status" in campos:
+        await manifestos.atualizar_status(viagem_id, viagem.status.value)
+    if viagem_update.status is not None:
+        await difusor_eventos.publicar_status(viagem)
     return viagem
 
 # F3: CRUD completo - DELETE
@@ -165,11 +279,47 @@ async def deletar_viagem(
     crud: CRUDService = Depends(get_crud_service)
 ):
     """Deletar uma viagem"""
+    viagem = await crud.get_viagem(viagem_id)
     success = await crud.delete_viagem(viagem_id)
     if not success:
         raise HTTPException(status_code=404, detail="Viagem não encontrada")
+    await ManifestoService(crud.db).reconstruir_viagem(viagem)
     return {"message": "Viagem deletada com sucesso"}
 
+# Registro de incidente (com fallback para o spool local)
+@router.post("/{viagem_id}/incidentes", response_model=Viagem, status_code=201)
+async def registrar_incidente(
+    viagem_id: str,
+    incidente: Incidente,
+    crud: CRUDService = Depends(get_crud_service_tolerante)
+):
+    """Registrar um incidente em uma viagem"""
+    try:
+        viagem = await crud.registrar_incidente(viagem_id, incidente)
+    except IncidenteEmSpool:
+        await difusor_eventos.publicar_incidente(viagem_id, incidente)
+        return JSONResponse(
+            status_code=202,
+            content={"message": "Incidente registrado localmente e será gravado quando o banco estiver disponível"}
+        )
+    if not viagem:
+        raise HTTPException(status_code=404, detail="Viagem não encontrada")
+    await ManifestoService(crud.db).adicionar_incidente(viagem_id, incidente)
+    await difusor_eventos.publicar_incidente(viagem_id, incidente, str(viagem.rota_id))
+    return viagem
+
+# Ocupação atual de uma viagem
+@router.get("/{viagem_id}/ocupacao", response_model=OcupacaoViagem)
+async def obter_ocupacao(
+    viagem_id: str,
+    crud: CRUDService = Depends(get_crud_service)
+):
+    """Obter embarques, desembarques e alunos a bordo da viagem em relação à capacidade do veículo"""
+    ocupacao = await contador_ocupacao.obter(crud.db, viagem_id)
+    if not ocupacao:
+        raise HTTPException(status_code=404, detail="Viagem não encontrada")
+    return ocupacao
+
 # F7: Consulta complexa 1 - Detalhes completos de uma viagem
 @router.get("/{viagem_id}/detalhes", response_model=ViagemDetalhada)
 async def obter_viagem_detalhada(
@@ -190,4 +340,36 @@ async def obter_alunos_viagem(
 ):
     """Listar todos os alunos que embarcaram em uma viagem específica"""
     alunos = await crud.get_alunos_viagem(viagem_id)
-    return alunos 
\ No newline at end of file
+    return alunos 
+
+# Envio de posições GPS pelo motorista (trajeto gravado em segundo plano)
+@router.post("/{viagem_id}/posicoes", response_model=IngestaoPosicoesResponse, status_code=202)
+async def registrar_posicoes(viagem_id: str, lote: LotePosicoes):
+    """Registrar um lote de posições GPS de uma viagem em andamento"""
+    try:
+        aceitos, descartados = await rastreador_posicoes.registrar(viagem_id, lote.pontos)
+    except ViagemNaoRastreavel as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return IngestaoPosicoesResponse(aceitos=aceitos, descartados=descartados)
+
+# Última posição conhecida (somente memória)
+@router.get("/{viagem_id}/posicao", response_model=PosicaoViagem)
+async def obter_posicao_atual(viagem_id: str):
+    """Obter a última posição conhecida de uma viagem"""
+    posicao = rastreador_posicoes.ultima_posicao(viagem_id)
+    if posicao is None:
+        raise HTTPException(status_code=404, detail="Nenhuma posição recente para esta viagem")
+    return posicao
+
+# Trajeto recente (somente memória)
+@router.get("/{viagem_id}/posicoes/recentes", response_model=List[PosicaoGPS])
+async def listar_posicoes_recentes(
+    viagem_id: str,
+    limit: int = Query(settings.POSICAO_HISTORICO, ge=1, le=settings.POSICAO_HISTORICO,
+                       description="Quantidade de pontos mais recentes")
+):
+    """Listar os pontos mais recentes do trajeto de uma viagem"""
+    pontos = rastreador_posicoes.recentes(viagem_id, limit)
+    if pontos is None:
+        raise HTTPException(status_code=404, detail="Nenhuma posição recente para esta viagem")
+    return pontos
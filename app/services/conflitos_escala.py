@@ -0,0 +1,170 @@
+"""
+Detecção de conflitos de agendamento de motoristas e veículos.
+
+As viagens não têm horário próprio: o intervalo ocupado é a janela do
+turno da rota (``JANELAS_TURNO``; turnos desconhecidos ocupam o dia
+inteiro). Duas viagens conflitam quando usam o mesmo motorista ou o
+mesmo veículo no mesmo dia com janelas sobrepostas. Também são
+rejeitados veículos em manutenção ou inativos e motoristas inativos.
+
+A verificação é feita em lote, sem consulta por viagem: as rotas, os
+veículos, os motoristas e as viagens já agendadas dos recursos
+envolvidos no período são lidos com uma consulta ``$in`` por coleção
+(as viagens pelos índices ``(motorista_id, data_viagem)`` e
+``(veiculo_id, data_viagem)``) e carregados em um índice de intervalos
+em memória por (recurso, dia). Cada viagem candidata é conferida e
+inserida no índice, então conflitos dentro do próprio lote (uma escala
+inteira) também são detectados.
+"""
+
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from bson import ObjectId
+
+from ..core.referencias import ambas_formas, oid
+from ..models.pydantic_models import ConflitoEscala, StatusVeiculo, StatusViagem
+
+# Janela ocupada por turno, em minutos desde a meia-noite [inicio, fim)
+JANELAS_TURNO = {
+    "Manhã": (5 * 60, 12 * 60),
+    "Tarde": (12 * 60, 18 * 60),
+    "Noite": (18 * 60, 24 * 60),
+}
+DIA_INTEIRO = (0, 24 * 60)
+
+Intervalo = Tuple[int, int, str]  # (inicio, fim, id da viagem)
+
+
+class ConflitoAgendamento(Exception):
+    """A viagem (ou a escala) conflita com viagens existentes ou usa recursos indisponíveis"""
+
+    def __init__(self, conflitos: List[ConflitoEscala], total: Optional[int] = None):
+        super().__init__(f"{total or len(conflitos)} conflito(s) de agendamento")
+        self.conflitos = conflitos
+
+
+def janela_turno(turno: Optional[str]) -> Tuple[int, int]:
+    return JANELAS_TURNO.get(turno, DIA_INTEIRO)
+
+
+def _dia(valor: Any) -> date:
+    return valor.date() if isinstance(valor, datetime) else valor
+
+
+class IndiceIntervalos:
+    """Intervalos ocupados por (recurso, dia), ordenados pelo início"""
+
+    def __init__(self):
+        self._intervalos: Dict[Tuple[ObjectId, date], List[Intervalo]] = defaultdict(list)
+
+    def sobreposto(self, recurso: ObjectId, dia: date, inicio: int, fim: int) -> Optional[str]:
+        """Id de uma viagem cujo intervalo se sobrepõe a [inicio, fim), se houver"""
+        intervalos = self._intervalos.get((recurso, dia))
+        if not intervalos:
+            return None
+        # Os intervalos de um recurso não se sobrepõem entre si: basta olhar os vizinhos
+        posicao = bisect_left(intervalos, (inicio, fim, ""))
+        for vizinho in intervalos[max(posicao - 1, 0):posicao + 1]:
+            if vizinho[0] < fim and inicio < vizinho[1]:
+                return vizinho[2]
+        return None
+
+    def adicionar(self, recurso: ObjectId, dia: date, inicio: int, fim: int, viagem_id: str):
+        insort(self._intervalos[(recurso, dia)], (inicio, fim, viagem_id))
+
+
+class VerificadorConflitos:
+    def __init__(self, db, turnos: Optional[Dict[ObjectId, Optional[str]]] = None):
+        self.db = db
+        self.indice = IndiceIntervalos()
+        # Turno por rota; quem já leu as rotas pode repassá-lo e evitar a consulta
+        self._turnos: Dict[ObjectId, Optional[str]] = {oid(r): t for r, t in (turnos or {}).items()}
+        self._veiculos: Dict[ObjectId, Optional[str]] = {}
+        self._motoristas_ativos: Dict[ObjectId, bool] = {}
+
+    async def _carregar_turnos(self, rota_ids: Set[ObjectId]):
+        faltantes = [r for r in rota_ids if r not in self._turnos]
+        if faltantes:
+            async for rota in self.db.rotas.find({"_id": {"$in": faltantes}}, {"turno": 1}):
+                self._turnos[rota["_id"]] = rota.get("turno")
+
+    async def preparar(self, motorista_ids: Set[ObjectId], veiculo_ids: Set[ObjectId], rota_ids: Set[ObjectId],
+                       inicio: date, fim: date, ignorar: Iterable[ObjectId] = ()):
+        """
+        Carrega, em uma consulta por coleção, o estado dos recursos e as
+        viagens já agendadas para eles no período.
+        """
+        motorista_ids = {oid(i) for i in motorista_ids}
+        veiculo_ids = {oid(i) for i in veiculo_ids}
+        async for veiculo in self.db.veiculos.find({"_id": {"$in": list(veiculo_ids)}}, {"status_manutencao": 1}):
+            self._veiculos[veiculo["_id"]] = veiculo.get("status_manutencao")
+        async for motorista in self.db.motoristas.find({"_id": {"$in": list(motorista_ids)}}, {"status_ativo": 1}):
+            self._motoristas_ativos[motorista["_id"]] = motorista.get("status_ativo", True)
+
+        periodo = {"$gte": inicio, "$lte": fim}
+        filtro = {
+            "$or": [
+                {"motorista_id": {"$in": ambas_formas(motorista_ids)}, "data_viagem": periodo},
+                {"veiculo_id": {"$in": ambas_formas(veiculo_ids)}, "data_viagem": periodo},
+            ],
+            "status": {"$ne": StatusViagem.CANCELADA.value},
+        }
+        ignorar = set(ignorar)
+        if ignorar:
+            filtro["_id"] = {"$nin": [oid(i) for i in ignorar]}
+        existentes = await self.db.viagens.find(
+            filtro, {"rota_id": 1, "motorista_id": 1, "veiculo_id": 1, "data_viagem": 1}
+        ).to_list(length=None)
+
+        await self._carregar_turnos({oid(r) for r in rota_ids} | {oid(v["rota_id"]) for v in existentes})
+        for viagem in existentes:
+            inicio_turno, fim_turno = janela_turno(self._turnos.get(oid(viagem["rota_id"])))
+            dia = _dia(viagem["data_viagem"])
+            viagem_id = str(viagem["_id"])
+            motorista_id, veiculo_id = oid(viagem["motorista_id"]), oid(viagem["veiculo_id"])
+            if motorista_id in motorista_ids:
+                self.indice.adicionar(motorista_id, dia, inicio_turno, fim_turno, viagem_id)
+            if veiculo_id in veiculo_ids:
+                self.indice.adicionar(veiculo_id, dia, inicio_turno, fim_turno, viagem_id)
+
+    def verificar(self, viagem: Dict[str, Any]) -> List[ConflitoEscala]:
+        """
+        Confere uma viagem candidata contra o índice e, se não houver
+        conflito, a registra no índice.
+        """
+        dia = _dia(viagem["data_viagem"])
+        rota_id, motorista_id, veiculo_id = oid(viagem["rota_id"]), oid(viagem["motorista_id"]), oid(viagem["veiculo_id"])
+        turno = self._turnos.get(rota_id)
+        inicio, fim = janela_turno(turno)
+        viagem_id = str(viagem.get("_id") or ObjectId())
+        base = {"data_viagem": dia, "turno": turno, "rota_id": str(rota_id)}
+        conflitos = []
+
+        status_veiculo = self._veiculos.get(veiculo_id)
+        if status_veiculo in (StatusVeiculo.EM_MANUTENCAO.value, StatusVeiculo.INATIVO.value):
+            conflitos.append(ConflitoEscala(tipo=f"veiculo {status_veiculo.lower()}", recurso_id=str(veiculo_id), **base))
+        if not self._motoristas_ativos.get(motorista_id, True):
+            conflitos.append(ConflitoEscala(tipo="motorista inativo", recurso_id=str(motorista_id), **base))
+
+        for tipo, recurso in (("motorista", motorista_id), ("veiculo", veiculo_id)):
+            ocupado_por = self.indice.sobreposto(recurso, dia, inicio, fim)
+            if ocupado_por:
+                conflitos.append(ConflitoEscala(tipo=f"{tipo} já agendado", recurso_id=str(recurso),
+                                                viagem_conflitante_id=ocupado_por, **base))
+
+        if not conflitos:
+            self.indice.adicionar(motorista_id, dia, inicio, fim, viagem_id)
+            self.indice.adicionar(veiculo_id, dia, inicio, fim, viagem_id)
+        return conflitos
+
+
+async def verificar_viagem(db, viagem: Dict[str, Any], ignorar: Iterable[ObjectId] = ()) -> List[ConflitoEscala]:
+    """Conflitos de uma única viagem (criação ou alteração)"""
+    verificador = VerificadorConflitos(db)
+    dia = _dia(viagem["data_viagem"])
+    await verificador.preparar({viagem["motorista_id"]}, {viagem["veiculo_id"]}, {viagem["rota_id"]},
+                               dia, dia, ignorar)
+    return verificador.verificar(viagem)
@@ -1,19 +1,29 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
+import asyncio
 from bson import ObjectId
 from typing import List, Optional, Dict, Any
 from datetime import datetime, date
 from passlib.context import CryptContext
+from pymongo.errors import ConnectionFailure
 
 from ..models.pydantic_models import (
     Aluno, AlunoCreate, AlunoUpdate,
     Motorista, MotoristaCreate, MotoristaUpdate,
     Veiculo, VeiculoCreate, VeiculoUpdate,
     Rota, RotaCreate, RotaUpdate,
-    Viagem, ViagemCreate, ViagemUpdate,
+    Viagem, ViagemCreate, ViagemUpdate, Incidente,
     Frequencia, FrequenciaCreate, FrequenciaUpdate,
-    ViagemDetalhada, PaginatedResponse,
+    ViagemDetalhada, PaginatedResponse, ResultadoOtimizacaoRota,
     StatusVeiculo, StatusViagem
 )
+from .otimizacao_rotas import otimizar_em_processo
+from .geometria_rotas import calcular_geometria, geometria_para_geojson
+from .spool import spool_eventos
+from ..core.server_timing import span
+from ..core.referencias import ambas_formas, com_referencias
+
+class IncidenteEmSpool(Exception):
+    """O incidente foi guardado no spool local para gravação posterior"""
 
 # Configuração do contexto de senha com bcrypt
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -27,6 +37,27 @@ class CRUDService:
         if self.db is None:
             raise Exception("Database connection not available")
 
+    # Opções de orçamento de tempo (maxTimeMS) e identificação (comment) de consultas
+    @staticmethod
+    def _opcoes_consulta(max_time_ms: Optional[int], comentario: Optional[str]) -> Dict[str, Any]:
+        opcoes = {}
+        if max_time_ms:
+            opcoes["maxTimeMS"] = max_time_ms
+        if comentario:
+            opcoes["comment"] = comentario
+        return opcoes
+
+    # Validação de documentos em modelos Pydantic (fase "pydantic" do Server-Timing)
+    @staticmethod
+    def _validar(modelo, documento: Dict[str, Any]):
+        with span("pydantic"):
+            return modelo(**documento)
+
+    @staticmethod
+    def _validar_lista(modelo, documentos: List[Dict[str, Any]]) -> list:
+        with span("pydantic"):
+            return [modelo(**documento) for documento in documentos]
+
     # Função auxiliar para hash de senha usando bcrypt
     def _get_password_hash(self, password: str) -> str:
         return pwd_context.hash(password)
@@ -39,18 +70,18 @@ class CRUDService:
         aluno_dict["_id"] = ObjectId()
         
         await self.db.alunos.insert_one(aluno_dict)
-        return Aluno(**aluno_dict)
+        return self._validar(Aluno, aluno_dict)
 
     async def get_alunos(self, skip: int = 0, limit: int = 100) -> List[Aluno]:
         """F2: Listar todos os alunos"""
         cursor = self.db.alunos.find().skip(skip).limit(limit)
         alunos = await cursor.to_list(length=limit)
-        return [Aluno(**aluno) for aluno in alunos]
+        return self._validar_lista(Aluno, alunos)
 
     async def get_aluno(self, aluno_id: str) -> Optional[Aluno]:
         """F3: Buscar aluno por ID"""
         aluno = await self.db.alunos.find_one({"_id": ObjectId(aluno_id)})
-        return Aluno(**aluno) if aluno else None
+        return self._validar(Aluno, aluno) if aluno else None
 
     async def update_aluno(self, aluno_id: str, aluno_update: AlunoUpdate) -> Optional[Aluno]:
         """F3: Atualizar aluno"""
@@ -88,7 +119,7 @@ class CRUDService:
         
         cursor = self.db.alunos.find(filter_query)
         alunos = await cursor.to_list(length=100)
-        return [Aluno(**aluno) for aluno in alunos]
+        return self._validar_lista(Aluno, alunos)
 
     # ==================== MOTORISTAS ====================
     async def create_motorista(self, motorista: MotoristaCreate) -> Motorista:
@@ -98,18 +129,18 @@ class CRUDService:
         motorista_dict["_id"] = ObjectId()
         
         await self.db.motoristas.insert_one(motorista_dict)
-        return Motorista(**motorista_dict)
+        return self._validar(Motorista, motorista_dict)
 
     async def get_motoristas(self, skip: int = 0, limit: int = 100) -> List[Motorista]:
         """F2: Listar todos os motoristas"""
         cursor = self.db.motoristas.find().skip(skip).limit(limit)
         motoristas = await cursor.to_list(length=limit)
-        return [Motorista(**motorista) for motorista in motoristas]
+        return self._validar_lista(Motorista, motoristas)
 
     async def get_motorista(self, motorista_id: str) -> Optional[Motorista]:
         """F3: Buscar motorista por ID"""
         motorista = await self.db.motoristas.find_one({"_id": ObjectId(motorista_id)})
-        return Motorista(**motorista) if motorista else None
+        return self._validar(Motorista, motorista) if motorista else None
 
     async def update_motorista(self, motorista_id: str, motorista_update: MotoristaUpdate) -> Optional[Motorista]:
         """F3: Atualizar motorista"""
@@ -147,7 +178,7 @@ class CRUDService:
         
         cursor = self.db.motoristas.find(filter_query)
         motoristas = await cursor.to_list(length=100)
-        return [Motorista(**motorista) for motorista in motoristas]
+        return self._validar_lista(Motorista, motoristas)
 
     # ==================== VEÍCULOS ====================
     async def create_veiculo(self, veiculo: VeiculoCreate) -> Veiculo:
@@ -156,18 +187,18 @@ class CRUDService:
         veiculo_dict["_id"] = ObjectId()
         
         await self.db.veiculos.insert_one(veiculo_dict)
-        return Veiculo(**veiculo_dict)
+        return self._validar(Veiculo, veiculo_dict)
 
     async def get_veiculos(self, skip: int = 0, limit: int = 100) -> List[Veiculo]:
         """F2: Listar todos os veículos"""
         cursor = self.db.veiculos.find().skip(skip).limit(limit)
         veiculos = await cursor.to_list(length=limit)
-        return [Veiculo(**veiculo) for veiculo in veiculos]
+        return self._validar_lista(Veiculo, veiculos)
 
     async def get_veiculo(self, veiculo_id: str) -> Optional[Veiculo]:
         """F3: Buscar veículo por ID"""
         veiculo = await self.db.veiculos.find_one({"_id": ObjectId(veiculo_id)})
-        return Veiculo(**veiculo) if veiculo else None
+        return self._validar(Veiculo, veiculo) if veiculo else None
 
     async def update_veiculo(self, veiculo_id: str, veiculo_update: VeiculoUpdate) -> Optional[Veiculo]:
         """F3: Atualizar veículo"""
@@ -205,31 +236,36 @@ class CRUDService:
         
         cursor = self.db.veiculos.find(filter_query)
         veiculos = await cursor.to_list(length=100)
-        return [Veiculo(**veiculo) for veiculo in veiculos]
+        return self._validar_lista(Veiculo, veiculos)
 
     # ==================== ROTAS ====================
     async def create_rota(self, rota: RotaCreate) -> Rota:
         """F1: Inserir uma rota"""
         rota_dict = rota.model_dump()
         rota_dict["_id"] = ObjectId()
+        rota_dict["num_pontos"] = len(rota_dict["pontos_de_parada"])
+        rota_dict["geometria"] = calcular_geometria(rota_dict["pontos_de_parada"])
         
         await self.db.rotas.insert_one(rota_dict)
-        return Rota(**rota_dict)
+        return self._validar(Rota, rota_dict)
 
     async def get_rotas(self, skip: int = 0, limit: int = 100) -> List[Rota]:
         """F2: Listar todas as rotas"""
         cursor = self.db.rotas.find().skip(skip).limit(limit)
         rotas = await cursor.to_list(length=limit)
-        return [Rota(**rota) for rota in rotas]
+        return self._validar_lista(Rota, rotas)
 
     async def get_rota(self, rota_id: str) -> Optional[Rota]:
         """F3: Buscar rota por ID"""
         rota = await self.db.rotas.find_one({"_id": ObjectId(rota_id)})
-        return Rota(**rota) if rota else None
+        return self._validar(Rota, rota) if rota else None
 
     async def update_rota(self, rota_id: str, rota_update: RotaUpdate) -> Optional[Rota]:
         """F3: Atualizar rota"""
         update_data = {k: v for k, v in rota_update.model_dump(exclude_unset=True).items()}
+        if update_data.get("pontos_de_parada"):
+            update_data["num_pontos"] = len(update_data["pontos_de_parada"])
+            update_data["geometria"] = calcular_geometria(update_data["pontos_de_parada"])
         
         if update_data:
             result = await self.db.rotas.update_one(
@@ -268,31 +304,97 @@ class CRUDService:
         
         cursor = self.db.rotas.find(filter_query)
         rotas = await cursor.to_list(length=100)
-        return [Rota(**rota) for rota in rotas]
+        return self._validar_lista(Rota, rotas)
+
+    async def get_rotas_mais_pontos(self, limit: int = 10) -> List[Rota]:
+        """Top-N rotas por número de pontos (usa o índice em num_pontos)"""
+        cursor = self.db.rotas.find().sort("num_pontos", -1).limit(limit)
+        rotas = await cursor.to_list(length=limit)
+        return self._validar_lista(Rota, rotas)
+
+    async def get_geometria_rota(self, rota_id: str, tolerancia_m: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """GeoJSON da rota a partir da geometria pré-calculada"""
+        rota = await self.db.rotas.find_one(
+            {"_id": ObjectId(rota_id)}, {"geometria": 1}
+        )
+        if not rota:
+            return None
+        geometria = rota.get("geometria")
+        if not geometria:
+            # Rotas antigas sem geometria: calcula e persiste uma única vez
+            rota = await self.db.rotas.find_one(
+                {"_id": ObjectId(rota_id)}, {"pontos_de_parada": 1}
+            )
+            geometria = calcular_geometria(rota["pontos_de_parada"])
+            await self.db.rotas.update_one(
+                {"_id": rota["_id"]}, {"$set": {"geometria": geometria}}
+            )
+        return geometria_para_geojson(rota_id, geometria, tolerancia_m)
+
+    async def _otimizar_documento_rota(self, rota: Dict[str, Any], aplicar: bool) -> ResultadoOtimizacaoRota:
+        """Otimiza a ordem dos pontos de uma rota no pool de processos"""
+        resultado = await otimizar_em_processo(rota["pontos_de_parada"])
+        aplicada = False
+        if aplicar and resultado["ordem_alterada"]:
+            update_result = await self.db.rotas.update_one(
+                {"_id": rota["_id"]},
+                {"$set": {
+                    "pontos_de_parada": resultado["pontos_de_parada"],
+                    "num_pontos": len(resultado["pontos_de_parada"]),
+                    "geometria": calcular_geometria(resultado["pontos_de_parada"])
+                }}
+            )
+            aplicada = update_result.modified_count > 0
+        return ResultadoOtimizacaoRota(
+            rota_id=str(rota["_id"]),
+            nome_rota=rota["nome_rota"],
+            aplicada=aplicada,
+            **resultado
+        )
+
+    async def otimizar_rota(self, rota_id: str, aplicar: bool = False) -> Optional[ResultadoOtimizacaoRota]:
+        """Calcula a ordem de visita quase ótima dos pontos de uma rota"""
+        self._check_db_connection()
+        if not ObjectId.is_valid(rota_id):
+            return None
+        rota = await self.db.rotas.find_one({"_id": ObjectId(rota_id)})
+        if not rota:
+            return None
+        return await self._otimizar_documento_rota(rota, aplicar)
+
+    async def otimizar_rotas_ativas(self, aplicar: bool = False) -> List[ResultadoOtimizacaoRota]:
+        """Otimiza em lote todas as rotas ativas"""
+        self._check_db_connection()
+
+        cursor = self.db.rotas.find({"ativa": True})
+        rotas = await cursor.to_list(length=None)
+        return list(await asyncio.gather(
+            *(self._otimizar_documento_rota(rota, aplicar) for rota in rotas)
+        ))
 
     # ==================== VIAGENS ====================
     async def create_viagem(self, viagem: ViagemCreate) -> Viagem:
         """F1: Inserir uma viagem"""
-        viagem_dict = viagem.model_dump()
+        viagem_dict = com_referencias(viagem.model_dump())
         viagem_dict["_id"] = ObjectId()
         
         await self.db.viagens.insert_one(viagem_dict)
-        return Viagem(**viagem_dict)
+        return self._validar(Viagem, viagem_dict)
 
     async def get_viagens(self, skip: int = 0, limit: int = 100) -> List[Viagem]:
         """F2: Listar todas as viagens"""
         cursor = self.db.viagens.find().skip(skip).limit(limit)
         viagens = await cursor.to_list(length=limit)
-        return [Viagem(**viagem) for viagem in viagens]
+        return self._validar_lista(Viagem, viagens)
 
     async def get_viagem(self, viagem_id: str) -> Optional[Viagem]:
         """F3: Buscar viagem por ID"""
         viagem = await self.db.viagens.find_one({"_id": ObjectId(viagem_id)})
-        return Viagem(**viagem) if viagem else None
+        return self._validar(Viagem, viagem) if viagem else None
 
     async def update_viagem(self, viagem_id: str, viagem_update: ViagemUpdate) -> Optional[Viagem]:
         """F3: Atualizar viagem"""
-        update_data = {k: v for k, v in viagem_update.model_dump(exclude_unset=True).items()}
+        update_data = com_referencias(viagem_update.model_dump(exclude_unset=True))
         
         if update_data:
             result = await self.db.viagens.update_one(
@@ -302,6 +404,31 @@ class CRUDService:
                 return await self.get_viagem(viagem_id)
         return None
 
+    async def registrar_incidente(self, viagem_id: str, incidente: Incidente) -> Optional[Viagem]:
+        """
+        Adiciona um incidente à viagem de forma idempotente.
+
+        Se o banco estiver indisponível, o incidente vai para o spool local
+        (já gravado em disco quando a chamada retorna) e é reaplicado depois;
+        nesse caso lança ``IncidenteEmSpool``.
+        """
+        incidente_dict = incidente.model_dump()
+        registro = {
+            "colecao": "viagens",
+            "op": "update",
+            "filtro": {"_id": ObjectId(viagem_id), "incidentes": {"$ne": incidente_dict}},
+            "update": {"$push": {"incidentes": incidente_dict}},
+        }
+        if self.db is None or spool_eventos.pendente:
+            await spool_eventos.anexar([registro])
+            raise IncidenteEmSpool()
+        try:
+            await self.db.viagens.update_one(registro["filtro"], registro["update"])
+        except ConnectionFailure:
+            await spool_eventos.anexar([registro])
+            raise IncidenteEmSpool()
+        return await self.get_viagem(viagem_id)
+
     async def delete_viagem(self, viagem_id: str) -> bool:
         """F3: Deletar viagem"""
         result = await self.db.viagens.delete_one({"_id": ObjectId(viagem_id)})
@@ -329,20 +456,22 @@ class CRUDService:
                 date_filter["$lte"] = data_fim
             filter_query["data_viagem"] = date_filter
         if motorista_id:
-            filter_query["motorista_id"] = ObjectId(motorista_id)
+            filter_query["motorista_id"] = {"$in": ambas_formas([motorista_id])}
         if rota_id:
-            filter_query["rota_id"] = ObjectId(rota_id)
+            filter_query["rota_id"] = {"$in": ambas_formas([rota_id])}
         
         cursor = self.db.viagens.find(filter_query)
         viagens = await cursor.to_list(length=100)
-        return [Viagem(**viagem) for viagem in viagens]
+        return self._validar_lista(Viagem, viagens)
 
-    async def search_viagens_por_aluno(self, aluno_id: str) -> List[Viagem]:
+    async def search_viagens_por_aluno(self, aluno_id: str,
+                                       max_time_ms: Optional[int] = None,
+                                       comentario: Optional[str] = None) -> List[Viagem]:
         """Buscar viagens de um aluno específico através das frequências"""
         self._check_db_connection()
         
         pipeline = [
-            {"$match": {"aluno_id": ObjectId(aluno_id)}},
+            {"$match": {"aluno_id": {"$in": ambas_formas([aluno_id])}}},
             {"$lookup": {
                 "from": "viagens",
                 "localField": "viagem_id",
@@ -353,8 +482,10 @@ class CRUDService:
             {"$replaceRoot": {"newRoot": "$viagem_info"}}
         ]
         
-        viagens = await self.db.frequencias.aggregate(pipeline).to_list(length=100)
-        return [Viagem(**viagem) for viagem in viagens]
+        viagens = await self.db.frequencias.aggregate(
+            pipeline, **self._opcoes_consulta(max_time_ms, comentario)
+        ).to_list(length=100)
+        return self._validar_lista(Viagem, viagens)
 
     async def get_viagem_detalhada(self, viagem_id: str) -> Optional[ViagemDetalhada]:
         """F7: Buscar viagem com informações relacionadas"""
@@ -394,13 +525,13 @@ class CRUDService:
         
         result = await self.db.viagens.aggregate(pipeline).to_list(length=1)
         if result:
-            return ViagemDetalhada(**result[0])
+            return self._validar(ViagemDetalhada, result[0])
         return None
 
     async def get_alunos_viagem(self, viagem_id: str) -> List[Aluno]:
         """F8: Buscar alunos de uma viagem específica"""
         pipeline = [
-            {"$match": {"viagem_id": ObjectId(viagem_id)}},
+            {"$match": {"viagem_id": {"$in": ambas_formas([viagem_id])}}},
             {"$lookup": {
                 "from": "alunos",
                 "localField": "aluno_id",
@@ -412,9 +543,11 @@ class CRUDService:
         ]
         
         alunos = await self.db.frequencias.aggregate(pipeline).to_list(length=100)
-        return [Aluno(**aluno) for aluno in alunos]
+        return self._validar_lista(Aluno, alunos)
 
-    async def get_viagens_por_periodo(self, data_inicio: date, data_fim: date) -> List[Dict[str, Any]]:
+    async def get_viagens_por_periodo(self, data_inicio: date, data_fim: date,
+                                      max_time_ms: Optional[int] = None,
+                                      comentario: Optional[str] = None) -> List[Dict[str, Any]]:
         """F9: Relatório de viagens por período"""
         pipeline = [
             {"$match": {
@@ -452,9 +585,12 @@ class CRUDService:
             }}
         ]
         
-        return await self.db.viagens.aggregate(pipeline).to_list(length=100)
+        return await self.db.viagens.aggregate(
+            pipeline, **self._opcoes_consulta(max_time_ms, comentario)
+        ).to_list(length=100)
 
-    async def get_estatisticas_veiculos(self) -> List[Dict[str, Any]]:
+    async def get_estatisticas_veiculos(self, max_time_ms: Optional[int] = None,
+                                        comentario: Optional[str] = None) -> List[Dict[str, Any]]:
         """F10: Estatísticas de uso de veículos"""
         pipeline = [
             {"$lookup": {
@@ -493,31 +629,33 @@ class CRUDService:
             }}
         ]
         
-        return await self.db.viagens.aggregate(pipeline).to_list(length=100)
+        return await self.db.viagens.aggregate(
+            pipeline, **self._opcoes_consulta(max_time_ms, comentario)
+        ).to_list(length=100)
 
     # ==================== FREQUÊNCIAS ====================
     async def create_frequencia(self, frequencia: FrequenciaCreate) -> Frequencia:
         """F1: Inserir uma frequência"""
-        frequencia_dict = frequencia.model_dump()
+        frequencia_dict = com_referencias(frequencia.model_dump())
         frequencia_dict["_id"] = ObjectId()
         
         await self.db.frequencias.insert_one(frequencia_dict)
-        return Frequencia(**frequencia_dict)
+        return self._validar(Frequencia, frequencia_dict)
 
     async def get_frequencias(self, skip: int = 0, limit: int = 100) -> List[Frequencia]:
         """F2: Listar todas as frequências"""
         cursor = self.db.frequencias.find().skip(skip).limit(limit)
         frequencias = await cursor.to_list(length=limit)
-        return [Frequencia(**frequencia) for frequencia in frequencias]
+        return self._validar_lista(Frequencia, frequencias)
 
     async def get_frequencia(self, frequencia_id: str) -> Optional[Frequencia]:
         """F3: Buscar frequência por ID"""
         frequencia = await self.db.frequencias.find_one({"_id": ObjectId(frequencia_id)})
-        return Frequencia(**frequencia) if frequencia else None
+        return self._validar(Frequencia, frequencia) if frequencia else None
 
     async def update_frequencia(self, frequencia_id: str, frequencia_update: FrequenciaUpdate) -> Optional[Frequencia]:
         """F3: Atualizar frequência"""
-        update_data = {k: v for k, v in frequencia_update.model_dump(exclude_unset=True).items()}
+        update_data = com_referencias(frequencia_update.model_dump(exclude_unset=True))
         
         if update_data:
             result = await self.db.frequencias.update_one(
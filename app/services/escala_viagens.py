@@ -0,0 +1,200 @@
+"""
+Geração em lote da escala recorrente de viagens.
+
+Cada atribuição (rota, motorista, veículo e dias da semana) é expandida
+para todos os dias do período, exceto os feriados, por um gerador: as
+viagens nunca ficam todas em memória e são gravadas em blocos de
+``ESCALA_LOTE_TAMANHO`` com ``insert_many`` não ordenado.
+
+Reexecuções são idempotentes: o ``_id`` de cada viagem é derivado da
+rota e do dia (com o timestamp do próprio dia), então uma viagem já
+gerada colide com a chave primária e é ignorada; viagens já existentes
+para a mesma rota e dia (inclusive criadas manualmente) são puladas
+antes da gravação. Em ``dry_run`` nada é gravado e a resposta traz as
+contagens e uma amostra do que seria criado.
+
+Antes de gravar, a escala inteira é conferida contra as viagens já
+agendadas dos mesmos motoristas e veículos (``conflitos_escala``). Com
+conflitos, nada é gravado, a menos que ``pular_conflitos`` peça para
+gerar o restante sem as viagens conflitantes.
+"""
+
+import calendar
+import hashlib
+import logging
+import struct
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from ..core.config import settings
+from ..core.referencias import ambas_formas, oid
+from ..models.pydantic_models import (
+    AtribuicaoEscala, ConflitoEscala, EscalaViagensRequest, EscalaViagensResponse, StatusViagem, ViagemCreate
+)
+from .conflitos_escala import ConflitoAgendamento, VerificadorConflitos
+
+logger = logging.getLogger(__name__)
+
+CODIGO_CHAVE_DUPLICADA = 11000
+TAMANHO_AMOSTRA = 10
+
+
+class EscalaInvalida(ValueError):
+    """A escala é inconsistente ou referencia registros inexistentes ou inativos"""
+
+
+def id_viagem(rota_id: ObjectId, dia: date) -> ObjectId:
+    """ObjectId determinístico por rota e dia (timestamp = meia-noite do dia)"""
+    return _id_viagem(rota_id.binary, struct.pack(">I", calendar.timegm(dia.timetuple())), dia.isoformat().encode())
+
+
+def _id_viagem(rota: bytes, meia_noite: bytes, dia: bytes) -> ObjectId:
+    return ObjectId(meia_noite + hashlib.sha1(rota + dia).digest()[:8])
+
+
+def dias_do_periodo(inicio: date, fim: date, feriados: Set[date]) -> Iterator[date]:
+    dia = inicio
+    while dia <= fim:
+        if dia not in feriados:
+            yield dia
+        dia += timedelta(days=1)
+
+
+def expandir(atribuicoes: List[AtribuicaoEscala], dias: Iterator[date]) -> Iterator[Dict[str, Any]]:
+    """Gera os documentos das viagens, dia a dia"""
+    # Agrupa por dia da semana uma única vez; cada dia só percorre as atribuições que rodam nele
+    por_dia_semana: Dict[int, List[Tuple[bytes, AtribuicaoEscala]]] = {d: [] for d in range(7)}
+    for atribuicao in atribuicoes:
+        for dia_semana in atribuicao.dias_semana:
+            por_dia_semana[dia_semana].append((atribuicao.rota_id.binary, atribuicao))
+    status = StatusViagem.AGENDADA.value
+    for dia in dias:
+        meia_noite = struct.pack(">I", calendar.timegm(dia.timetuple()))
+        dia_iso = dia.isoformat().encode()
+        for rota, atribuicao in por_dia_semana[dia.weekday()]:
+            yield {
+                "_id": _id_viagem(rota, meia_noite, dia_iso),
+                "data_viagem": dia,
+                "status": status,
+                "rota_id": atribuicao.rota_id,
+                "motorista_id": atribuicao.motorista_id,
+                "veiculo_id": atribuicao.veiculo_id,
+                "incidentes": [],
+            }
+
+
+class GeradorEscala:
+    def __init__(self, db, tamanho_lote: int = settings.ESCALA_LOTE_TAMANHO):
+        self.db = db
+        self.tamanho_lote = tamanho_lote
+
+    async def _validar_referencias(self, atribuicoes: List[AtribuicaoEscala]) -> Dict[ObjectId, Dict[str, Any]]:
+        """Confere se tudo existe; retorna as rotas (com o turno) por id"""
+        # Uma viagem por rota e dia: a mesma rota não pode ter duas atribuições no mesmo dia da semana
+        vistos: Set[Tuple[ObjectId, int]] = set()
+        for atribuicao in atribuicoes:
+            for dia_semana in atribuicao.dias_semana:
+                if (atribuicao.rota_id, dia_semana) in vistos:
+                    raise EscalaInvalida(f"Rota {atribuicao.rota_id} atribuída mais de uma vez no dia da semana {dia_semana}")
+                vistos.add((atribuicao.rota_id, dia_semana))
+        rota_ids = {a.rota_id for a in atribuicoes}
+        rotas = {
+            r["_id"]: r async for r in self.db.rotas.find({"_id": {"$in": list(rota_ids)}}, {"turno": 1, "ativa": 1})
+        }
+        problemas = [f"rota {r}" for r in rota_ids - set(rotas)]
+        problemas += [f"rota inativa {r}" for r, doc in rotas.items() if not doc.get("ativa", True)]
+        for colecao, campo in (("motoristas", "motorista_id"), ("veiculos", "veiculo_id")):
+            ids = {getattr(a, campo) for a in atribuicoes}
+            encontrados = {d["_id"] async for d in self.db[colecao].find({"_id": {"$in": list(ids)}}, {"_id": 1})}
+            problemas += [f"{campo.split('_')[0]} {i}" for i in ids - encontrados]
+        if problemas:
+            raise EscalaInvalida("Referências inválidas na escala: " + ", ".join(sorted(problemas)[:20]))
+        return rotas
+
+    async def _existentes(self, rota_ids: List[ObjectId], inicio: date, fim: date) -> Set[Tuple[ObjectId, date]]:
+        """(rota, dia) que já têm viagem no período"""
+        existentes = set()
+        cursor = self.db.viagens.find(
+            {"rota_id": {"$in": ambas_formas(rota_ids)}, "data_viagem": {"$gte": inicio, "$lte": fim}},
+            {"rota_id": 1, "data_viagem": 1, "_id": 0}
+        )
+        async for viagem in cursor:
+            data_viagem = viagem["data_viagem"]
+            existentes.add((oid(viagem["rota_id"]), data_viagem.date() if isinstance(data_viagem, datetime) else data_viagem))
+        return existentes
+
+    async def _gravar(self, lote: List[Dict[str, Any]]) -> int:
+        try:
+            result = await self.db.viagens.insert_many(lote, ordered=False)
+            return len(result.inserted_ids)
+        except BulkWriteError as e:
+            erros = e.details.get("writeErrors", [])
+            outros = [erro for erro in erros if erro.get("code") != CODIGO_CHAVE_DUPLICADA]
+            if outros:
+                raise
+            # Gerada por uma execução concorrente: já existe, não é erro
+            return e.details.get("nInserted", 0)
+
+    async def gerar(self, escala: EscalaViagensRequest, dry_run: bool = False) -> EscalaViagensResponse:
+        rotas = await self._validar_referencias(escala.atribuicoes)
+        atribuicoes = escala.atribuicoes
+        if escala.turnos:
+            turnos = set(escala.turnos)
+            atribuicoes = [a for a in atribuicoes if rotas[a.rota_id].get("turno") in turnos]
+        fora_dos_turnos = len(escala.atribuicoes) - len(atribuicoes)
+
+        existentes = await self._existentes(list({a.rota_id for a in atribuicoes}), escala.data_inicio, escala.data_fim)
+        feriados = set(escala.feriados)
+
+        def novas_viagens() -> Iterator[Dict[str, Any]]:
+            return (
+                viagem for viagem in expandir(atribuicoes, dias_do_periodo(escala.data_inicio, escala.data_fim, feriados))
+                if (viagem["rota_id"], viagem["data_viagem"]) not in existentes
+            )
+
+        # Primeira passada: confere a escala inteira em memória, sem gravar nada
+        verificador = VerificadorConflitos(self.db, {r: doc.get("turno") for r, doc in rotas.items()})
+        await verificador.preparar(
+            {a.motorista_id for a in atribuicoes}, {a.veiculo_id for a in atribuicoes},
+            {a.rota_id for a in atribuicoes}, escala.data_inicio, escala.data_fim
+        )
+        conflitantes: Set[ObjectId] = set()
+        amostra_conflitos: List[ConflitoEscala] = []
+        for viagem in novas_viagens():
+            conflitos = verificador.verificar(viagem)
+            if conflitos:
+                conflitantes.add(viagem["_id"])
+                amostra_conflitos += conflitos[:TAMANHO_AMOSTRA - len(amostra_conflitos)]
+        if conflitantes and not dry_run and not escala.pular_conflitos:
+            raise ConflitoAgendamento(amostra_conflitos, len(conflitantes))
+
+        novas = (viagem for viagem in novas_viagens() if viagem["_id"] not in conflitantes)
+
+        criadas = 0
+        dias: Set[date] = set()
+        amostra: List[ViagemCreate] = []
+        while True:
+            lote = list(islice(novas, self.tamanho_lote))
+            if not lote:
+                break
+            dias.update(v["data_viagem"] for v in lote)
+            if len(amostra) < TAMANHO_AMOSTRA:
+                amostra += [ViagemCreate(**v) for v in lote[:TAMANHO_AMOSTRA - len(amostra)]]
+            criadas += len(lote) if dry_run else await self._gravar(lote)
+
+        if not dry_run:
+            logger.info(f"Escala gerada: {criadas} viagens de {escala.data_inicio} a {escala.data_fim}")
+        return EscalaViagensResponse(
+            dry_run=dry_run,
+            dias_com_viagem=len(dias),
+            criadas=criadas,
+            existentes=len(existentes),
+            atribuicoes_fora_dos_turnos=fora_dos_turnos,
+            conflitos=len(conflitantes),
+            amostra=amostra,
+            amostra_conflitos=amostra_conflitos,
+        )
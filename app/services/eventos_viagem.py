@@ -0,0 +1,346 @@
+"""
+Eventos das viagens em tempo real (mudança de status, incidentes,
+embarques/desembarques e lotação) para assinantes via WebSocket ou SSE.
+
+Cada worker tem um ``DifusorEventos`` com os assinantes locais, indexados
+por canal (``viagem:<id>`` e ``rota:<id>``). Um evento é codificado em
+JSON uma única vez e a mesma mensagem é entregue a todos os assinantes
+dos canais afetados, sem cópias nem tarefas por assinante: cada
+assinante tem uma fila limitada que a sua conexão esvazia em blocos.
+Um assinante que não acompanha o ritmo (fila cheia) é desconectado e
+deve recarregar o estado com ``GET /viagens/{id}`` ao reconectar, em
+vez de receber uma sequência incompleta.
+
+A difusão entre workers passa por um barramento plugável
+(``EVENTOS_BARRAMENTO``):
+
+- ``memoria``: entrega direta no próprio processo (um worker, testes)
+- ``mongo``: os eventos são gravados em uma coleção capped e cada worker
+  acompanha a coleção com um cursor tailable; com o banco indisponível,
+  a entrega cai para o próprio processo
+"""
+
+import asyncio
+import json
+import logging
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Type
+
+from bson import ObjectId
+from prometheus_client import Counter, Gauge
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+from ..core.config import settings
+from ..database import get_database
+
+logger = logging.getLogger(__name__)
+
+EVENTOS_PUBLICADOS = Counter("trip_events_published_total", "Eventos de viagem publicados", ["tipo"])
+ASSINANTES = Gauge("trip_event_subscribers", "Assinantes de eventos conectados", ["transporte"])
+ASSINANTES_DESCARTADOS = Counter("trip_event_subscribers_dropped_total", "Assinantes desconectados por fila cheia")
+
+COLECAO_EVENTOS = "eventos_viagem"
+MAX_ROTAS_CONHECIDAS = 50000
+
+
+class AssinanteLento(Exception):
+    """A fila do assinante encheu; a conexão deve ser encerrada"""
+
+
+class LimiteAssinantesError(Exception):
+    """O worker atingiu o número máximo de assinantes"""
+
+
+def _json_padrao(valor: Any) -> str:
+    return valor.isoformat() if isinstance(valor, datetime) else str(valor)
+
+
+class Mensagem:
+    """Evento já codificado, compartilhado entre todos os assinantes"""
+    __slots__ = ("tipo", "json", "sse")
+
+    def __init__(self, evento: Dict[str, Any]):
+        self.tipo = evento["tipo"]
+        self.json = json.dumps(evento, default=_json_padrao, ensure_ascii=False)
+        self.sse = f"id: {evento['id']}\nevent: {self.tipo}\ndata: {self.json}\n\n"
+
+
+class Assinante:
+    __slots__ = ("canais", "transporte", "capacidade", "_mensagens", "_sinal", "lento", "encerrado")
+
+    def __init__(self, canais: Set[str], transporte: str, capacidade: int):
+        self.canais = canais
+        self.transporte = transporte
+        self.capacidade = capacidade
+        self._mensagens: deque = deque()
+        self._sinal = asyncio.Event()
+        self.lento = False
+        self.encerrado = False
+
+    def entregar(self, mensagem: Mensagem):
+        if len(self._mensagens) >= self.capacidade:
+            self.lento = True
+        else:
+            self._mensagens.append(mensagem)
+        self._sinal.set()
+
+    def encerrar(self):
+        """Acorda quem estiver aguardando para que a conexão termine"""
+        self.encerrado = True
+        self._sinal.set()
+
+    async def aguardar(self, timeout: Optional[float] = None) -> List[Mensagem]:
+        """
+        Mensagens acumuladas desde a última chamada (lista vazia no
+        timeout ou no encerramento); lança ``AssinanteLento`` se a fila encheu.
+        """
+        if not self._mensagens and not self.lento and not self.encerrado:
+            try:
+                await asyncio.wait_for(self._sinal.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._sinal.clear()
+        if self.lento:
+            raise AssinanteLento()
+        mensagens = list(self._mensagens)
+        self._mensagens.clear()
+        return mensagens
+
+
+# ---------- barramentos ----------
+class Barramento:
+    """Difunde eventos para todos os workers; ``entregar`` recebe cada evento"""
+
+    async def start(self, entregar: Callable[[Dict[str, Any]], None]):
+        self._entregar = entregar
+
+    async def stop(self):
+        pass
+
+    async def publicar(self, eventos: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+
+class BarramentoMemoria(Barramento):
+    async def publicar(self, eventos: List[Dict[str, Any]]):
+        for evento in eventos:
+            self._entregar(evento)
+
+
+class BarramentoMongo(Barramento):
+    def __init__(self, tamanho_mb: int = settings.EVENTOS_COLECAO_TAMANHO_MB):
+        self.tamanho = tamanho_mb * 1024 * 1024
+        self._tarefa: Optional[asyncio.Task] = None
+
+    async def start(self, entregar: Callable[[Dict[str, Any]], None]):
+        await super().start(entregar)
+        self._tarefa = asyncio.create_task(self._acompanhar())
+
+    async def stop(self):
+        if self._tarefa is None:
+            return
+        self._tarefa.cancel()
+        try:
+            await self._tarefa
+        except asyncio.CancelledError:
+            pass
+        self._tarefa = None
+
+    async def _preparar(self, database):
+        try:
+            await database.create_collection(COLECAO_EVENTOS, capped=True, size=self.tamanho)
+        except CollectionInvalid:
+            pass  # Já existe (criada por outro worker)
+
+    async def _acompanhar(self):
+        ultimo: Optional[ObjectId] = None
+        while True:
+            database = get_database()
+            if database is None:
+                await asyncio.sleep(1)
+                continue
+            try:
+                await self._preparar(database)
+                colecao = database[COLECAO_EVENTOS]
+                if ultimo is None:
+                    # Começa do fim da coleção: eventos anteriores ao início não são reentregues
+                    recente = await colecao.find_one({}, {"_id": 1}, sort=[("$natural", -1)])
+                    ultimo = recente["_id"] if recente else ObjectId()
+                # Ao reabrir, retoma pelo último _id visto; eventos de outro worker gerados no
+                # mesmo segundo podem se perder, e o cliente recarrega o estado ao reconectar
+                cursor = colecao.find({"_id": {"$gt": ultimo}}, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    async for documento in cursor:
+                        ultimo = documento.pop("_id")
+                        self._entregar(documento)
+                    await asyncio.sleep(0.1)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Erro ao acompanhar eventos no MongoDB: {e}")
+            # Coleção vazia ou cursor encerrado: reabre em seguida
+            await asyncio.sleep(1)
+
+    async def publicar(self, eventos: List[Dict[str, Any]]):
+        database = get_database()
+        try:
+            if database is None:
+                raise ConnectionError("MongoDB indisponível")
+            await database[COLECAO_EVENTOS].insert_many(
+                [{"_id": ObjectId(evento["id"]), **evento} for evento in eventos], ordered=True
+            )
+        except Exception as e:
+            logger.warning(f"Eventos entregues apenas neste worker: {e}")
+            for evento in eventos:
+                self._entregar(evento)
+
+
+BARRAMENTOS: Dict[str, Type[Barramento]] = {
+    "memoria": BarramentoMemoria,
+    "mongo": BarramentoMongo,
+}
+
+
+# ---------- difusor ----------
+class DifusorEventos:
+    def __init__(self,
+                 barramento: Optional[Barramento] = None,
+                 max_assinantes: int = settings.EVENTOS_MAX_ASSINANTES,
+                 capacidade_fila: int = settings.EVENTOS_FILA_ASSINANTE):
+        self.barramento = barramento or BARRAMENTOS[settings.EVENTOS_BARRAMENTO]()
+        self.max_assinantes = max_assinantes
+        self.capacidade_fila = capacidade_fila
+        self._canais: Dict[str, Set[Assinante]] = {}
+        self._total = 0
+        # viagem -> rota, para direcionar os eventos de frequência ao canal da rota
+        self._rotas: "OrderedDict[str, Optional[str]]" = OrderedDict()
+
+    async def start(self):
+        await self.barramento.start(self._distribuir)
+
+    async def stop(self):
+        await self.barramento.stop()
+        for assinantes in list(self._canais.values()):
+            for assinante in assinantes:
+                assinante.encerrar()
+
+    @property
+    def total_assinantes(self) -> int:
+        return self._total
+
+    @property
+    def lotado(self) -> bool:
+        return self._total >= self.max_assinantes
+
+    # ---------- assinaturas ----------
+    def assinar(self, viagens: Iterable[str], rotas: Iterable[str], transporte: str) -> Assinante:
+        if self.lotado:
+            raise LimiteAssinantesError("Limite de assinantes atingido neste servidor")
+        canais = {f"viagem:{v}" for v in viagens} | {f"rota:{r}" for r in rotas}
+        assinante = Assinante(canais, transporte, self.capacidade_fila)
+        for canal in canais:
+            self._canais.setdefault(canal, set()).add(assinante)
+        self._total += 1
+        ASSINANTES.labels(transporte).inc()
+        return assinante
+
+    def cancelar(self, assinante: Assinante):
+        for canal in assinante.canais:
+            assinantes = self._canais.get(canal)
+            if assinantes is not None:
+                assinantes.discard(assinante)
+                if not assinantes:
+                    del self._canais[canal]
+        self._total -= 1
+        ASSINANTES.labels(assinante.transporte).dec()
+
+    def _distribuir(self, evento: Dict[str, Any]):
+        """Entrega um evento aos assinantes locais (uma vez por assinante)"""
+        destinatarios: Set[Assinante] = set(self._canais.get(f"viagem:{evento['viagem_id']}", ()))
+        if evento.get("rota_id"):
+            destinatarios.update(self._canais.get(f"rota:{evento['rota_id']}", ()))
+        if not destinatarios:
+            return
+        mensagem = Mensagem(evento)
+        for assinante in destinatarios:
+            ja_lento = assinante.lento
+            assinante.entregar(mensagem)
+            if assinante.lento and not ja_lento:
+                ASSINANTES_DESCARTADOS.inc()
+
+    # ---------- publicação ----------
+    def _lembrar_rota(self, viagem_id: str, rota_id: Optional[str]):
+        self._rotas[viagem_id] = rota_id
+        self._rotas.move_to_end(viagem_id)
+        if len(self._rotas) > MAX_ROTAS_CONHECIDAS:
+            self._rotas.popitem(last=False)
+
+    @staticmethod
+    def _evento(tipo: str, viagem_id: str, rota_id: Optional[str], dados: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": str(ObjectId()),
+            "tipo": tipo,
+            "viagem_id": viagem_id,
+            "rota_id": rota_id,
+            "data_hora": datetime.utcnow(),
+            "dados": dados,
+        }
+
+    async def _publicar(self, eventos: List[Dict[str, Any]]):
+        for evento in eventos:
+            EVENTOS_PUBLICADOS.labels(evento["tipo"]).inc()
+        try:
+            await self.barramento.publicar(eventos)
+        except Exception as e:
+            # Notificação é melhor esforço: nunca falha a requisição que a originou
+            logger.error(f"Erro ao publicar eventos de viagem: {e}")
+
+    async def publicar_status(self, viagem: Any):
+        viagem_id, rota_id = str(viagem.id), str(viagem.rota_id)
+        self._lembrar_rota(viagem_id, rota_id)
+        await self._publicar([self._evento("status", viagem_id, rota_id, {"status": viagem.status.value})])
+
+    async def publicar_incidente(self, viagem_id: str, incidente: Any, rota_id: Optional[str] = None):
+        if rota_id is not None:
+            self._lembrar_rota(viagem_id, rota_id)
+        else:
+            rota_id = self._rotas.get(viagem_id)
+        await self._publicar([self._evento("incidente", viagem_id, rota_id, incidente.model_dump(mode="json"))])
+
+    async def publicar_lotacao(self, viagem_id: str, rota_id: Optional[str], dados: Dict[str, Any]):
+        await self._publicar([self._evento("lotacao", viagem_id, rota_id, dados)])
+
+    async def _resolver_rotas(self, viagens: Set[str]):
+        """Busca, em uma consulta, a rota das viagens ainda desconhecidas"""
+        desconhecidas = [v for v in viagens if v not in self._rotas and ObjectId.is_valid(v)]
+        database = get_database()
+        if not desconhecidas or database is None:
+            return
+        try:
+            cursor = database.viagens.find({"_id": {"$in": [ObjectId(v) for v in desconhecidas]}}, {"rota_id": 1})
+            async for documento in cursor:
+                self._lembrar_rota(str(documento["_id"]), str(documento["rota_id"]))
+            for viagem_id in desconhecidas:
+                if viagem_id not in self._rotas:
+                    self._lembrar_rota(viagem_id, None)  # Viagem inexistente: não consulta de novo
+        except Exception as e:
+            logger.warning(f"Rotas das viagens não resolvidas para os eventos: {e}")
+
+    async def publicar_frequencias(self, frequencias: List[Dict[str, Any]]):
+        if not self._canais and isinstance(self.barramento, BarramentoMemoria):
+            return  # Sem assinantes e sem outros workers para notificar
+        await self._resolver_rotas({str(f["viagem_id"]) for f in frequencias})
+        eventos = []
+        for frequencia in frequencias:
+            viagem_id = str(frequencia["viagem_id"])
+            tipo_registro = frequencia["tipo_registro"]
+            eventos.append(self._evento("frequencia", viagem_id, self._rotas.get(viagem_id), {
+                "aluno_id": str(frequencia["aluno_id"]),
+                "tipo_registro": getattr(tipo_registro, "value", tipo_registro),
+                "data_hora": frequencia.get("data_hora_embarque"),
+            }))
+        await self._publicar(eventos)
+
+difusor_eventos = DifusorEventos()
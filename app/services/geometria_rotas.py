@@ -0,0 +1,136 @@
+"""
+Geometria pré-calculada das rotas.
+
+Distâncias por segmento, distância total, bounding box e polyline
+codificada (algoritmo do Google, precisão 5) são calculadas a partir dos
+pontos de parada e armazenadas no documento da rota, para que clientes
+de mapa não precisem baixar nem reprocessar os pontos completos.
+"""
+
+import math
+from typing import List, Dict, Any, Optional, Tuple
+
+from .otimizacao_rotas import haversine_km
+
+PRECISAO_POLYLINE = 5
+
+
+def _codificar_valor(valor: int) -> str:
+    valor = ~(valor << 1) if valor < 0 else (valor << 1)
+    partes = []
+    while valor >= 0x20:
+        partes.append(chr((0x20 | (valor & 0x1f)) + 63))
+        valor >>= 5
+    partes.append(chr(valor + 63))
+    return "".join(partes)
+
+
+def codificar_polyline(coordenadas: List[Tuple[float, float]], precisao: int = PRECISAO_POLYLINE) -> str:
+    """Codifica uma lista de (lat, lon) no formato Encoded Polyline"""
+    fator = 10 ** precisao
+    resultado = []
+    lat_anterior = lon_anterior = 0
+    for lat, lon in coordenadas:
+        lat_int = int(round(lat * fator))
+        lon_int = int(round(lon * fator))
+        resultado.append(_codificar_valor(lat_int - lat_anterior))
+        resultado.append(_codificar_valor(lon_int - lon_anterior))
+        lat_anterior, lon_anterior = lat_int, lon_int
+    return "".join(resultado)
+
+
+def decodificar_polyline(polyline: str, precisao: int = PRECISAO_POLYLINE) -> List[Tuple[float, float]]:
+    """Decodifica uma Encoded Polyline em uma lista de (lat, lon)"""
+    fator = 10 ** precisao
+    coordenadas = []
+    indice = lat = lon = 0
+    while indice < len(polyline):
+        deltas = []
+        for _ in range(2):
+            deslocamento = valor = 0
+            while True:
+                byte = ord(polyline[indice]) - 63
+                indice += 1
+                valor |= (byte & 0x1f) << deslocamento
+                deslocamento += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(valor >> 1) if valor & 1 else (valor >> 1))
+        lat += deltas[0]
+        lon += deltas[1]
+        coordenadas.append((lat / fator, lon / fator))
+    return coordenadas
+
+
+def calcular_geometria(pontos: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Calcula a geometria (distâncias, bbox e polyline) de uma rota"""
+    ordenados = sorted(pontos, key=lambda p: p["ordem"])
+    coordenadas = [(p["lat"], p["lon"]) for p in ordenados]
+    segmentos = [
+        round(haversine_km(*coordenadas[i], *coordenadas[i + 1]), 3)
+        for i in range(len(coordenadas) - 1)
+    ]
+    lats = [c[0] for c in coordenadas]
+    lons = [c[1] for c in coordenadas]
+    return {
+        "distancia_total_km": round(sum(segmentos), 3),
+        "distancias_segmentos_km": segmentos,
+        "bbox": [min(lons), min(lats), max(lons), max(lats)],
+        "polyline": codificar_polyline(coordenadas),
+    }
+
+
+def _distancia_ponto_segmento_m(p: Tuple[float, float], a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    """Distância aproximada (m) de p ao segmento ab em projeção equiretangular local"""
+    cos_lat = math.cos(math.radians(a[0]))
+    escala = 111_320.0
+    px, py = (p[1] - a[1]) * cos_lat * escala, (p[0] - a[0]) * escala
+    bx, by = (b[1] - a[1]) * cos_lat * escala, (b[0] - a[0]) * escala
+    comprimento2 = bx * bx + by * by
+    if comprimento2 == 0:
+        return math.hypot(px, py)
+    t = max(0.0, min(1.0, (px * bx + py * by) / comprimento2))
+    return math.hypot(px - t * bx, py - t * by)
+
+
+def simplificar(coordenadas: List[Tuple[float, float]], tolerancia_m: float) -> List[Tuple[float, float]]:
+    """Simplificação Douglas-Peucker (iterativa) com tolerância em metros"""
+    if tolerancia_m <= 0 or len(coordenadas) <= 2:
+        return list(coordenadas)
+    manter = [False] * len(coordenadas)
+    manter[0] = manter[-1] = True
+    pilha = [(0, len(coordenadas) - 1)]
+    while pilha:
+        inicio, fim = pilha.pop()
+        maior, indice = 0.0, None
+        for i in range(inicio + 1, fim):
+            d = _distancia_ponto_segmento_m(coordenadas[i], coordenadas[inicio], coordenadas[fim])
+            if d > maior:
+                maior, indice = d, i
+        if indice is not None and maior > tolerancia_m:
+            manter[indice] = True
+            pilha.append((inicio, indice))
+            pilha.append((indice, fim))
+    return [c for c, m in zip(coordenadas, manter) if m]
+
+
+def geometria_para_geojson(rota_id: str, geometria: Dict[str, Any],
+                           tolerancia_m: Optional[float] = None) -> Dict[str, Any]:
+    """Monta um Feature GeoJSON (LineString) a partir da geometria armazenada"""
+    coordenadas = decodificar_polyline(geometria["polyline"])
+    if tolerancia_m:
+        coordenadas = simplificar(coordenadas, tolerancia_m)
+    return {
+        "type": "Feature",
+        "bbox": geometria["bbox"],
+        "geometry": {
+            "type": "LineString",
+            # GeoJSON usa a ordem [lon, lat]
+            "coordinates": [[lon, lat] for lat, lon in coordenadas],
+        },
+        "properties": {
+            "rota_id": rota_id,
+            "distancia_total_km": geometria["distancia_total_km"],
+            "distancias_segmentos_km": geometria["distancias_segmentos_km"],
+        },
+    }
@@ -0,0 +1,215 @@
+"""
+Ingestão de eventos de frequência (embarque/desembarque) com write-behind.
+
+Os eventos são colocados em uma ``asyncio.Queue`` e gravados em lote com
+``insert_many`` quando o lote atinge o tamanho configurado ou quando o
+intervalo máximo expira. O índice único
+``(aluno_id, viagem_id, tipo_registro)`` torna os reenvios do cliente
+idempotentes: duplicatas são descartadas silenciosamente.
+
+Os eventos efetivamente inseridos alimentam os contadores de ocupação
+das viagens (``ocupacao_viagens.py``) e são publicados para os
+assinantes de eventos (``eventos_viagem.py``); reenvios descartados
+como duplicata não geram um novo evento.
+
+Se o banco estiver indisponível, o lote vai para o spool local durável
+(``spool.py``); enquanto houver registros no spool, os novos lotes também
+vão para ele, preservando a ordem dos eventos na reaplicação.
+
+Eventos recusados pelo banco por outro motivo que não duplicata voltam
+para o lote seguinte; depois de ``FREQUENCIA_MAX_TENTATIVAS`` tentativas
+vão para o spool de rejeitados. Um evento aceito nunca é descartado.
+"""
+
+import asyncio
+import logging
+import time
+from typing import List, Dict, Any, Optional
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, ConnectionFailure
+
+from ..core.config import settings
+from ..core.referencias import com_referencias
+from ..database import get_database
+from ..models.pydantic_models import FrequenciaCreate
+from .eventos_viagem import difusor_eventos
+from .ocupacao_viagens import contador_ocupacao
+from .spool import spool_eventos, spool_rejeitados
+
+logger = logging.getLogger(__name__)
+
+CODIGO_CHAVE_DUPLICADA = 11000
+
+
+class FilaCheiaError(Exception):
+    """A fila de ingestão atingiu a capacidade máxima"""
+
+
+class IngestorFrequencias:
+    def __init__(self,
+                 tamanho_lote: int = settings.FREQUENCIA_LOTE_TAMANHO,
+                 intervalo_ms: int = settings.FREQUENCIA_LOTE_INTERVALO_MS,
+                 capacidade_fila: int = settings.FREQUENCIA_FILA_CAPACIDADE,
+                 max_tentativas: int = settings.FREQUENCIA_MAX_TENTATIVAS):
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo_ms / 1000
+        self.capacidade_fila = capacidade_fila
+        self.max_tentativas = max_tentativas
+        self._tentativas: Dict[ObjectId, int] = {}
+        self._fila: Optional[asyncio.Queue] = None
+        self._tarefa: Optional[asyncio.Task] = None
+        self._pendentes: List[Dict[str, Any]] = []
+        self.inseridos = 0
+        self.duplicados = 0
+        self.rejeitados = 0
+
+    def start(self):
+        """Inicia a tarefa de gravação em segundo plano"""
+        if self._tarefa is None:
+            self._fila = asyncio.Queue(maxsize=self.capacidade_fila)
+            self._tarefa = asyncio.create_task(self._executar())
+
+    async def stop(self):
+        """Interrompe a tarefa e grava o que restar na fila"""
+        if self._tarefa is None:
+            return
+        self._tarefa.cancel()
+        try:
+            await self._tarefa
+        except asyncio.CancelledError:
+            pass
+        self._tarefa = None
+        while not self._fila.empty():
+            self._pendentes.append(self._fila.get_nowait())
+        await self._gravar()
+        if self._pendentes:
+            # Última chance no desligamento: o que o banco não aceitou vai para o spool
+            logger.warning(f"Enviando {len(self._pendentes)} frequências não gravadas para o spool")
+            if not await self._enviar_para_spool():
+                logger.critical(f"{len(self._pendentes)} frequências perdidas no desligamento")
+
+    def enfileirar(self, eventos: List[FrequenciaCreate]) -> int:
+        """Coloca eventos na fila sem bloquear; falha se não houver espaço"""
+        if self._fila is None:
+            raise FilaCheiaError("Ingestão de frequências não iniciada")
+        if self._fila.qsize() + len(eventos) > self.capacidade_fila:
+            raise FilaCheiaError("Fila de ingestão de frequências cheia")
+        for evento in eventos:
+            documento = com_referencias(evento.model_dump())
+            documento["_id"] = ObjectId()
+            self._fila.put_nowait(documento)
+        return len(eventos)
+
+    @property
+    def tamanho_fila(self) -> int:
+        return self._fila.qsize() if self._fila else 0
+
+    async def _executar(self):
+        while True:
+            if not self._pendentes:
+                self._pendentes.append(await self._fila.get())
+            limite = time.monotonic() + self.intervalo
+            while len(self._pendentes) < self.tamanho_lote:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    self._pendentes.append(await asyncio.wait_for(self._fila.get(), restante))
+                except asyncio.TimeoutError:
+                    break
+            await self._gravar()
+
+    async def _enviar_para_spool(self) -> bool:
+        """Grava os pendentes no spool; só os libera depois do fsync"""
+        try:
+            await spool_eventos.anexar([
+                {"colecao": "frequencias", "op": "insert", "documento": documento}
+                for documento in self._pendentes
+            ])
+        except Exception as e:
+            logger.error(f"Erro ao gravar {len(self._pendentes)} frequências no spool: {e}")
+            return False
+        for documento in self._pendentes:
+            self._tentativas.pop(documento["_id"], None)
+        self._pendentes = []
+        return True
+
+    async def _reter(self, falhas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Separa os eventos que ainda podem ser tentados dos que esgotaram as tentativas"""
+        retidos, esgotados = [], []
+        for erro in falhas:
+            documento = erro["documento"]
+            tentativas = self._tentativas.get(documento["_id"], 0) + 1
+            if tentativas < self.max_tentativas:
+                self._tentativas[documento["_id"]] = tentativas
+                retidos.append(documento)
+            else:
+                self._tentativas.pop(documento["_id"], None)
+                esgotados.append({
+                    "colecao": "frequencias", "op": "insert", "documento": documento,
+                    "codigo": erro.get("code"), "erro": erro.get("errmsg"),
+                })
+        if esgotados:
+            self.rejeitados += len(esgotados)
+            logger.error(f"{len(esgotados)} frequências recusadas {self.max_tentativas} vezes; "
+                         f"guardadas em {spool_rejeitados.caminho}")
+            try:
+                await spool_rejeitados.anexar(esgotados)
+            except Exception as e:
+                logger.error(f"Erro ao gravar frequências rejeitadas no spool: {e}")
+                return retidos + [registro["documento"] for registro in esgotados]
+        return retidos
+
+    async def _gravar(self):
+        """Grava os eventos pendentes no banco ou, se indisponível, no spool local"""
+        if not self._pendentes:
+            return
+        database = get_database()
+        if database is None or spool_eventos.pendente:
+            if not await self._enviar_para_spool():
+                await asyncio.sleep(self.intervalo)
+            return
+        lote = self._pendentes
+        gravados = lote
+        retidos: List[Dict[str, Any]] = []
+        try:
+            result = await database.frequencias.insert_many(lote, ordered=False)
+            self.inseridos += len(result.inserted_ids)
+        except BulkWriteError as e:
+            erros = e.details.get("writeErrors", [])
+            outros = [erro for erro in erros if erro.get("code") != CODIGO_CHAVE_DUPLICADA]
+            self.inseridos += e.details.get("nInserted", 0)
+            self.duplicados += len(erros) - len(outros)
+            if outros:
+                logger.error(f"Erro ao gravar {len(outros)} frequências: {outros[0].get('errmsg')}")
+                retidos = await self._reter([{**erro, "documento": lote[erro["index"]]} for erro in outros])
+            rejeitados = {erro["index"] for erro in erros}
+            gravados = [documento for i, documento in enumerate(lote) if i not in rejeitados]
+        except ConnectionFailure as e:
+            logger.warning(f"MongoDB indisponível, enviando {len(lote)} frequências para o spool: {e}")
+            if not await self._enviar_para_spool():
+                await asyncio.sleep(self.intervalo)
+            return
+        except Exception as e:
+            # Falha desconhecida: o lote inteiro vai para o spool e o replayer tenta de novo
+            logger.error(f"Erro ao gravar lote de frequências, enviando {len(lote)} para o spool: {e}")
+            if not await self._enviar_para_spool():
+                await asyncio.sleep(self.intervalo)
+            return
+        # Eventos recusados voltam para o próximo lote
+        em_espera = {documento["_id"] for documento in retidos}
+        for documento in lote:
+            if documento["_id"] not in em_espera:
+                self._tentativas.pop(documento["_id"], None)
+        self._pendentes = retidos
+        try:
+            await contador_ocupacao.registrar(database, gravados)
+        except Exception as e:
+            # Melhor esforço: a reconciliação periódica corrige os contadores
+            logger.error(f"Erro ao atualizar a ocupação das viagens: {e}")
+        if gravados:
+            await difusor_eventos.publicar_frequencias(gravados)
+
+
+ingestor_frequencias = IngestorFrequencias()
@@ -0,0 +1,341 @@
+"""
+Manifesto diário do motorista: um documento pré-calculado por motorista
+e dia na coleção ``manifestos``, com as viagens do dia, a rota com os
+pontos de parada e a geometria, o veículo e os alunos esperados. O
+aplicativo do motorista carrega tudo com uma única leitura por índice,
+sem os ``$lookup`` de ``/viagens/{id}/detalhes`` e ``/alunos``.
+
+Os alunos esperados de uma rota são os que embarcaram nas viagens dela
+nos últimos ``MANIFESTO_JANELA_ALUNOS_DIAS`` dias (o modelo não tem
+matrícula de aluno em rota).
+
+Montagem e atualização:
+
+- ``PreparadorManifestos`` monta os manifestos de hoje e dos próximos
+  ``MANIFESTO_DIAS_ANTECEDENCIA`` dias a cada ``MANIFESTO_INTERVALO_S``;
+  um hash do conteúdo evita regravar (e mudar a versão de) documentos
+  que não mudaram
+- mudanças de status e incidentes são aplicadas no próprio documento
+  com o operador posicional
+- rota, veículo e aluno alterados são corrigidos com ``arrayFilters``
+  em todos os manifestos a partir de hoje
+- viagens criadas, removidas ou reatribuídas remontam apenas os
+  manifestos (motorista, dia) afetados
+
+Cada alteração incrementa ``versao``; com ``gerado_em``, forma o ``ETag``
+da leitura.
+As correções são de melhor esforço: uma falha é registrada e o ciclo
+periódico seguinte corrige o documento.
+"""
+
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from ..core.config import settings
+from ..core.referencias import ambas_formas, oid
+from ..database import get_database
+from ..models.pydantic_models import TipoRegistro
+
+logger = logging.getLogger(__name__)
+
+ORDEM_TURNOS = {"Manhã": 0, "Tarde": 1, "Noite": 2}
+
+PROJECAO_MOTORISTA = {"nome_completo": 1, "cnh": 1}
+PROJECAO_ROTA = {"nome_rota": 1, "turno": 1, "pontos_de_parada": 1, "geometria": 1}
+PROJECAO_VEICULO = {"placa": 1, "modelo": 1, "capacidade_passageiros": 1, "adaptado_pcd": 1, "status_manutencao": 1}
+PROJECAO_ALUNO = {"nome_completo": 1, "matricula": 1, "telefone": 1, "necessidade_especial": 1,
+                  "ponto_embarque_preferencial_id": 1}
+
+
+def _resumo_motorista(documento: Dict[str, Any]) -> Dict[str, Any]:
+    return {"id": str(documento["_id"]), "nome_completo": documento["nome_completo"], "cnh": documento["cnh"]}
+
+
+def _resumo_rota(documento: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": str(documento["_id"]),
+        "nome_rota": documento["nome_rota"],
+        "turno": documento["turno"],
+        "pontos_de_parada": sorted(documento.get("pontos_de_parada", []), key=lambda p: p["ordem"]),
+        "geometria": documento.get("geometria"),
+    }
+
+
+def _resumo_veiculo(documento: Dict[str, Any]) -> Dict[str, Any]:
+    resumo = {campo: documento[campo] for campo in PROJECAO_VEICULO}
+    resumo["id"] = str(documento["_id"])
+    return resumo
+
+
+def _resumo_aluno(documento: Dict[str, Any]) -> Dict[str, Any]:
+    ponto = documento.get("ponto_embarque_preferencial_id")
+    return {
+        "id": str(documento["_id"]),
+        "nome_completo": documento["nome_completo"],
+        "matricula": documento["matricula"],
+        "telefone": documento.get("telefone"),
+        "necessidade_especial": documento.get("necessidade_especial"),
+        "ponto_embarque_preferencial_id": str(ponto) if ponto else None,
+    }
+
+
+def _documento(modelo: Any) -> Dict[str, Any]:
+    """Modelo Pydantic devolvido pelo CRUDService -> documento como no banco"""
+    return modelo.model_dump(by_alias=True, mode="json")
+
+
+def _hash(conteudo: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(conteudo, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _melhor_esforco(metodo):
+    """Correções nunca falham a requisição que as originou"""
+    @functools.wraps(metodo)
+    async def envoltorio(self, *args, **kwargs):
+        try:
+            return await metodo(self, *args, **kwargs)
+        except Exception as e:
+            logger.warning(f"Manifestos não corrigidos ({metodo.__name__}), serão remontados no próximo ciclo: {e}")
+    return envoltorio
+
+
+class ManifestoService:
+    def __init__(self, db, janela_alunos_dias: int = settings.MANIFESTO_JANELA_ALUNOS_DIAS):
+        self.db = db
+        self.janela_alunos = janela_alunos_dias
+
+    # ---------- leitura ----------
+    async def obter(self, motorista_id: str, data: date) -> Optional[Dict[str, Any]]:
+        """Manifesto do motorista no dia; monta na hora se ainda não existir"""
+        if not ObjectId.is_valid(motorista_id):
+            return None
+        filtro = {"motorista_id": ObjectId(motorista_id), "data": data}
+        manifesto = await self.db.manifestos.find_one(filtro, {"hash": 0})
+        if manifesto is None:
+            await self.construir(data, [motorista_id])
+            manifesto = await self.db.manifestos.find_one(filtro, {"hash": 0})
+            if manifesto is None:
+                return None
+        manifesto["motorista_id"] = str(manifesto["motorista_id"])
+        return manifesto
+
+    # ---------- montagem ----------
+    async def _por_id(self, colecao: str, ids: Set[ObjectId], projecao: Dict[str, int]) -> Dict[ObjectId, Dict[str, Any]]:
+        if not ids:
+            return {}
+        return {d["_id"]: d async for d in self.db[colecao].find({"_id": {"$in": list(ids)}}, projecao)}
+
+    async def _alunos_esperados(self, data: date, rota_ids: Set[ObjectId]) -> Dict[ObjectId, List[Dict[str, Any]]]:
+        """Alunos que embarcaram nas viagens de cada rota dentro da janela"""
+        if not rota_ids:
+            return {}
+        inicio = data - timedelta(days=self.janela_alunos)
+        rota_da_viagem = {
+            v["_id"]: oid(v["rota_id"])
+            async for v in self.db.viagens.find(
+                {"rota_id": {"$in": ambas_formas(rota_ids)}, "data_viagem": {"$gte": inicio, "$lt": data}},
+                {"rota_id": 1}
+            )
+        }
+        if not rota_da_viagem:
+            return {}
+        alunos_por_rota: Dict[ObjectId, Set[ObjectId]] = defaultdict(set)
+        pipeline = [
+            {"$match": {"viagem_id": {"$in": ambas_formas(rota_da_viagem)},
+                        "tipo_registro": TipoRegistro.EMBARQUE.value}},
+            {"$group": {"_id": "$aluno_id", "viagens": {"$addToSet": "$viagem_id"}}},
+        ]
+        async for grupo in self.db.frequencias.aggregate(pipeline):
+            aluno_id = oid(grupo["_id"])
+            if aluno_id is None:
+                continue
+            for viagem_id in grupo["viagens"]:
+                alunos_por_rota[rota_da_viagem[oid(viagem_id)]].add(aluno_id)
+        alunos = await self._por_id("alunos", set().union(*alunos_por_rota.values()), PROJECAO_ALUNO)
+        return {
+            rota_id: sorted((_resumo_aluno(alunos[a]) for a in ids if a in alunos), key=lambda a: a["nome_completo"])
+            for rota_id, ids in alunos_por_rota.items()
+        }
+
+    async def construir(self, data: date, motorista_ids: Optional[List[str]] = None) -> int:
+        """
+        Monta os manifestos do dia (dos motoristas com viagens ou manifesto
+        no dia, ou só dos informados) e grava os que mudaram; retorna quantos
+        gravou. Motorista sem viagens fica com o manifesto vazio.
+        """
+        filtro: Dict[str, Any] = {"data_viagem": data}
+        if motorista_ids is not None:
+            filtro["motorista_id"] = {"$in": ambas_formas(motorista_ids)}
+        viagens = await self.db.viagens.find(filtro, {"status": 1, "rota_id": 1, "motorista_id": 1,
+                                                       "veiculo_id": 1, "incidentes": 1}).to_list(length=None)
+        # Viagens da API podem guardar as referências como string: as chaves abaixo são ObjectId
+        for viagem in viagens:
+            for campo in ("rota_id", "motorista_id", "veiculo_id"):
+                viagem[campo] = oid(viagem[campo])
+
+        filtro_existentes: Dict[str, Any] = {"data": data}
+        if motorista_ids is not None:
+            alvo = {oid(m) for m in motorista_ids} - {None}
+            filtro_existentes["motorista_id"] = {"$in": list(alvo)}
+        existentes = {
+            d["motorista_id"]: d.get("hash")
+            async for d in self.db.manifestos.find(filtro_existentes, {"motorista_id": 1, "hash": 1})
+        }
+        if motorista_ids is None:
+            # Motoristas sem viagens no dia mantêm o manifesto (vazio): apagá-lo faria
+            # o próximo obter() remontá-lo e mudar a versão a cada ciclo
+            alvo = {v["motorista_id"] for v in viagens} | set(existentes)
+        motoristas = await self._por_id("motoristas", alvo, PROJECAO_MOTORISTA)
+        rotas = await self._por_id("rotas", {v["rota_id"] for v in viagens}, PROJECAO_ROTA)
+        veiculos = await self._por_id("veiculos", {v["veiculo_id"] for v in viagens}, PROJECAO_VEICULO)
+        alunos_esperados = await self._alunos_esperados(data, set(rotas))
+
+        viagens_por_motorista: Dict[ObjectId, List[Dict[str, Any]]] = defaultdict(list)
+        for viagem in viagens:
+            rota = rotas.get(viagem["rota_id"])
+            veiculo = veiculos.get(viagem["veiculo_id"])
+            viagens_por_motorista[viagem["motorista_id"]].append({
+                "viagem_id": str(viagem["_id"]),
+                "status": viagem["status"],
+                "rota": _resumo_rota(rota) if rota else None,
+                "veiculo": _resumo_veiculo(veiculo) if veiculo else None,
+                "alunos_esperados": alunos_esperados.get(viagem["rota_id"], []),
+                "incidentes": viagem.get("incidentes", []),
+            })
+
+        agora = datetime.utcnow()
+        operacoes = []
+        for motorista_id in alvo:
+            motorista = motoristas.get(motorista_id)
+            if motorista is None:
+                continue
+            itens = sorted(
+                viagens_por_motorista.get(motorista_id, []),
+                key=lambda v: (ORDEM_TURNOS.get((v["rota"] or {}).get("turno"), 99), v["viagem_id"])
+            )
+            conteudo = {"motorista": _resumo_motorista(motorista), "viagens": itens}
+            hash_conteudo = _hash(conteudo)
+            if existentes.get(motorista_id) == hash_conteudo:
+                continue
+            operacoes.append(UpdateOne(
+                {"motorista_id": motorista_id, "data": data},
+                {"$set": {**conteudo, "hash": hash_conteudo, "gerado_em": agora}, "$inc": {"versao": 1}},
+                upsert=True
+            ))
+
+        # Só somem os manifestos de motoristas removidos
+        obsoletos = [m for m in existentes if m not in motoristas]
+        if obsoletos:
+            await self.db.manifestos.delete_many({"data": data, "motorista_id": {"$in": obsoletos}})
+        if operacoes:
+            await self.db.manifestos.bulk_write(operacoes, ordered=False)
+        return len(operacoes)
+
+    # ---------- correções incrementais ----------
+    @_melhor_esforco
+    async def reconstruir_viagem(self, viagem: Any, anterior: Optional[Any] = None):
+        """Viagem criada, removida ou reatribuída: remonta os manifestos afetados"""
+        afetados = {(str(viagem.motorista_id), viagem.data_viagem)}
+        if anterior is not None:
+            afetados.add((str(anterior.motorista_id), anterior.data_viagem))
+        for motorista_id, data in afetados:
+            await self.construir(data, [motorista_id])
+
+    @_melhor_esforco
+    async def atualizar_status(self, viagem_id: str, status: str):
+        await self.db.manifestos.update_one(
+            {"viagens.viagem_id": viagem_id},
+            {"$set": {"viagens.$.status": status, "gerado_em": datetime.utcnow()}, "$inc": {"versao": 1}}
+        )
+
+    @_melhor_esforco
+    async def adicionar_incidente(self, viagem_id: str, incidente: Any):
+        await self.db.manifestos.update_one(
+            {"viagens.viagem_id": viagem_id},
+            {"$push": {"viagens.$.incidentes": incidente.model_dump()},
+             "$set": {"gerado_em": datetime.utcnow()}, "$inc": {"versao": 1}}
+        )
+
+    async def _corrigir_elemento(self, campo: str, resumo: Dict[str, Any]):
+        """Substitui a rota/veículo embutido em todas as viagens dos manifestos a partir de hoje"""
+        await self.db.manifestos.update_many(
+            {"data": {"$gte": date.today()}, f"viagens.{campo}.id": resumo["id"]},
+            {"$set": {f"viagens.$[v].{campo}": resumo, "gerado_em": datetime.utcnow()}, "$inc": {"versao": 1}},
+            array_filters=[{f"v.{campo}.id": resumo["id"]}]
+        )
+
+    @_melhor_esforco
+    async def atualizar_rota(self, rota: Any):
+        await self._corrigir_elemento("rota", _resumo_rota(_documento(rota)))
+
+    @_melhor_esforco
+    async def atualizar_veiculo(self, veiculo: Any):
+        await self._corrigir_elemento("veiculo", _resumo_veiculo(_documento(veiculo)))
+
+    @_melhor_esforco
+    async def atualizar_aluno(self, aluno: Any):
+        resumo = _resumo_aluno(_documento(aluno))
+        await self.db.manifestos.update_many(
+            {"data": {"$gte": date.today()}, "viagens.alunos_esperados.id": resumo["id"]},
+            {"$set": {"viagens.$[].alunos_esperados.$[a]": resumo, "gerado_em": datetime.utcnow()},
+             "$inc": {"versao": 1}},
+            array_filters=[{"a.id": resumo["id"]}]
+        )
+
+
+class PreparadorManifestos:
+    """Monta periodicamente os manifestos de hoje e dos próximos dias"""
+
+    def __init__(self,
+                 dias_antecedencia: int = settings.MANIFESTO_DIAS_ANTECEDENCIA,
+                 intervalo_s: float = settings.MANIFESTO_INTERVALO_S):
+        self.dias_antecedencia = dias_antecedencia
+        self.intervalo = intervalo_s
+        self._tarefa: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._tarefa is None:
+            self._tarefa = asyncio.create_task(self._executar())
+
+    async def stop(self):
+        if self._tarefa is None:
+            return
+        self._tarefa.cancel()
+        try:
+            await self._tarefa
+        except asyncio.CancelledError:
+            pass
+        self._tarefa = None
+
+    async def preparar(self) -> int:
+        database = get_database()
+        if database is None:
+            return 0
+        servico = ManifestoService(database)
+        hoje = date.today()
+        gravados = 0
+        for dias in range(self.dias_antecedencia + 1):
+            gravados += await servico.construir(hoje + timedelta(days=dias))
+        return gravados
+
+    async def _executar(self):
+        while True:
+            try:
+                gravados = await self.preparar()
+                if gravados:
+                    logger.info(f"Manifestos atualizados: {gravados}")
+            except Exception as e:
+                logger.error(f"Erro ao preparar manifestos: {e}")
+            await asyncio.sleep(self.intervalo)
+
+
+preparador_manifestos = PreparadorManifestos()
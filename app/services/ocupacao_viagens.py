@@ -0,0 +1,283 @@
+"""
+Ocupação das viagens em tempo real: alunos a bordo x capacidade do veículo.
+
+Cada viagem tem um documento em ``ocupacao_viagens`` com os contadores de
+embarques e desembarques, somados com ``$inc`` pelo ingestor de
+frequências logo depois de gravar cada lote. Só os eventos realmente
+inseridos contam, então reenvios (descartados pelo índice único) não
+inflam os contadores, e cada lote vira uma única ``bulk_write`` com uma
+atualização por viagem.
+
+A rota, o veículo, a data e a capacidade de cada viagem são resolvidos em
+lote (uma consulta ``$in`` por coleção) e guardados em um cache limitado.
+Quando os alunos a bordo passam da capacidade, a viagem é marcada como
+``lotada``; a transição é um ``update_one`` condicional, então só um
+worker alerta, e um evento ``lotacao`` é publicado aos assinantes da
+viagem e da rota.
+
+Eventos reaplicados do spool, frequências removidas e trocas de veículo
+ou de capacidade não passam pelo contador: o ``ReconciliadorOcupacao``
+recalcula periodicamente as viagens de hoje e dos
+``OCUPACAO_RECONCILIACAO_DIAS`` dias anteriores (o spool reaplica, depois
+de uma queda, embarques de dias passados) a partir de ``frequencias`` e
+corrige as divergências (um lote gravado durante a reconciliação pode
+ser contado duas vezes e é corrigido na passada seguinte).
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict, defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from prometheus_client import Counter
+from pymongo import UpdateOne
+
+from ..core.config import settings
+from ..core.referencias import oid
+from ..database import get_database
+from ..models.pydantic_models import OcupacaoViagem, StatusViagem, TipoRegistro
+from .eventos_viagem import difusor_eventos
+
+logger = logging.getLogger(__name__)
+
+COLECAO_OCUPACAO = "ocupacao_viagens"
+MAX_VIAGENS_CONHECIDAS = 50000
+CAMPO_TIPO = {TipoRegistro.EMBARQUE: "embarques", TipoRegistro.DESEMBARQUE: "desembarques"}
+
+EVENTOS_CONTADOS = Counter("trip_occupancy_events_total", "Embarques e desembarques somados à ocupação", ["tipo"])
+ALERTAS_LOTACAO = Counter("trip_over_capacity_alerts_total", "Viagens que passaram da capacidade do veículo")
+CORRECOES = Counter("trip_occupancy_reconciled_total", "Contadores de ocupação corrigidos pela reconciliação")
+
+
+def _ocupacao(documento: Dict[str, Any]) -> OcupacaoViagem:
+    embarques = documento.get("embarques", 0)
+    desembarques = documento.get("desembarques", 0)
+    capacidade = documento.get("capacidade")
+    a_bordo = max(embarques - desembarques, 0)
+    return OcupacaoViagem(
+        viagem_id=str(documento["_id"]),
+        rota_id=str(documento["rota_id"]),
+        veiculo_id=str(documento["veiculo_id"]),
+        data_viagem=documento["data_viagem"],
+        embarques=embarques,
+        desembarques=desembarques,
+        a_bordo=a_bordo,
+        capacidade=capacidade,
+        taxa_ocupacao=round(a_bordo / capacidade, 3) if capacidade else None,
+        lotada=documento.get("lotada", False),
+        atualizado_em=documento.get("atualizado_em"),
+    )
+
+
+class ContadorOcupacao:
+    def __init__(self):
+        # viagem -> {rota_id, veiculo_id, data_viagem, capacidade}
+        self._viagens: "OrderedDict[ObjectId, Dict[str, Any]]" = OrderedDict()
+
+    def _lembrar(self, viagem_id: ObjectId, dados: Dict[str, Any]):
+        self._viagens[viagem_id] = dados
+        self._viagens.move_to_end(viagem_id)
+        if len(self._viagens) > MAX_VIAGENS_CONHECIDAS:
+            self._viagens.popitem(last=False)
+
+    def esquecer(self, viagem_id: Any):
+        """Descarta os dados guardados da viagem (ex.: troca de veículo)"""
+        self._viagens.pop(oid(viagem_id), None)
+
+    async def _carregar(self, database, viagens: List[Dict[str, Any]]) -> Dict[ObjectId, Dict[str, Any]]:
+        """Guarda rota, veículo, data e capacidade de viagens já lidas (uma consulta aos veículos)"""
+        veiculo_ids = list({oid(v["veiculo_id"]) for v in viagens})
+        capacidades = {
+            v["_id"]: v.get("capacidade_passageiros")
+            async for v in database.veiculos.find({"_id": {"$in": veiculo_ids}}, {"capacidade_passageiros": 1})
+        }
+        carregadas = {}
+        for viagem in viagens:
+            veiculo_id = oid(viagem["veiculo_id"])
+            carregadas[viagem["_id"]] = {
+                "rota_id": oid(viagem["rota_id"]),
+                "veiculo_id": veiculo_id,
+                "data_viagem": viagem["data_viagem"],
+                "capacidade": capacidades.get(veiculo_id),
+            }
+            self._lembrar(viagem["_id"], carregadas[viagem["_id"]])
+        return carregadas
+
+    async def _resolver(self, database, viagem_ids: Iterable[ObjectId]) -> Dict[ObjectId, Optional[Dict[str, Any]]]:
+        viagem_ids = list(viagem_ids)
+        desconhecidas = [v for v in viagem_ids if v not in self._viagens]
+        if desconhecidas:
+            viagens = await database.viagens.find(
+                {"_id": {"$in": desconhecidas}}, {"rota_id": 1, "veiculo_id": 1, "data_viagem": 1}
+            ).to_list(length=None)
+            # Viagem inexistente não é guardada: pode ser criada depois (ou chegar
+            # antes das frequências no replay do spool) e deve passar a contar
+            await self._carregar(database, viagens)
+        return {v: self._viagens.get(v) for v in viagem_ids}
+
+    async def registrar(self, database, frequencias: List[Dict[str, Any]]):
+        """Soma os eventos gravados aos contadores (uma atualização por viagem)"""
+        incrementos: Dict[ObjectId, Dict[str, int]] = defaultdict(lambda: {"embarques": 0, "desembarques": 0})
+        for frequencia in frequencias:
+            viagem_id = oid(frequencia["viagem_id"])
+            if viagem_id is None:
+                continue
+            tipo = TipoRegistro(frequencia["tipo_registro"])
+            incrementos[viagem_id][CAMPO_TIPO[tipo]] += 1
+            EVENTOS_CONTADOS.labels(tipo.value).inc()
+        if not incrementos:
+            return
+
+        viagens = await self._resolver(database, incrementos)
+        agora = datetime.utcnow()
+        operacoes = [
+            UpdateOne(
+                {"_id": viagem_id},
+                {"$inc": incrementos[viagem_id], "$set": {**dados, "atualizado_em": agora}},
+                upsert=True
+            )
+            for viagem_id, dados in viagens.items() if dados is not None
+        ]
+        if not operacoes:
+            return
+        await database[COLECAO_OCUPACAO].bulk_write(operacoes, ordered=False)
+        await self.verificar_lotacao(database, [v for v, dados in viagens.items() if dados is not None])
+
+    async def verificar_lotacao(self, database, viagem_ids: List[ObjectId]):
+        """Marca/desmarca as viagens lotadas e alerta na transição"""
+        colecao = database[COLECAO_OCUPACAO]
+        async for documento in colecao.find({"_id": {"$in": viagem_ids}}):
+            ocupacao = _ocupacao(documento)
+            lotada = ocupacao.capacidade is not None and ocupacao.a_bordo > ocupacao.capacidade
+            if lotada == ocupacao.lotada:
+                continue
+            # Condicional: com vários workers, só quem faz a transição alerta
+            result = await colecao.update_one(
+                {"_id": documento["_id"], "lotada": {"$ne": True} if lotada else True},
+                {"$set": {"lotada": lotada}}
+            )
+            if not result.modified_count:
+                continue
+            if lotada:
+                ALERTAS_LOTACAO.inc()
+                logger.warning(
+                    f"Viagem {ocupacao.viagem_id} acima da capacidade: {ocupacao.a_bordo}/{ocupacao.capacidade}"
+                )
+            await difusor_eventos.publicar_lotacao(ocupacao.viagem_id, ocupacao.rota_id, {
+                "a_bordo": ocupacao.a_bordo, "capacidade": ocupacao.capacidade, "lotada": lotada
+            })
+
+    async def obter(self, database, viagem_id: str) -> Optional[OcupacaoViagem]:
+        """Ocupação de uma viagem; zerada se ainda não houve embarques"""
+        _id = oid(viagem_id)
+        if _id is None:
+            return None
+        documento = await database[COLECAO_OCUPACAO].find_one({"_id": _id})
+        if documento is None:
+            dados = (await self._resolver(database, [_id]))[_id]
+            if dados is None:
+                return None
+            documento = {"_id": _id, **dados}
+        return _ocupacao(documento)
+
+    async def listar(self, database, dia: date, apenas_lotadas: bool = False) -> List[OcupacaoViagem]:
+        """Ocupação de todas as viagens do dia com embarques, das mais cheias para as mais vazias"""
+        filtro: Dict[str, Any] = {"data_viagem": dia}
+        if apenas_lotadas:
+            filtro["lotada"] = True
+        ocupacoes = [_ocupacao(d) async for d in database[COLECAO_OCUPACAO].find(filtro)]
+        ocupacoes.sort(key=lambda o: (o.taxa_ocupacao or 0, o.a_bordo), reverse=True)
+        return ocupacoes
+
+
+class ReconciliadorOcupacao:
+    """Recalcula periodicamente a ocupação das viagens dos últimos dias a partir das frequências"""
+
+    def __init__(self, contador: ContadorOcupacao,
+                 intervalo_s: float = settings.OCUPACAO_RECONCILIACAO_S,
+                 dias_anteriores: int = settings.OCUPACAO_RECONCILIACAO_DIAS):
+        self.contador = contador
+        self.intervalo = intervalo_s
+        self.dias_anteriores = dias_anteriores
+        self._tarefa: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._tarefa is None:
+            self._tarefa = asyncio.create_task(self._executar())
+
+    async def stop(self):
+        if self._tarefa is None:
+            return
+        self._tarefa.cancel()
+        try:
+            await self._tarefa
+        except asyncio.CancelledError:
+            pass
+        self._tarefa = None
+
+    async def reconciliar(self, dia: Optional[date] = None) -> int:
+        """Corrige os contadores divergentes; retorna quantas viagens foram corrigidas"""
+        database = get_database()
+        if database is None:
+            return 0
+        dia = dia or date.today()
+        viagens = await database.viagens.find(
+            {"data_viagem": dia, "status": {"$ne": StatusViagem.CANCELADA.value}},
+            {"rota_id": 1, "veiculo_id": 1, "data_viagem": 1}
+        ).to_list(length=None)
+        if not viagens:
+            return 0
+        # Renova o cache: capacidade e veículo podem ter mudado desde o último lote
+        dados = await self.contador._carregar(database, viagens)
+
+        ids = [v["_id"] for v in viagens]
+        contagens: Dict[ObjectId, Dict[str, int]] = defaultdict(lambda: {"embarques": 0, "desembarques": 0})
+        pipeline = [
+            {"$match": {"viagem_id": {"$in": ids + [str(i) for i in ids]}}},
+            {"$group": {"_id": {"viagem_id": "$viagem_id", "tipo": "$tipo_registro"}, "total": {"$sum": 1}}},
+        ]
+        async for grupo in database.frequencias.aggregate(pipeline):
+            campo = CAMPO_TIPO[TipoRegistro(grupo["_id"]["tipo"])]
+            contagens[oid(grupo["_id"]["viagem_id"])][campo] += grupo["total"]
+
+        colecao = database[COLECAO_OCUPACAO]
+        atuais = {d["_id"]: d async for d in colecao.find({"_id": {"$in": ids}})}
+        agora = datetime.utcnow()
+        operacoes, corrigidas = [], []
+        for viagem_id in ids:
+            esperado = {**dados[viagem_id], **contagens[viagem_id]}
+            atual = atuais.get(viagem_id)
+            if atual is None and not contagens[viagem_id]["embarques"] + contagens[viagem_id]["desembarques"]:
+                continue  # Sem embarques: não precisa de documento
+            if atual is None or any(atual.get(campo) != valor for campo, valor in esperado.items()):
+                operacoes.append(UpdateOne({"_id": viagem_id}, {"$set": {**esperado, "atualizado_em": agora}}, upsert=True))
+                corrigidas.append(viagem_id)
+        if operacoes:
+            await colecao.bulk_write(operacoes, ordered=False)
+            CORRECOES.inc(len(operacoes))
+            await self.contador.verificar_lotacao(database, corrigidas)
+        return len(operacoes)
+
+    async def reconciliar_janela(self) -> int:
+        """Reconcilia hoje e os ``dias_anteriores`` dias; retorna o total de viagens corrigidas"""
+        hoje = date.today()
+        corrigidas = 0
+        for dias in range(self.dias_anteriores + 1):
+            corrigidas += await self.reconciliar(hoje - timedelta(days=dias))
+        return corrigidas
+
+    async def _executar(self):
+        while True:
+            await asyncio.sleep(self.intervalo)
+            try:
+                corrigidas = await self.reconciliar_janela()
+                if corrigidas:
+                    logger.info(f"Ocupação reconciliada: {corrigidas} viagens corrigidas")
+            except Exception as e:
+                logger.error(f"Erro ao reconciliar a ocupação das viagens: {e}")
+
+
+contador_ocupacao = ContadorOcupacao()
+reconciliador_ocupacao = ReconciliadorOcupacao(contador_ocupacao)
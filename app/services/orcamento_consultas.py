@@ -0,0 +1,75 @@
+"""
+Orçamento de tempo e cancelamento de consultas pesadas.
+
+Cada relatório roda com ``maxTimeMS`` e um ``comment`` único. Se o cliente
+HTTP desconectar antes do fim, a operação é localizada no servidor via
+``$currentOp`` pelo comentário e encerrada com ``killOp``, liberando o
+MongoDB em vez de deixá-lo trabalhando para ninguém. Consultas que
+estouram o orçamento retornam 504 com uma alternativa para o cliente.
+"""
+
+import asyncio
+import logging
+import uuid
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException, Request
+from pymongo.errors import ExecutionTimeout
+
+logger = logging.getLogger(__name__)
+
+INTERVALO_VERIFICACAO_DESCONEXAO_S = 0.25
+
+
+async def cancelar_operacao(db, comentario: str):
+    """Encerra no servidor as operações marcadas com ``comentario``"""
+    try:
+        operacoes = await db.client.admin.aggregate([
+            {"$currentOp": {}},
+            {"$match": {"command.comment": comentario}},
+            {"$project": {"opid": 1}}
+        ]).to_list(length=None)
+        for operacao in operacoes:
+            await db.client.admin.command("killOp", op=operacao["opid"])
+    except Exception as e:
+        logger.warning(f"Não foi possível cancelar a operação {comentario}: {e}")
+
+
+async def executar_com_orcamento(
+    request: Request,
+    db,
+    consulta: Callable[[int, str], Awaitable[Any]],
+    orcamento_ms: int,
+    alternativa: Optional[str] = None
+) -> Any:
+    """
+    Executa ``consulta(max_time_ms, comentario)`` dentro do orçamento.
+
+    Cancela a operação no servidor se o cliente desconectar e converte
+    ``ExecutionTimeout`` em um 504 estruturado.
+    """
+    comentario = f"rotafacil:{request.url.path}:{uuid.uuid4().hex}"
+    tarefa = asyncio.ensure_future(consulta(orcamento_ms, comentario))
+    try:
+        while True:
+            done, _ = await asyncio.wait({tarefa}, timeout=INTERVALO_VERIFICACAO_DESCONEXAO_S)
+            if done:
+                return tarefa.result()
+            if await request.is_disconnected():
+                tarefa.cancel()
+                await cancelar_operacao(db, comentario)
+                # 499: convenção para "cliente fechou a requisição"
+                raise HTTPException(status_code=499, detail="Cliente desconectado")
+    except ExecutionTimeout:
+        raise HTTPException(
+            status_code=504,
+            detail={
+                "erro": "orcamento_de_consulta_excedido",
+                "mensagem": "A consulta excedeu o tempo máximo permitido",
+                "orcamento_ms": orcamento_ms,
+                "alternativa": alternativa
+            }
+        )
+    finally:
+        if not tarefa.done():
+            tarefa.cancel()
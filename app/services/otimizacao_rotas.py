@@ -0,0 +1,172 @@
+"""
+Otimização da ordem de visita dos pontos de parada de uma rota.
+
+O primeiro e o último ponto (pela ``ordem`` atual) são fixos; os pontos
+intermediários são reordenados com vizinho mais próximo seguido de
+2-opt e Or-opt sobre uma matriz de distâncias haversine pré-calculada.
+As funções deste módulo são puras e podem ser executadas em um
+``ProcessPoolExecutor`` sem acesso ao banco de dados.
+"""
+
+import asyncio
+import math
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional
+
+RAIO_TERRA_KM = 6371.0088
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distância em km entre duas coordenadas pela fórmula de haversine"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * RAIO_TERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def matriz_distancias(pontos: List[Dict[str, Any]]) -> List[List[float]]:
+    """Matriz simétrica de distâncias (km) entre todos os pontos"""
+    n = len(pontos)
+    matriz = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        lat_i, lon_i = pontos[i]["lat"], pontos[i]["lon"]
+        for j in range(i + 1, n):
+            d = haversine_km(lat_i, lon_i, pontos[j]["lat"], pontos[j]["lon"])
+            matriz[i][j] = d
+            matriz[j][i] = d
+    return matriz
+
+
+def distancia_caminho(caminho: List[int], matriz: List[List[float]]) -> float:
+    """Distância total percorrendo os índices de ``caminho`` em sequência"""
+    return sum(matriz[caminho[i]][caminho[i + 1]] for i in range(len(caminho) - 1))
+
+
+def _vizinho_mais_proximo(n: int, matriz: List[List[float]]) -> List[int]:
+    """Caminho inicial partindo de 0 e terminando em n-1"""
+    restantes = set(range(1, n - 1))
+    caminho = [0]
+    atual = 0
+    while restantes:
+        proximo = min(restantes, key=lambda j: matriz[atual][j])
+        restantes.remove(proximo)
+        caminho.append(proximo)
+        atual = proximo
+    caminho.append(n - 1)
+    return caminho
+
+
+def _dois_opt(caminho: List[int], matriz: List[List[float]]) -> bool:
+    """Aplica uma passada de 2-opt mantendo as extremidades fixas"""
+    melhorou = False
+    n = len(caminho)
+    for i in range(1, n - 2):
+        a, b = caminho[i - 1], caminho[i]
+        for k in range(i + 1, n - 1):
+            c, d = caminho[k], caminho[k + 1]
+            delta = matriz[a][c] + matriz[b][d] - matriz[a][b] - matriz[c][d]
+            if delta < -1e-9:
+                caminho[i:k + 1] = reversed(caminho[i:k + 1])
+                b = caminho[i]
+                melhorou = True
+    return melhorou
+
+
+def _or_opt(caminho: List[int], matriz: List[List[float]]) -> bool:
+    """Move segmentos de 1 a 3 pontos para a posição de menor custo"""
+    n = len(caminho)
+    for tamanho in (1, 2, 3):
+        for i in range(1, n - tamanho):
+            j = i + tamanho - 1
+            if j >= n - 1:
+                break
+            anterior, posterior = caminho[i - 1], caminho[j + 1]
+            primeiro, ultimo = caminho[i], caminho[j]
+            ganho_remocao = (matriz[anterior][primeiro] + matriz[ultimo][posterior]
+                             - matriz[anterior][posterior])
+            segmento = caminho[i:j + 1]
+            resto = caminho[:i] + caminho[j + 1:]
+            melhor_delta = 0.0
+            melhor_pos = None
+            melhor_invertido = False
+            for pos in range(len(resto) - 1):
+                p, q = resto[pos], resto[pos + 1]
+                base = matriz[p][q]
+                custo = matriz[p][primeiro] + matriz[ultimo][q] - base
+                custo_inv = matriz[p][ultimo] + matriz[primeiro][q] - base
+                if custo - ganho_remocao < melhor_delta - 1e-9:
+                    melhor_delta, melhor_pos, melhor_invertido = custo - ganho_remocao, pos, False
+                if custo_inv - ganho_remocao < melhor_delta - 1e-9:
+                    melhor_delta, melhor_pos, melhor_invertido = custo_inv - ganho_remocao, pos, True
+            if melhor_pos is not None:
+                if melhor_invertido:
+                    segmento.reverse()
+                caminho[:] = resto[:melhor_pos + 1] + segmento + resto[melhor_pos + 1:]
+                return True
+    return False
+
+
+def otimizar_ordem_pontos(pontos: List[Dict[str, Any]], max_iteracoes: int = 100) -> Dict[str, Any]:
+    """
+    Calcula uma ordem de visita quase ótima para os pontos de parada.
+
+    Retorna os pontos reordenados (com ``ordem`` renumerada a partir de 1),
+    a distância original, a otimizada e a economia em km.
+    """
+    ordenados = sorted(pontos, key=lambda p: p["ordem"])
+    n = len(ordenados)
+    matriz = matriz_distancias(ordenados)
+    original = list(range(n))
+    distancia_original = distancia_caminho(original, matriz)
+
+    if n <= 3:
+        caminho = original
+    else:
+        caminho = _vizinho_mais_proximo(n, matriz)
+        for _ in range(max_iteracoes):
+            if not (_dois_opt(caminho, matriz) | _or_opt(caminho, matriz)):
+                break
+        # A heurística nunca deve piorar a ordem informada manualmente
+        if distancia_caminho(caminho, matriz) >= distancia_original:
+            caminho = original
+
+    distancia_otimizada = distancia_caminho(caminho, matriz)
+    pontos_otimizados = []
+    for nova_ordem, indice in enumerate(caminho, start=1):
+        ponto = dict(ordenados[indice])
+        ponto["ordem"] = nova_ordem
+        pontos_otimizados.append(ponto)
+
+    return {
+        "pontos_de_parada": pontos_otimizados,
+        "distancia_original_km": round(distancia_original, 3),
+        "distancia_otimizada_km": round(distancia_otimizada, 3),
+        "economia_km": round(distancia_original - distancia_otimizada, 3),
+        "ordem_alterada": caminho != original,
+    }
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Retorna o pool de processos compartilhado (criado sob demanda)"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor()
+    return _executor
+
+
+def shutdown_executor():
+    """Encerra o pool de processos, se tiver sido criado"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def otimizar_em_processo(pontos: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Executa ``otimizar_ordem_pontos`` no pool de processos"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), otimizar_ordem_pontos, pontos)
@@ -0,0 +1,262 @@
+"""
+Posições GPS dos veículos durante as viagens.
+
+Os motoristas enviam lotes de pontos; a última posição de cada viagem e
+um histórico curto (buffer circular) ficam em memória, e as leituras dos
+aplicativos dos pais são atendidas só a partir dela, sem tocar no banco.
+
+Para o trajeto persistido, os pontos são reduzidos por tempo (no máximo
+um a cada ``POSICAO_AMOSTRAGEM_TRAJETO_S``) e gravados periodicamente
+com um único ``bulk_write``, no padrão bucket: um documento em
+``trajetos`` por viagem e hora, com os pontos em um array. Se o banco
+estiver indisponível, os pontos reduzidos aguardam a próxima tentativa
+(com limite por viagem).
+
+A primeira vez que uma viagem envia posições, verifica-se no banco se
+ela existe e está "Em Andamento"; depois disso, a viagem é conhecida e
+os lotes seguintes não consultam o banco. Com o banco indisponível as
+posições são aceitas sem verificação, mas a viagem só passa a ser
+conhecida (e ter o trajeto gravado) quando um lote recebido com o banco
+de volta a confirmar; se ela for recusada, o que foi guardado é descartado. Viagens sem posições por mais
+de ``POSICAO_TTL_S`` são descartadas da memória, e o número de viagens
+acompanhadas é limitado (as menos recentes saem primeiro).
+
+O estado é por processo: com vários workers, o balanceador deve enviar
+as requisições de uma mesma viagem sempre ao mesmo worker.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from prometheus_client import Counter, Gauge
+from pymongo import UpdateOne
+
+from ..core.config import settings
+from ..database import get_database
+from ..models.pydantic_models import PosicaoGPS, StatusViagem
+
+logger = logging.getLogger(__name__)
+
+POSICOES_RECEBIDAS = Counter("gps_positions_received_total", "Posições GPS recebidas", ["resultado"])
+VIAGENS_RASTREADAS = Gauge("gps_tracked_trips", "Viagens com posição em memória")
+PONTOS_PERSISTIDOS = Counter("gps_track_points_persisted_total", "Pontos de trajeto gravados no MongoDB")
+
+
+class ViagemNaoRastreavel(Exception):
+    """A viagem não existe ou não está em andamento"""
+
+
+def _utc(data_hora: datetime) -> datetime:
+    """Normaliza para UTC sem fuso (como o MongoDB devolve)"""
+    if data_hora.tzinfo is not None:
+        return data_hora.astimezone(timezone.utc).replace(tzinfo=None)
+    return data_hora
+
+
+class EstadoViagem:
+    __slots__ = ("ultima", "historico", "pendentes", "ultimo_amostrado", "atualizado", "verificada")
+
+    def __init__(self, capacidade: int):
+        self.ultima: Optional[Dict[str, Any]] = None
+        self.historico: deque = deque(maxlen=capacidade)
+        self.pendentes: List[Dict[str, Any]] = []
+        self.ultimo_amostrado: Optional[datetime] = None
+        self.atualizado = time.monotonic()
+        self.verificada = False
+
+
+class RastreadorPosicoes:
+    def __init__(self,
+                 historico: int = settings.POSICAO_HISTORICO,
+                 max_viagens: int = settings.POSICAO_MAX_VIAGENS,
+                 amostragem_trajeto_s: float = settings.POSICAO_AMOSTRAGEM_TRAJETO_S,
+                 intervalo_persistencia_s: float = settings.POSICAO_PERSISTENCIA_INTERVALO_S,
+                 ttl_s: float = settings.POSICAO_TTL_S):
+        self.historico = historico
+        self.max_viagens = max_viagens
+        self.amostragem_trajeto_s = amostragem_trajeto_s
+        self.intervalo_persistencia = intervalo_persistencia_s
+        self.ttl = ttl_s
+        # Limite de pontos reduzidos aguardando gravação por viagem
+        self.max_pendentes = historico * 10
+        self._viagens: "OrderedDict[str, EstadoViagem]" = OrderedDict()
+        self._orfaos: List[Tuple[str, List[Dict[str, Any]]]] = []
+        self._tarefa: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Inicia a gravação periódica dos trajetos"""
+        if self._tarefa is None:
+            self._tarefa = asyncio.create_task(self._executar())
+
+    async def stop(self):
+        """Interrompe a tarefa e grava os trajetos pendentes"""
+        if self._tarefa is None:
+            return
+        self._tarefa.cancel()
+        try:
+            await self._tarefa
+        except asyncio.CancelledError:
+            pass
+        self._tarefa = None
+        await self.persistir()
+
+    # ---------- ingestão ----------
+    async def _validar_viagem(self, viagem_id: str) -> bool:
+        """Falha se a viagem não pode ser rastreada; retorna False se não foi possível verificar"""
+        if not ObjectId.is_valid(viagem_id):
+            raise ViagemNaoRastreavel("ID de viagem inválido")
+        database = get_database()
+        if database is None:
+            # Sem banco, aceita as posições: o acompanhamento continua em memória
+            return False
+        viagem = await database.viagens.find_one({"_id": ObjectId(viagem_id)}, {"status": 1})
+        if viagem is None:
+            raise ViagemNaoRastreavel("Viagem não encontrada")
+        if viagem.get("status") != StatusViagem.EM_ANDAMENTO.value:
+            raise ViagemNaoRastreavel("A viagem não está em andamento")
+        return True
+
+    def _estado(self, viagem_id: str) -> EstadoViagem:
+        estado = EstadoViagem(self.historico)
+        self._viagens[viagem_id] = estado
+        while len(self._viagens) > self.max_viagens:
+            antigo_id, antigo = self._viagens.popitem(last=False)
+            if antigo.pendentes and antigo.verificada:
+                self._orfaos.append((antigo_id, antigo.pendentes))
+        VIAGENS_RASTREADAS.set(len(self._viagens))
+        return estado
+
+    async def registrar(self, viagem_id: str, pontos: List[PosicaoGPS]) -> Tuple[int, int]:
+        """Registra um lote de pontos; retorna (aceitos, descartados)"""
+        estado = self._viagens.get(viagem_id)
+        if estado is None or not estado.verificada:
+            try:
+                verificada = await self._validar_viagem(viagem_id)
+            except ViagemNaoRastreavel:
+                # Aceita enquanto o banco estava fora e recusada agora: descarta o que foi guardado
+                if self._viagens.pop(viagem_id, None) is not None:
+                    VIAGENS_RASTREADAS.set(len(self._viagens))
+                raise
+            # Outra requisição pode ter criado o estado durante a consulta
+            estado = self._viagens.get(viagem_id) or self._estado(viagem_id)
+            estado.verificada = estado.verificada or verificada
+        self._viagens.move_to_end(viagem_id)
+        estado.atualizado = time.monotonic()
+
+        recebido_em = datetime.utcnow()
+        aceitos = 0
+        for ponto in sorted(pontos, key=lambda p: _utc(p.data_hora)):
+            data_hora = _utc(ponto.data_hora)
+            # Pontos repetidos ou fora de ordem não substituem a última posição
+            if estado.ultima is not None and data_hora <= estado.ultima["data_hora"]:
+                continue
+            posicao = {
+                "lat": ponto.lat,
+                "lon": ponto.lon,
+                "data_hora": data_hora,
+                "velocidade_kmh": ponto.velocidade_kmh,
+                "direcao": ponto.direcao,
+            }
+            estado.historico.append(posicao)
+            estado.ultima = posicao
+            aceitos += 1
+            if (estado.ultimo_amostrado is None
+                    or (data_hora - estado.ultimo_amostrado).total_seconds() >= self.amostragem_trajeto_s):
+                estado.pendentes.append(posicao)
+                estado.ultimo_amostrado = data_hora
+        if len(estado.pendentes) > self.max_pendentes:
+            del estado.pendentes[:-self.max_pendentes]
+        if estado.ultima is not None:
+            estado.ultima = {**estado.ultima, "recebido_em": recebido_em}
+
+        descartados = len(pontos) - aceitos
+        POSICOES_RECEBIDAS.labels("aceito").inc(aceitos)
+        POSICOES_RECEBIDAS.labels("descartado").inc(descartados)
+        return aceitos, descartados
+
+    # ---------- leitura (somente memória) ----------
+    def ultima_posicao(self, viagem_id: str) -> Optional[Dict[str, Any]]:
+        estado = self._viagens.get(viagem_id)
+        if estado is None or estado.ultima is None:
+            return None
+        return {"viagem_id": viagem_id, **estado.ultima}
+
+    def recentes(self, viagem_id: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """Últimos ``limit`` pontos, do mais antigo para o mais recente"""
+        estado = self._viagens.get(viagem_id)
+        if estado is None:
+            return None
+        return list(estado.historico)[-limit:]
+
+    def posicoes_ativas(self) -> List[Dict[str, Any]]:
+        return [
+            {"viagem_id": viagem_id, **estado.ultima}
+            for viagem_id, estado in self._viagens.items()
+            if estado.ultima is not None
+        ]
+
+    # ---------- persistência ----------
+    async def _executar(self):
+        while True:
+            await asyncio.sleep(self.intervalo_persistencia)
+            try:
+                await self.persistir()
+            except Exception as e:
+                logger.error(f"Erro ao gravar trajetos: {e}")
+            self._expirar()
+
+    def _expirar(self):
+        limite = time.monotonic() - self.ttl
+        expiradas = [v for v, e in self._viagens.items()
+                     if e.atualizado < limite and (not e.pendentes or not e.verificada)]
+        for viagem_id in expiradas:
+            del self._viagens[viagem_id]
+        VIAGENS_RASTREADAS.set(len(self._viagens))
+
+    async def persistir(self):
+        """Grava os pontos reduzidos pendentes em buckets por viagem e hora"""
+        lote: List[Tuple[str, List[Dict[str, Any]]]] = self._orfaos
+        self._orfaos = []
+        for viagem_id, estado in self._viagens.items():
+            # Viagem ainda não confirmada no banco: os pontos aguardam a verificação
+            if estado.pendentes and estado.verificada:
+                lote.append((viagem_id, estado.pendentes))
+                estado.pendentes = []
+        if not lote:
+            return
+
+        database = get_database()
+        try:
+            if database is None:
+                raise ConnectionError("MongoDB indisponível")
+            operacoes = []
+            for viagem_id, pontos in lote:
+                por_hora: Dict[datetime, List[Dict[str, Any]]] = {}
+                for ponto in pontos:
+                    hora = ponto["data_hora"].replace(minute=0, second=0, microsecond=0)
+                    por_hora.setdefault(hora, []).append(ponto)
+                for hora, pontos_hora in por_hora.items():
+                    operacoes.append(UpdateOne(
+                        {"viagem_id": ObjectId(viagem_id), "hora": hora},
+                        {"$push": {"pontos": {"$each": pontos_hora}}, "$inc": {"n": len(pontos_hora)}},
+                        upsert=True
+                    ))
+            await database.trajetos.bulk_write(operacoes, ordered=False)
+            PONTOS_PERSISTIDOS.inc(sum(len(pontos) for _, pontos in lote))
+        except Exception as e:
+            logger.warning(f"Trajetos não gravados, nova tentativa em {self.intervalo_persistencia}s: {e}")
+            # Devolve os pontos, respeitando o limite por viagem
+            for viagem_id, pontos in lote:
+                estado = self._viagens.get(viagem_id)
+                if estado is None:
+                    self._orfaos.append((viagem_id, pontos[-self.max_pendentes:]))
+                else:
+                    estado.pendentes = (pontos + estado.pendentes)[-self.max_pendentes:]
+
+
+rastreador_posicoes = RastreadorPosicoes()
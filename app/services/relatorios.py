@@ -0,0 +1,196 @@
+"""
+Relatório de frequência exportado em fluxo (CSV ou NDJSON).
+
+O relatório percorre as viagens do período (índice ``data_viagem`` ou
+``rota_data_viagem``) em ordem de data, em blocos de
+``RELATORIO_VIAGENS_POR_BLOCO`` viagens, e para cada dia do bloco lê as
+frequências com um cursor (índice ``viagem_tipo``, agrupadas por viagem)
+em lotes de ``RELATORIO_LOTE_TAMANHO`` documentos; o ``$in`` não segue a
+ordem da lista, então uma consulta por dia mantém as linhas em ordem de
+data. Cada lote é completado com os dados dos alunos e das rotas por
+consultas ``$in`` (com caches limitados), codificado e entregue como um
+único pedaço da resposta.
+
+Nada é acumulado além do lote atual: o gerador só avança quando o
+cliente consome o pedaço anterior (a ``StreamingResponse`` aguarda o
+envio), então a memória é constante e um cliente lento freia a leitura
+no MongoDB em vez de encher o worker. Se o cliente desconectar, o
+gerador é encerrado e o cursor aberto é fechado.
+"""
+
+import csv
+import io
+import json
+import logging
+from collections import OrderedDict
+from contextlib import aclosing
+from datetime import date
+from itertools import groupby
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from prometheus_client import Counter
+
+from ..core.config import settings
+from ..core.referencias import ambas_formas, oid
+
+logger = logging.getLogger(__name__)
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+COLUNAS = [
+    "data_viagem", "viagem_id", "rota_id", "nome_rota", "turno",
+    "aluno_id", "matricula", "nome_aluno", "tipo_registro", "data_hora",
+]
+MAX_ALUNOS_CONHECIDOS = 20000
+MAX_ROTAS_CONHECIDAS = 5000
+
+LINHAS_EXPORTADAS = Counter("report_rows_exported_total", "Linhas exportadas nos relatórios", ["formato"])
+
+
+class _Cache(OrderedDict):
+    """Cache LRU limitado"""
+
+    def __init__(self, limite: int):
+        super().__init__()
+        self.limite = limite
+
+    def guardar(self, chave: Any, valor: Any):
+        self[chave] = valor
+        self.move_to_end(chave)
+        if len(self) > self.limite:
+            self.popitem(last=False)
+
+
+class RelatorioFrequencia:
+    def __init__(self, db, inicio: date, fim: date, rota_id: Optional[str] = None,
+                 tamanho_lote: int = settings.RELATORIO_LOTE_TAMANHO,
+                 viagens_por_bloco: int = settings.RELATORIO_VIAGENS_POR_BLOCO):
+        self.db = db
+        self.inicio = inicio
+        self.fim = fim
+        self.rota_id = oid(rota_id) if rota_id else None
+        self.tamanho_lote = tamanho_lote
+        self.viagens_por_bloco = viagens_por_bloco
+        self._alunos = _Cache(MAX_ALUNOS_CONHECIDOS)
+        self._rotas = _Cache(MAX_ROTAS_CONHECIDAS)
+
+    async def _completar_alunos(self, frequencias: List[Dict[str, Any]]):
+        faltantes = {oid(f["aluno_id"]) for f in frequencias} - set(self._alunos) - {None}
+        if not faltantes:
+            return
+        cursor = self.db.alunos.find({"_id": {"$in": list(faltantes)}}, {"nome_completo": 1, "matricula": 1})
+        async for aluno in cursor:
+            self._alunos.guardar(aluno["_id"], aluno)
+        for aluno_id in faltantes:
+            if aluno_id not in self._alunos:
+                self._alunos.guardar(aluno_id, {})  # Aluno removido: exporta só o id
+
+    async def _completar_rotas(self, viagens: List[Dict[str, Any]]):
+        faltantes = {oid(v["rota_id"]) for v in viagens} - set(self._rotas)
+        if not faltantes:
+            return
+        async for rota in self.db.rotas.find({"_id": {"$in": list(faltantes)}}, {"nome_rota": 1, "turno": 1}):
+            self._rotas.guardar(rota["_id"], rota)
+        for rota_id in faltantes:
+            if rota_id not in self._rotas:
+                self._rotas.guardar(rota_id, {})
+
+    def _linha(self, frequencia: Dict[str, Any], viagem: Dict[str, Any]) -> Dict[str, Any]:
+        rota = self._rotas.get(oid(viagem["rota_id"]), {})
+        aluno = self._alunos.get(oid(frequencia["aluno_id"]), {})
+        data_viagem = viagem["data_viagem"]
+        data_hora = frequencia.get("data_hora_embarque")
+        return {
+            "data_viagem": data_viagem.date().isoformat() if hasattr(data_viagem, "date") else str(data_viagem),
+            "viagem_id": str(viagem["_id"]),
+            "rota_id": str(viagem["rota_id"]),
+            "nome_rota": rota.get("nome_rota"),
+            "turno": rota.get("turno"),
+            "aluno_id": str(frequencia["aluno_id"]),
+            "matricula": aluno.get("matricula"),
+            "nome_aluno": aluno.get("nome_completo"),
+            "tipo_registro": frequencia.get("tipo_registro"),
+            "data_hora": data_hora.isoformat() if data_hora else None,
+        }
+
+    async def _bloco(self, viagens: List[Dict[str, Any]]) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Linhas das frequências de um bloco de viagens, em lotes"""
+        await self._completar_rotas(viagens)
+        por_id = {str(v["_id"]): v for v in viagens}
+        lote: List[Dict[str, Any]] = []
+        # As viagens do bloco já vêm em ordem de data: uma consulta por dia
+        for _, do_dia in groupby(viagens, key=lambda v: v["data_viagem"]):
+            cursor = self.db.frequencias.find(
+                {"viagem_id": {"$in": ambas_formas(v["_id"] for v in do_dia)}},
+                {"aluno_id": 1, "viagem_id": 1, "tipo_registro": 1, "data_hora_embarque": 1}
+            ).sort("viagem_id", 1).batch_size(self.tamanho_lote)
+            try:
+                async for frequencia in cursor:
+                    lote.append(frequencia)
+                    if len(lote) >= self.tamanho_lote:
+                        await self._completar_alunos(lote)
+                        yield [self._linha(f, por_id[str(f["viagem_id"])]) for f in lote]
+                        lote = []
+            finally:
+                await cursor.close()
+        if lote:
+            await self._completar_alunos(lote)
+            yield [self._linha(f, por_id[str(f["viagem_id"])]) for f in lote]
+
+    async def lotes(self) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Linhas do relatório em lotes, na ordem das viagens"""
+        filtro: Dict[str, Any] = {"data_viagem": {"$gte": self.inicio, "$lte": self.fim}}
+        if self.rota_id:
+            filtro["rota_id"] = {"$in": ambas_formas([self.rota_id])}
+        cursor = self.db.viagens.find(
+            filtro, {"rota_id": 1, "data_viagem": 1}
+        ).sort([("data_viagem", 1), ("_id", 1)]).batch_size(self.viagens_por_bloco)
+        try:
+            bloco: List[Dict[str, Any]] = []
+            async for viagem in cursor:
+                bloco.append(viagem)
+                if len(bloco) >= self.viagens_por_bloco:
+                    # aclosing: fecha o cursor do bloco mesmo se o cliente desconectar no meio
+                    async with aclosing(self._bloco(bloco)) as lotes:
+                        async for lote in lotes:
+                            yield lote
+                    bloco = []
+            if bloco:
+                async with aclosing(self._bloco(bloco)) as lotes:
+                    async for lote in lotes:
+                        yield lote
+        finally:
+            await cursor.close()
+
+
+def _csv(linhas: List[Dict[str, Any]], cabecalho: bool = False) -> str:
+    buffer = io.StringIO()
+    escritor = csv.DictWriter(buffer, fieldnames=COLUNAS, lineterminator="\n")
+    if cabecalho:
+        escritor.writeheader()
+    escritor.writerows(linhas)
+    return buffer.getvalue()
+
+
+def _ndjson(linhas: List[Dict[str, Any]]) -> str:
+    return "".join(json.dumps(linha, ensure_ascii=False) + "\n" for linha in linhas)
+
+
+async def exportar_frequencia(relatorio: RelatorioFrequencia, formato: str) -> AsyncIterator[bytes]:
+    """Codifica o relatório no formato pedido, um pedaço por lote"""
+    total = 0
+    try:
+        if formato == "csv":
+            yield _csv([], cabecalho=True).encode()
+        async with aclosing(relatorio.lotes()) as lotes:
+            async for linhas in lotes:
+                total += len(linhas)
+                LINHAS_EXPORTADAS.labels(formato).inc(len(linhas))
+                yield (_csv(linhas) if formato == "csv" else _ndjson(linhas)).encode()
+    except Exception as e:
+        # A resposta já começou: só resta registrar e interromper o fluxo
+        logger.error(f"Relatório de frequência interrompido após {total} linhas: {e}")
+        raise
+    logger.info(f"Relatório de frequência exportado: {total} linhas ({formato})")
@@ -0,0 +1,292 @@
+"""
+Spool local durável para gravações críticas quando o MongoDB está indisponível.
+
+Os registros são anexados a um arquivo append-only no formato
+``[tamanho:uint32][crc32:uint32][payload BSON]``. ``anexar`` coloca o
+registro em um buffer em memória e aguarda o ``fsync`` que o cobre: uma
+tarefa em segundo plano grava o buffer e faz ``fsync`` em lotes (group
+commit), então quem confirma um registro ao cliente só o faz depois que
+ele está no disco. Na abertura, uma cauda truncada ou corrompida (queda
+do processo no meio de uma escrita) é descartada.
+
+Um replayer drena o spool para o MongoDB em ordem, com ``bulk_write``,
+e registra o offset já aplicado em um arquivo de checkpoint gravado de
+forma atômica. Como o checkpoint é gravado depois do banco, um registro
+pode ser reaplicado após uma queda; por isso as operações do spool devem
+ser idempotentes (inserts com ``_id`` fixo, updates condicionais). Um
+registro que o banco recusa (validação, por exemplo) é movido para o
+spool ``rejeitados`` em vez de bloquear os seguintes: enquanto o spool
+tem pendências, todas as gravações novas são desviadas para o disco. Os
+documentos inseridos pelo replay recebem ``reaplicado_em``: o ``_id`` foi
+gerado antes da queda, então quem lê por faixa de ``_id`` (a exportação
+colunar) usa esse campo para achar os que chegaram atrasados.
+"""
+
+import asyncio
+import logging
+import os
+import struct
+import zlib
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+import bson
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from ..core.config import settings
+from ..database import get_database
+
+logger = logging.getLogger(__name__)
+
+CABECALHO = struct.Struct("<II")
+CODIGO_CHAVE_DUPLICADA = 11000
+
+
+class SpoolDuravel:
+    def __init__(self, diretorio: str, nome: str,
+                 intervalo_fsync_ms: int = settings.SPOOL_FSYNC_INTERVALO_MS):
+        self.caminho = os.path.join(diretorio, f"{nome}.spool")
+        self.caminho_checkpoint = os.path.join(diretorio, f"{nome}.offset")
+        self.intervalo_fsync = intervalo_fsync_ms / 1000
+        self._diretorio = diretorio
+        self._buffer: List[bytes] = []
+        self._aguardando: List[asyncio.Future] = []
+        self._lock = asyncio.Lock()
+        self._lock_escrita = asyncio.Lock()
+        self._tarefa: Optional[asyncio.Task] = None
+        self._pendente = False
+
+    # ---------- arquivo (executado em thread) ----------
+    def _abrir(self):
+        os.makedirs(self._diretorio, exist_ok=True)
+        if not os.path.exists(self.caminho):
+            open(self.caminho, "ab").close()
+        _, fim_valido = self._ler(0, None)
+        if fim_valido < os.path.getsize(self.caminho):
+            logger.warning(f"Spool {self.caminho}: descartando cauda inválida a partir do byte {fim_valido}")
+            with open(self.caminho, "r+b") as arquivo:
+                arquivo.truncate(fim_valido)
+                os.fsync(arquivo.fileno())
+        self._pendente = self._ler_checkpoint() < fim_valido
+
+    def _escrever(self, dados: bytes):
+        with open(self.caminho, "ab") as arquivo:
+            arquivo.write(dados)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+
+    def _ler(self, offset: int, limite: Optional[int]) -> Tuple[List[Dict[str, Any]], int]:
+        """Lê registros válidos a partir de ``offset``; retorna (registros, offset final)"""
+        registros = []
+        with open(self.caminho, "rb") as arquivo:
+            arquivo.seek(offset)
+            while limite is None or len(registros) < limite:
+                cabecalho = arquivo.read(CABECALHO.size)
+                if len(cabecalho) < CABECALHO.size:
+                    break
+                tamanho, crc = CABECALHO.unpack(cabecalho)
+                payload = arquivo.read(tamanho)
+                if len(payload) < tamanho or zlib.crc32(payload) != crc:
+                    break
+                registros.append(bson.decode(payload))
+                offset += CABECALHO.size + tamanho
+        return registros, offset
+
+    def _ler_checkpoint(self) -> int:
+        try:
+            with open(self.caminho_checkpoint) as arquivo:
+                return int(arquivo.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _gravar_checkpoint(self, offset: int):
+        temporario = self.caminho_checkpoint + ".tmp"
+        with open(temporario, "w") as arquivo:
+            arquivo.write(str(offset))
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, self.caminho_checkpoint)
+
+    def _compactar(self, offset: int) -> bool:
+        """Zera o spool quando tudo já foi aplicado"""
+        if offset < os.path.getsize(self.caminho):
+            return False
+        with open(self.caminho, "r+b") as arquivo:
+            arquivo.truncate(0)
+            os.fsync(arquivo.fileno())
+        self._gravar_checkpoint(0)
+        return True
+
+    # ---------- API assíncrona ----------
+    async def start(self):
+        """Recupera o arquivo e inicia a tarefa de fsync em lote"""
+        await asyncio.to_thread(self._abrir)
+        if self._tarefa is None:
+            self._tarefa = asyncio.create_task(self._executar_fsync())
+
+    async def stop(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+            self._tarefa = None
+        await self.sincronizar()
+
+    async def anexar(self, registros: List[Dict[str, Any]]):
+        """Anexa registros ao spool e retorna quando estão no disco (falha se o fsync falhar)"""
+        for registro in registros:
+            payload = bson.encode(registro)
+            self._buffer.append(CABECALHO.pack(len(payload), zlib.crc32(payload)) + payload)
+        self._pendente = True
+        gravado = asyncio.get_running_loop().create_future()
+        # Consome o resultado mesmo se quem anexou foi cancelado antes do fsync
+        gravado.add_done_callback(lambda futuro: futuro.cancelled() or futuro.exception())
+        self._aguardando.append(gravado)
+        if self._tarefa is None:
+            # Sem a tarefa de fsync em lote (spool não iniciado): grava agora
+            await self.sincronizar()
+        await asyncio.shield(gravado)
+
+    async def sincronizar(self):
+        """Grava e faz fsync do buffer pendente, liberando quem aguarda esses registros"""
+        async with self._lock_escrita:
+            if not self._buffer:
+                return
+            dados, self._buffer = b"".join(self._buffer), []
+            aguardando, self._aguardando = self._aguardando, []
+            try:
+                await asyncio.to_thread(self._escrever, dados)
+            except Exception as e:
+                for futuro in aguardando:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+                raise
+            for futuro in aguardando:
+                if not futuro.done():
+                    futuro.set_result(None)
+
+    async def _executar_fsync(self):
+        while True:
+            await asyncio.sleep(self.intervalo_fsync)
+            try:
+                await self.sincronizar()
+            except Exception as e:
+                logger.error(f"Erro ao sincronizar spool {self.caminho}: {e}")
+
+    @property
+    def pendente(self) -> bool:
+        """Indica se há registros no spool ainda não aplicados no banco"""
+        return self._pendente
+
+    async def drenar(self, database, tamanho_lote: int = settings.SPOOL_REPLAY_LOTE) -> int:
+        """Aplica os registros pendentes no banco, em ordem; retorna quantos foram aplicados"""
+        await self.sincronizar()
+        aplicados = 0
+        async with self._lock:
+            offset = await asyncio.to_thread(self._ler_checkpoint)
+            while True:
+                registros, proximo = await asyncio.to_thread(self._ler, offset, tamanho_lote)
+                if not registros:
+                    break
+                await aplicar_registros(database, registros)
+                await asyncio.to_thread(self._gravar_checkpoint, proximo)
+                aplicados += len(registros)
+                offset = proximo
+            async with self._lock_escrita:
+                if await asyncio.to_thread(self._compactar, offset) and not self._buffer:
+                    self._pendente = False
+        return aplicados
+
+
+def _operacao(registro: Dict[str, Any], agora: datetime):
+    if registro["op"] == "insert":
+        return InsertOne({**registro["documento"], "reaplicado_em": agora})
+    return UpdateOne(registro["filtro"], registro["update"])
+
+
+async def _rejeitar(registro: Dict[str, Any], erro: Dict[str, Any]):
+    """Guarda em ``spool_rejeitados`` um registro que o banco recusou (falha se o fsync falhar)"""
+    logger.error(f"Registro do spool recusado pelo banco ({registro['colecao']}), "
+                 f"guardado em {spool_rejeitados.caminho}: {erro.get('errmsg')}")
+    await spool_rejeitados.anexar([{**registro, "codigo": erro.get("code"), "erro": erro.get("errmsg")}])
+
+
+async def aplicar_registros(database, registros: List[Dict[str, Any]]):
+    """
+    Aplica registros do spool agrupando sequências da mesma coleção. Um
+    registro recusado pelo banco vai para ``spool_rejeitados`` e a
+    reaplicação segue a partir do próximo.
+    """
+    agora = datetime.utcnow()
+    inicio = 0
+    while inicio < len(registros):
+        colecao = registros[inicio]["colecao"]
+        fim = inicio
+        while fim < len(registros) and registros[fim]["colecao"] == colecao:
+            fim += 1
+        pendentes = registros[inicio:fim]
+        operacoes = [_operacao(r, agora) for r in pendentes]
+        while operacoes:
+            try:
+                await database[colecao].bulk_write(operacoes, ordered=True)
+                operacoes = []
+            except BulkWriteError as e:
+                erro = e.details["writeErrors"][0]
+                if erro.get("code") != CODIGO_CHAVE_DUPLICADA:
+                    # Recusado pelo banco (ex.: validação): repetir travaria o spool para sempre
+                    await _rejeitar(pendentes[erro["index"]], erro)
+                # Registro já aplicado anteriormente (ou rejeitado): segue a partir do próximo
+                operacoes = operacoes[erro["index"] + 1:]
+                pendentes = pendentes[erro["index"] + 1:]
+        inicio = fim
+
+
+class ReplayerSpool:
+    """Tarefa em segundo plano que drena os spools quando o banco volta"""
+
+    def __init__(self, spools: List[SpoolDuravel],
+                 intervalo_s: float = settings.SPOOL_REPLAY_INTERVALO_S):
+        self.spools = spools
+        self.intervalo = intervalo_s
+        self._tarefa: Optional[asyncio.Task] = None
+
+    async def start(self):
+        for spool in self.spools:
+            await spool.start()
+        if self._tarefa is None:
+            self._tarefa = asyncio.create_task(self._executar())
+
+    async def stop(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+            self._tarefa = None
+        for spool in self.spools:
+            await spool.stop()
+
+    async def _executar(self):
+        while True:
+            await asyncio.sleep(self.intervalo)
+            database = get_database()
+            if database is None:
+                continue
+            for spool in self.spools:
+                try:
+                    if spool.pendente:
+                        aplicados = await spool.drenar(database)
+                        if aplicados:
+                            logger.info(f"Spool {spool.caminho}: {aplicados} registros reaplicados no MongoDB")
+                except Exception as e:
+                    logger.error(f"Erro ao drenar spool {spool.caminho}: {e}")
+
+
+spool_eventos = SpoolDuravel(settings.SPOOL_DIR, "eventos")
+# Registros que o banco recusou (pelo ingestor ou pelo replay): guardados para análise, nunca reaplicados
+spool_rejeitados = SpoolDuravel(settings.SPOOL_DIR, "rejeitados")
+replayer_spool = ReplayerSpool([spool_eventos])
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Benchmark de carga HTTP com verificação de regressão.
+
+Sobe ``main:app`` (uvicorn) apontando para um mongod local em um banco
+descartável, cria um conjunto pequeno de dados pela própria API e aplica
+carga concorrente (loop fechado: cada cliente virtual dispara a próxima
+requisição assim que a anterior termina) para cada família de endpoints:
+
+- crud: leitura por id, inserção e atualização;
+- busca: filtros, busca textual, paginação e viagens de hoje;
+- relatorios: estatísticas por período, de veículos, viagens por aluno e detalhes;
+- auth: login e /auth/me.
+
+Para cada família registra p50, p95, p99, throughput e taxa de erro. Com
+``--salvar-baseline`` o resultado vira a nova baseline (JSON); sem ele, o
+resultado é comparado com a baseline e o script termina com código 1 se
+alguma família regredir além da tolerância. Sem baseline o script termina
+com código 2 antes de medir: a comparação nunca passa por omissão.
+
+A baseline depende da máquina (CPU, disco, versão do mongod), por isso
+não vem no repositório: grave-a na máquina de referência com
+``--salvar-baseline`` e versione ``benchmarks/baseline_carga.json`` junto
+com o ambiente em que ela foi medida.
+
+Uso:
+    python benchmarks/carga_http.py --salvar-baseline
+    python benchmarks/carga_http.py --tolerancia 0.15
+    python benchmarks/carga_http.py --url http://localhost:8000   # servidor já em execução
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+RAIZ = Path(__file__).resolve().parent.parent
+BASELINE_PADRAO = Path(__file__).resolve().parent / "baseline_carga.json"
+API = "/api/v1"
+
+FAMILIAS = ("crud", "busca", "relatorios", "auth")
+
+# Taxa de erro máxima aceita em qualquer família, independente da baseline
+TAXA_ERRO_MAXIMA = 0.01
+
+
+# ---------- servidor ----------
+
+def iniciar_servidor(porta: int, mongodb_url: str, database: str, workers: int) -> subprocess.Popen:
+    """Sobe o uvicorn em um banco descartável, sem log de acesso"""
+    env = {
+        **os.environ,
+        "MONGODB_URL": mongodb_url,
+        "DATABASE_NAME": database,
+        "LOG_ACESSO_AMOSTRAGEM": "0",
+        "LOG_NIVEL": "WARNING",
+    }
+    comando = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", "127.0.0.1", "--port", str(porta),
+        "--workers", str(workers), "--no-access-log", "--log-level", "warning",
+    ]
+    return subprocess.Popen(comando, cwd=RAIZ, env=env)
+
+
+async def aguardar_pronto(url: str, timeout_s: float = 30):
+    """Espera o readiness (banco conectado) responder 200"""
+    limite = time.monotonic() + timeout_s
+    async with httpx.AsyncClient(base_url=url) as client:
+        while time.monotonic() < limite:
+            try:
+                resposta = await client.get(f"{API}/health/ready")
+                if resposta.status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"Servidor em {url} não ficou pronto em {timeout_s}s (o mongod está rodando?)")
+
+
+# ---------- dados ----------
+
+def _exigir(resposta: httpx.Response) -> Dict[str, Any]:
+    if resposta.status_code >= 400:
+        raise RuntimeError(f"{resposta.request.method} {resposta.request.url} -> {resposta.status_code}: {resposta.text}")
+    return resposta.json()
+
+
+async def preparar_dados(client: httpx.AsyncClient, rng: random.Random, alunos: int = 50) -> Dict[str, List[Any]]:
+    """Cria alunos, motoristas, veículos, rotas e viagens pela API"""
+    sufixo = uuid.uuid4().hex[:8]
+    dados: Dict[str, List[Any]] = {"alunos": [], "motoristas": [], "veiculos": [], "rotas": [], "viagens": [], "logins": []}
+
+    for i in range(alunos):
+        email = f"aluno{i}.{sufixo}@bench.com"
+        aluno = _exigir(await client.post(f"{API}/alunos/", json={
+            "nome_completo": f"Aluno Benchmark {i}",
+            "email": email,
+            "senha": "bench123",
+            "matricula": f"B{sufixo[:6]}{i:04d}",
+        }))
+        dados["alunos"].append(aluno["_id"])
+        dados["logins"].append(email)
+
+    for i in range(5):
+        motorista = _exigir(await client.post(f"{API}/motoristas/", json={
+            "nome_completo": f"Motorista Benchmark {i}",
+            "email": f"motorista{i}.{sufixo}@bench.com",
+            "senha": "bench123",
+            "cnh": f"{sufixo[:6]}{i:05d}",
+            "data_admissao": "2024-01-15",
+        }))
+        dados["motoristas"].append(motorista["_id"])
+
+        veiculo = _exigir(await client.post(f"{API}/veiculos/", json={
+            "placa": f"B{sufixo[:4]}{i}".upper(),
+            "modelo": "Ônibus Benchmark",
+            "capacidade_passageiros": 40,
+            "ano_fabricacao": 2022,
+        }))
+        dados["veiculos"].append(veiculo["_id"])
+
+        pontos = [
+            {
+                "nome_ponto": f"Ponto {j + 1}",
+                "endereco": f"Rua Benchmark, {j * 100}",
+                "lat": -3.73 + rng.uniform(-0.05, 0.05),
+                "lon": -38.52 + rng.uniform(-0.05, 0.05),
+                "ordem": j + 1,
+            }
+            for j in range(12)
+        ]
+        rota = _exigir(await client.post(f"{API}/rotas/", json={
+            "nome_rota": f"Rota Benchmark {i}",
+            "descricao": "Rota criada pelo benchmark de carga",
+            "turno": "Manhã",
+            "pontos_de_parada": pontos,
+        }))
+        dados["rotas"].append(rota["_id"])
+
+    hoje = date.today()
+    for i in range(60):
+        viagem = _exigir(await client.post(f"{API}/viagens/", json={
+            "data_viagem": (hoje - timedelta(days=i % 20)).isoformat(),
+            "rota_id": dados["rotas"][i % 5],
+            "motorista_id": dados["motoristas"][i % 5],
+            "veiculo_id": dados["veiculos"][i % 5],
+        }))
+        dados["viagens"].append(viagem["_id"])
+
+    return dados
+
+
+# ---------- operações por família ----------
+
+Operacao = Callable[[httpx.AsyncClient, random.Random], Any]
+
+
+def montar_operacoes(dados: Dict[str, List[Any]], tokens: List[str]) -> Dict[str, List[Operacao]]:
+    hoje = date.today()
+    contador = iter(range(10 ** 9))
+
+    def criar_aluno(c, r):
+        n = next(contador)
+        return c.post(f"{API}/alunos/", json={
+            "nome_completo": f"Aluno Carga {n}",
+            "email": f"carga{n}.{uuid.uuid4().hex[:6]}@bench.com",
+            "senha": "bench123",
+            "matricula": f"C{n:09d}",
+        })
+
+    crud = [
+        lambda c, r: c.get(f"{API}/alunos/{r.choice(dados['alunos'])}"),
+        lambda c, r: c.get(f"{API}/rotas/{r.choice(dados['rotas'])}"),
+        lambda c, r: c.get(f"{API}/viagens/{r.choice(dados['viagens'])}"),
+        lambda c, r: c.put(f"{API}/veiculos/{r.choice(dados['veiculos'])}",
+                           json={"capacidade_passageiros": r.randint(30, 45)}),
+        criar_aluno,
+    ]
+    busca = [
+        lambda c, r: c.get(f"{API}/alunos/buscar/texto/", params={"texto": f"Benchmark {r.randint(0, 49)}"}),
+        lambda c, r: c.get(f"{API}/alunos/pagina/", params={"page": r.randint(0, 4), "limit": 10}),
+        lambda c, r: c.get(f"{API}/rotas/ativas"),
+        lambda c, r: c.get(f"{API}/viagens/buscar/", params={"rota_id": r.choice(dados["rotas"])}),
+        lambda c, r: c.get(f"{API}/viagens/hoje/"),
+    ]
+    relatorios = [
+        lambda c, r: c.get(f"{API}/viagens/estatisticas/periodo/", params={
+            "data_inicio": (hoje - timedelta(days=30)).isoformat(), "data_fim": hoje.isoformat()
+        }),
+        lambda c, r: c.get(f"{API}/veiculos/estatisticas/"),
+        lambda c, r: c.get(f"{API}/viagens/aluno/{r.choice(dados['alunos'])}"),
+        lambda c, r: c.get(f"{API}/viagens/{r.choice(dados['viagens'])}/detalhes"),
+    ]
+    auth = [
+        lambda c, r: c.post(f"{API}/auth/login", json={"email": r.choice(dados["logins"]), "senha": "bench123"}),
+        lambda c, r: c.get(f"{API}/auth/me", headers={"Authorization": f"Bearer {r.choice(tokens)}"}),
+    ]
+    return {"crud": crud, "busca": busca, "relatorios": relatorios, "auth": auth}
+
+
+# ---------- carga ----------
+
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil pelo método nearest-rank (valores já ordenados)"""
+    if not valores:
+        return 0.0
+    indice = max(0, min(len(valores) - 1, math.ceil(p / 100 * len(valores)) - 1))
+    return valores[indice]
+
+
+async def executar_familia(client: httpx.AsyncClient, operacoes: List[Operacao], concorrencia: int,
+                           duracao_s: float, aquecimento_s: float, semente: int) -> Dict[str, Any]:
+    latencias: List[float] = []
+    erros = 0
+    inicio_medicao = time.perf_counter() + aquecimento_s
+    fim = inicio_medicao + duracao_s
+
+    async def cliente_virtual(indice: int):
+        nonlocal erros
+        rng = random.Random(semente + indice)
+        while True:
+            inicio = time.perf_counter()
+            if inicio >= fim:
+                return
+            try:
+                resposta = await rng.choice(operacoes)(client, rng)
+                falhou = resposta.status_code >= 400
+            except httpx.HTTPError:
+                falhou = True
+            if inicio >= inicio_medicao:
+                latencias.append((time.perf_counter() - inicio) * 1000)
+                erros += falhou
+
+    await asyncio.gather(*(cliente_virtual(i) for i in range(concorrencia)))
+    latencias.sort()
+    return {
+        "requisicoes": len(latencias),
+        "erros": erros,
+        "taxa_erro": round(erros / len(latencias), 4) if latencias else 0.0,
+        "throughput_rps": round(len(latencias) / duracao_s, 1),
+        "p50_ms": round(percentil(latencias, 50), 2),
+        "p95_ms": round(percentil(latencias, 95), 2),
+        "p99_ms": round(percentil(latencias, 99), 2),
+    }
+
+
+async def executar(args) -> Dict[str, Any]:
+    limites = httpx.Limits(max_connections=args.concorrencia, max_keepalive_connections=args.concorrencia)
+    async with httpx.AsyncClient(base_url=args.url, limits=limites, timeout=30) as client:
+        rng = random.Random(args.semente)
+        dados = await preparar_dados(client, rng)
+        tokens = []
+        for email in dados["logins"][:10]:
+            login = _exigir(await client.post(f"{API}/auth/login", json={"email": email, "senha": "bench123"}))
+            tokens.append(login["access_token"])
+        operacoes = montar_operacoes(dados, tokens)
+
+        resultados = {}
+        for familia in args.familias:
+            print(f"⏱️  {familia}: {args.concorrencia} clientes por {args.duracao}s...")
+            resultados[familia] = await executar_familia(
+                client, operacoes[familia], args.concorrencia, args.duracao, args.aquecimento, args.semente
+            )
+            print(f"   {json.dumps(resultados[familia])}")
+
+    return {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "config": {"concorrencia": args.concorrencia, "duracao_s": args.duracao, "workers": args.workers},
+        "familias": resultados,
+    }
+
+
+# ---------- baseline ----------
+
+def comparar(atual: Dict[str, Any], baseline: Dict[str, Any], tolerancia: float) -> List[str]:
+    """Lista as regressões do resultado atual em relação à baseline"""
+    regressoes = []
+    if atual["config"] != baseline.get("config"):
+        regressoes.append(f"configuração {atual['config']} difere da baseline {baseline.get('config')}")
+    for familia, medido in atual["familias"].items():
+        if medido["taxa_erro"] > TAXA_ERRO_MAXIMA:
+            regressoes.append(f"{familia}: taxa de erro {medido['taxa_erro']:.2%}")
+        base = baseline.get("familias", {}).get(familia)
+        if base is None:
+            continue
+        for metrica in ("p50_ms", "p95_ms", "p99_ms"):
+            if base[metrica] and medido[metrica] > base[metrica] * (1 + tolerancia):
+                regressoes.append(f"{familia}: {metrica} {base[metrica]} -> {medido[metrica]}")
+        if medido["throughput_rps"] < base["throughput_rps"] * (1 - tolerancia):
+            regressoes.append(f"{familia}: throughput {base['throughput_rps']} -> {medido['throughput_rps']} req/s")
+    return regressoes
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de carga HTTP da API RotaFácil")
+    parser.add_argument("--url", help="Usar um servidor já em execução em vez de subir main:app")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--mongodb-url", default="mongodb://localhost:27017")
+    parser.add_argument("--database", default=None, help="Banco descartável (padrão: rotafacil_bench_<aleatório>)")
+    parser.add_argument("--familias", nargs="+", choices=FAMILIAS, default=list(FAMILIAS))
+    parser.add_argument("--concorrencia", type=int, default=32)
+    parser.add_argument("--duracao", type=float, default=15, help="Segundos medidos por família")
+    parser.add_argument("--aquecimento", type=float, default=3, help="Segundos de aquecimento por família")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PADRAO)
+    parser.add_argument("--tolerancia", type=float, default=0.15, help="Regressão máxima aceita (0.15 = 15%%)")
+    parser.add_argument("--salvar-baseline", action="store_true")
+    parser.add_argument("--saida", type=Path, help="Arquivo para gravar o resultado desta execução")
+    args = parser.parse_args()
+
+    if not args.salvar_baseline and not args.baseline.exists():
+        print(f"❌ Baseline {args.baseline} não encontrada: grave-a na máquina de referência "
+              f"com --salvar-baseline antes de comparar")
+        return 2
+
+    servidor: Optional[subprocess.Popen] = None
+    database = args.database or f"rotafacil_bench_{uuid.uuid4().hex[:8]}"
+    if args.url is None:
+        args.url = f"http://127.0.0.1:{args.porta}"
+        servidor = iniciar_servidor(args.porta, args.mongodb_url, database, args.workers)
+
+    try:
+        asyncio.run(aguardar_pronto(args.url))
+        resultado = asyncio.run(executar(args))
+    finally:
+        if servidor is not None:
+            servidor.terminate()
+            servidor.wait(timeout=30)
+            if args.database is None:
+                from pymongo import MongoClient
+                MongoClient(args.mongodb_url).drop_database(database)
+
+    if args.saida:
+        args.saida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+    if args.salvar_baseline:
+        args.baseline.write_text(json.dumps(resultado, indent=2, ensure_ascii=False))
+        print(f"💾 Baseline gravada em {args.baseline}")
+        return 0
+
+    regressoes = comparar(resultado, json.loads(args.baseline.read_text()), args.tolerancia)
+    if regressoes:
+        print(f"❌ Regressões acima de {args.tolerancia:.0%}:")
+        for regressao in regressoes:
+            print(f"   - {regressao}")
+        return 1
+    print(f"✅ Nenhuma regressão acima de {args.tolerancia:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
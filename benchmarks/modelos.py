@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks de validação e serialização dos modelos Pydantic.
+
+Mede, em tamanhos realistas, o custo de construir os modelos a partir
+dos documentos do MongoDB (como o ``CRUDService`` faz), de validar os
+payloads de entrada (``*Create``, ``LoginRequest`` com os validadores de
+e-mail) e de serializar as respostas (``model_dump(mode="json")``, usado
+pelo FastAPI, e ``model_dump_json``). Os documentos vêm do gerador de
+dados sintéticos, então têm a mesma forma dos gravados pela API.
+
+Cada caso é cronometrado com ``timeit`` (várias repetições intercaladas
+entre os casos; registra a mediana e o mínimo por operação). Com ``--salvar-baseline`` o resultado
+vira a baseline (JSON); sem ele, compara a mediana de cada caso com a
+baseline e termina com código 1 se algum ficar mais lento que a
+tolerância, ou com código 2 se não houver baseline (ou se ela não tiver
+algum dos casos medidos). Com menos repetições que o padrão as medidas
+são só exibidas: não gravam baseline nem servem de comparação. A baseline versionada
+(``benchmarks/baseline_modelos.json``) foi medida na máquina de
+referência; em outra máquina, grave uma própria antes de comparar.
+
+Uso:
+    python benchmarks/modelos.py --salvar-baseline
+    python benchmarks/modelos.py --filtro rota --tolerancia 0.5
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from app.dados_sinteticos import ConfiguracaoDados, gerar_dimensoes, viagens_do_dia  # noqa: E402
+from app.models.pydantic_models import (  # noqa: E402
+    Aluno, AlunoCreate, Frequencia, LoginRequest, MotoristaCreate, PaginatedResponse,
+    Rota, RotaCreate, TipoIncidente, Viagem, ViagemDetalhada
+)
+
+BASELINE_PADRAO = Path(__file__).resolve().parent / "baseline_modelos.json"
+REPETICOES_PADRAO = 15
+TOLERANCIA_PADRAO = 0.35
+
+
+def montar_casos() -> Dict[str, Callable[[], Any]]:
+    """Casos nomeados ``<modelo>.<operação>[<tamanho>]``"""
+    config = ConfiguracaoDados(escolas=1, alunos_por_escola=100, alunos_por_rota=100, pontos_por_rota=50)
+    documentos, plano = gerar_dimensoes(config, "$2b$12$" + "x" * 53)
+    aluno_doc = documentos["alunos"][0]
+    alunos_docs = documentos["alunos"][:100]
+    rota_doc = documentos["rotas"][0]
+    motorista_doc = documentos["motoristas"][0]
+    veiculo_doc = documentos["veiculos"][0]
+
+    viagem_doc, frequencias_docs = next(viagens_do_dia(config, plano, config.inicio, date.max))
+    viagem_doc = dict(viagem_doc, incidentes=[
+        {"descricao": f"Incidente {i}", "tipo": list(TipoIncidente)[i % 4].value,
+         "data_hora": datetime(2025, 3, 10, 7, 0) + timedelta(minutes=i)}
+        for i in range(20)
+    ])
+    detalhada_doc = dict(viagem_doc, rota_info=rota_doc, motorista_info=motorista_doc, veiculo_info=veiculo_doc)
+    frequencias_docs = frequencias_docs[:100]
+
+    aluno_payload = {"nome_completo": "Maria Silva", "email": "maria.silva@escola.com.br",
+                     "senha": "segredo123", "matricula": "20250001", "telefone": "(92) 99999-0000"}
+    motorista_payload = {"nome_completo": "Carlos Lima", "email": "carlos@rotafacil.dev", "senha": "segredo123",
+                         "cnh": "12345678901", "data_admissao": "2024-01-15"}
+    rota_payload = {k: rota_doc[k] for k in ("nome_rota", "descricao", "turno", "ativa", "pontos_de_parada")}
+    login_payload = {"email": "maria.silva@escola.com.br", "senha": "segredo123"}
+
+    aluno = Aluno(**aluno_doc)
+    alunos = [Aluno(**d) for d in alunos_docs]
+    rota = Rota(**rota_doc)
+    viagem = Viagem(**viagem_doc)
+    detalhada = ViagemDetalhada(**detalhada_doc)
+    pagina = PaginatedResponse(items=alunos, total=1000, page=0, limit=100, pages=10)
+
+    return {
+        # Validação de documentos do banco (CRUDService._validar)
+        "aluno.validar": lambda: Aluno(**aluno_doc),
+        "aluno.validar[100]": lambda: [Aluno(**d) for d in alunos_docs],
+        "rota.validar[50 pontos]": lambda: Rota(**rota_doc),
+        "viagem.validar[20 incidentes]": lambda: Viagem(**viagem_doc),
+        "viagem_detalhada.validar[50 pontos]": lambda: ViagemDetalhada(**detalhada_doc),
+        "frequencia.validar[100]": lambda: [Frequencia(**d) for d in frequencias_docs],
+        # Validação de payloads de entrada
+        "aluno_create.validar": lambda: AlunoCreate(**aluno_payload),
+        "motorista_create.validar": lambda: MotoristaCreate(**motorista_payload),
+        "rota_create.validar[50 pontos]": lambda: RotaCreate(**rota_payload),
+        "login.validar": lambda: LoginRequest(**login_payload),
+        # Serialização de respostas
+        "aluno.serializar": lambda: aluno.model_dump(mode="json"),
+        "rota.serializar[50 pontos]": lambda: rota.model_dump(mode="json"),
+        "rota.serializar_json[50 pontos]": lambda: rota.model_dump_json(),
+        "viagem.serializar[20 incidentes]": lambda: viagem.model_dump(mode="json"),
+        "viagem_detalhada.serializar[50 pontos]": lambda: detalhada.model_dump(mode="json"),
+        "pagina.serializar[100 alunos]": lambda: pagina.model_dump(mode="json"),
+        "alunos.serializar_json[100]": lambda: [a.model_dump_json() for a in alunos],
+    }
+
+
+def medir(casos: Dict[str, Callable[[], Any]], repeticoes: int) -> Dict[str, Dict[str, float]]:
+    """
+    Mediana e mínimo em microssegundos por chamada. As repetições são
+    intercaladas (uma rodada passa por todos os casos), então um período
+    de lentidão da máquina se espalha por todos em vez de cair inteiro
+    nas repetições de um único caso.
+    """
+    timers = {nome: timeit.Timer(funcao) for nome, funcao in casos.items()}
+    numeros = {nome: timer.autorange()[0] for nome, timer in timers.items()}
+    tempos: Dict[str, List[float]] = {nome: [] for nome in casos}
+    for _ in range(repeticoes):
+        for nome, timer in timers.items():
+            tempos[nome].append(timer.timeit(numeros[nome]) / numeros[nome] * 1e6)
+    return {
+        nome: {"mediana_us": round(statistics.median(t), 2), "minimo_us": round(min(t), 2)}
+        for nome, t in tempos.items()
+    }
+
+
+def comparar(atual: Dict[str, Any], baseline: Dict[str, Any], tolerancia: float) -> List[str]:
+    """
+    Casos mais lentos que a baseline além da tolerância. Compara a mediana:
+    o mínimo de poucas repetições oscila com o agendador e o turbo da CPU.
+    """
+    regressoes = []
+    for caso, medido in atual["casos"].items():
+        base = baseline.get("casos", {}).get(caso)
+        if base and medido["mediana_us"] > base["mediana_us"] * (1 + tolerancia):
+            regressoes.append(f"{caso}: {base['mediana_us']}us -> {medido['mediana_us']}us "
+                              f"(+{medido['mediana_us'] / base['mediana_us'] - 1:.0%})")
+    return regressoes
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks dos modelos Pydantic")
+    parser.add_argument("--filtro", help="Executa apenas os casos cujo nome contém o texto")
+    parser.add_argument("--repeticoes", type=int, default=REPETICOES_PADRAO,
+                        help="Abaixo do padrão as medidas não gravam baseline nem são comparadas")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PADRAO)
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_PADRAO,
+                        help="Regressão máxima aceita na mediana (0.35 = 35%%)")
+    parser.add_argument("--salvar-baseline", action="store_true")
+    args = parser.parse_args()
+
+    if not args.salvar_baseline and not args.baseline.exists():
+        print(f"❌ Baseline {args.baseline} não encontrada: grave-a com --salvar-baseline antes de comparar")
+        return 2
+
+    casos = {nome: funcao for nome, funcao in montar_casos().items() if not args.filtro or args.filtro in nome}
+    resultado: Dict[str, Any] = {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "repeticoes": args.repeticoes,
+        "casos": {},
+    }
+    largura = max(len(nome) for nome in casos)
+    resultado["casos"] = medir(casos, args.repeticoes)
+    for nome, medido in resultado["casos"].items():
+        print(f"{nome:<{largura}}  {medido['mediana_us']:>12.2f} us (mínimo {medido['minimo_us']:.2f})")
+
+    if args.repeticoes < REPETICOES_PADRAO:
+        print(f"❌ Com {args.repeticoes} repetições (padrão {REPETICOES_PADRAO}) o resultado é ruidoso demais "
+              "para gravar ou comparar com a baseline")
+        return 2
+
+    if args.salvar_baseline:
+        if args.baseline.exists() and args.filtro:
+            # Atualiza só os casos filtrados, preservando os demais
+            anterior = json.loads(args.baseline.read_text())
+            resultado["casos"] = {**anterior.get("casos", {}), **resultado["casos"]}
+        args.baseline.write_text(json.dumps(resultado, indent=2, ensure_ascii=False))
+        print(f"💾 Baseline gravada em {args.baseline}")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text())
+    sem_baseline = sorted(set(resultado["casos"]) - set(baseline.get("casos", {})))
+    if sem_baseline:
+        print(f"❌ Casos sem baseline: {', '.join(sem_baseline)}; atualize com --salvar-baseline")
+        return 2
+
+    regressoes = comparar(resultado, baseline, args.tolerancia)
+    if regressoes:
+        print(f"❌ Regressões acima de {args.tolerancia:.0%}:")
+        for regressao in regressoes:
+            print(f"   - {regressao}")
+        return 1
+    print(f"✅ Nenhuma regressão acima de {args.tolerancia:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Simulador do pico da manhã de um dia letivo.
+
+Em vez de martelar endpoints isolados, reproduz o tráfego de uma manhã
+(05:30 às 08:30, comprimida em ``--duracao`` segundos reais) sobre uma
+instância local com dados de ``app.dados_sinteticos``:
+
+- login: pais entram no aplicativo pouco antes da partida da rota do filho;
+- motorista: cada motorista faz login, busca ``/viagens/hoje/`` e os detalhes da viagem;
+- status: a viagem passa a "Em Andamento" na partida e a "Concluída" na chegada;
+- embarque: a cada parada, o lote de embarques é enviado; na escola, os desembarques;
+- pais: acompanham ``GET /viagens/{id}`` periodicamente até a chegada;
+- relatorios: administradores rodam relatórios em intervalos aleatórios.
+
+A carga é de malha aberta: cada evento é disparado no seu horário,
+independentemente de as requisições anteriores terem terminado, de modo
+que a fila aparece como latência. O relatório traz latência de cauda e
+erros por classe e, por janela de tempo, a taxa oferecida x atendida, o
+p95, as requisições em andamento e a espera por conexão no pool do Mongo
+(lidos de ``/metrics``), apontando o ponto de saturação.
+
+A frota e os alunos são reconstruídos a partir da mesma semente e escala
+usadas no gerador; as viagens do dia simulado são criadas no início e
+removidas ao final (a menos que ``--manter`` seja usado).
+
+Uso:
+    python -m app.dados_sinteticos --escala media --limpar
+    python benchmarks/simulador_pico.py --url http://localhost:8000 --escala media --rotas 150 --duracao 300
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+from bson import ObjectId
+from prometheus_client.parser import text_string_to_metric_families
+from pymongo import MongoClient
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from app.core.config import settings  # noqa: E402
+from app.dados_sinteticos import (  # noqa: E402
+    ESCALAS, HORARIO_PARTIDA, MINUTOS_ENTRE_PARADAS, SENHA_PADRAO, ConfiguracaoDados, gerar_dimensoes
+)
+
+API = "/api/v1"
+INICIO_SIMULADO = 5 * 3600 + 30 * 60   # 05:30
+FIM_SIMULADO = 8 * 3600 + 30 * 60      # 08:30
+CLASSES = ("login", "motorista", "status", "embarque", "pais", "relatorios")
+
+Requisicao = Callable[[httpx.AsyncClient], Any]
+
+
+@dataclass
+class Evento:
+    t_simulado: float      # segundos desde 00:00 do dia simulado
+    classe: str
+    requisicao: Requisicao
+
+
+@dataclass
+class Resultado:
+    classe: str
+    t_simulado: float
+    latencia_ms: float
+    atraso_ms: float
+    status: int
+
+
+def _relogio(t_simulado: float) -> str:
+    return f"{int(t_simulado // 3600):02d}:{int(t_simulado % 3600 // 60):02d}"
+
+
+def _lote_frequencias(viagem_id: str, alunos: List[str], tipo: str, quando: datetime) -> Dict[str, Any]:
+    return {"eventos": [
+        {"aluno_id": aluno, "viagem_id": viagem_id, "data_hora_embarque": quando.isoformat(), "tipo_registro": tipo}
+        for aluno in alunos
+    ]}
+
+
+# ---------- cenário ----------
+
+def montar_cenario(args, documentos: Dict[str, List[Dict[str, Any]]], plano: List[Dict[str, Any]],
+                   viagens: Dict[Any, str], rng: random.Random) -> List[Evento]:
+    """Agenda de eventos da manhã para a frota selecionada"""
+    hoje = date.today()
+    emails_alunos = {a["_id"]: a["email"] for a in documentos["alunos"]}
+    emails_motoristas = {m["_id"]: m["email"] for m in documentos["motoristas"]}
+    eventos: List[Evento] = []
+
+    def agendar(t: float, classe: str, requisicao: Requisicao):
+        if INICIO_SIMULADO <= t <= FIM_SIMULADO:
+            eventos.append(Evento(t, classe, requisicao))
+
+    for item in plano:
+        viagem_id = viagens[item["rota_id"]]
+        hora, minuto = HORARIO_PARTIDA[item["turno"]]
+        partida = hora * 3600 + minuto * 60 + rng.uniform(-300, 600)
+        chegada = partida + item["num_pontos"] * MINUTOS_ENTRE_PARADAS * 60
+        email_motorista = emails_motoristas[item["motorista_id"]]
+
+        # Motorista: login, viagens de hoje e detalhes da viagem antes de sair
+        t = partida - rng.uniform(900, 1500)
+        agendar(t, "login", lambda c, e=email_motorista: c.post(f"{API}/auth/login", json={"email": e, "senha": SENHA_PADRAO}))
+        agendar(t + 5, "motorista", lambda c: c.get(f"{API}/viagens/hoje/"))
+        agendar(t + 10, "motorista", lambda c, v=viagem_id: c.get(f"{API}/viagens/{v}/detalhes"))
+
+        agendar(partida, "status", lambda c, v=viagem_id: c.put(f"{API}/viagens/{v}", json={"status": "Em Andamento"}))
+        presentes = [(aluno_id, ordem) for aluno_id, ordem in item["alunos"] if rng.random() < args.presenca]
+        por_parada: Dict[int, List[str]] = defaultdict(list)
+        for aluno_id, ordem in presentes:
+            por_parada[ordem].append(str(aluno_id))
+        for ordem, alunos in sorted(por_parada.items()):
+            t_parada = partida + ordem * MINUTOS_ENTRE_PARADAS * 60
+            quando = datetime.combine(hoje, datetime.min.time()) + timedelta(seconds=t_parada)
+            agendar(t_parada, "embarque", lambda c, v=viagem_id, a=alunos, q=quando:
+                    c.post(f"{API}/frequencias/lote", json=_lote_frequencias(v, a, "Embarque", q)))
+        if presentes:
+            quando = datetime.combine(hoje, datetime.min.time()) + timedelta(seconds=chegada)
+            alunos = [str(aluno_id) for aluno_id, _ in presentes]
+            agendar(chegada, "embarque", lambda c, v=viagem_id, a=alunos, q=quando:
+                    c.post(f"{API}/frequencias/lote", json=_lote_frequencias(v, a, "Desembarque", q)))
+        agendar(chegada + 30, "status", lambda c, v=viagem_id: c.put(f"{API}/viagens/{v}", json={"status": "Concluída"}))
+
+        # Pais: login perto da partida e acompanhamento periódico até a chegada
+        for aluno_id, _ in item["alunos"]:
+            if rng.random() >= args.pais:
+                continue
+            t_login = rng.gauss(partida - 900, 480)
+            email = emails_alunos[aluno_id]
+            agendar(t_login, "login", lambda c, e=email: c.post(f"{API}/auth/login", json={"email": e, "senha": SENHA_PADRAO}))
+            t_poll = t_login + rng.uniform(0, args.polling_s)
+            while t_poll < chegada + 120:
+                agendar(t_poll, "pais", lambda c, v=viagem_id: c.get(f"{API}/viagens/{v}"))
+                t_poll += args.polling_s
+
+    # Administradores: relatórios a partir das 07:00, intervalo exponencial
+    alunos_ids = [str(a["_id"]) for a in documentos["alunos"]]
+    inicio_periodo = date(hoje.year, 1, 1).isoformat()
+    relatorios: List[Requisicao] = [
+        lambda c: c.get(f"{API}/viagens/estatisticas/periodo/", params={"data_inicio": inicio_periodo, "data_fim": hoje.isoformat()}),
+        lambda c: c.get(f"{API}/veiculos/estatisticas/"),
+        lambda c: c.get(f"{API}/viagens/aluno/{rng.choice(alunos_ids)}"),
+    ]
+    for _ in range(args.admins):
+        t = 7 * 3600 + rng.expovariate(1 / args.relatorio_intervalo_s)
+        while t < FIM_SIMULADO:
+            agendar(t, "relatorios", rng.choice(relatorios))
+            t += rng.expovariate(1 / args.relatorio_intervalo_s)
+
+    eventos.sort(key=lambda e: e.t_simulado)
+    return eventos
+
+
+# ---------- execução ----------
+
+async def coletar_metricas(client: httpx.AsyncClient) -> Dict[str, float]:
+    """Requisições em andamento, conexões em uso e espera acumulada no pool do Mongo"""
+    try:
+        texto = (await client.get("/metrics")).text
+    except httpx.HTTPError:
+        return {}
+    valores: Dict[str, float] = defaultdict(float)
+    for familia in text_string_to_metric_families(texto):
+        for amostra in familia.samples:
+            if amostra.name in ("http_requests_in_flight", "mongo_pool_connections_in_use",
+                                "mongo_pool_wait_seconds_sum", "mongo_pool_wait_seconds_count"):
+                valores[amostra.name] += amostra.value
+    return dict(valores)
+
+
+async def executar(args, eventos: List[Evento]) -> Dict[str, Any]:
+    fator = args.duracao / (FIM_SIMULADO - INICIO_SIMULADO)
+    limites = httpx.Limits(max_connections=args.conexoes, max_keepalive_connections=args.conexoes)
+    resultados: List[Resultado] = []
+    metricas_janelas: List[Dict[str, float]] = []
+    em_andamento = 0
+    pico_em_andamento: Dict[int, int] = defaultdict(int)
+    janela_s = args.duracao / args.janelas
+
+    async with httpx.AsyncClient(base_url=args.url, limits=limites, timeout=args.timeout) as client, \
+            httpx.AsyncClient(base_url=args.url) as client_metricas:
+        inicio = time.perf_counter()
+
+        async def disparar(evento: Evento, agendado: float):
+            nonlocal em_andamento
+            enviado = time.perf_counter()
+            em_andamento += 1
+            janela = min(args.janelas - 1, int((enviado - inicio) / janela_s))
+            pico_em_andamento[janela] = max(pico_em_andamento[janela], em_andamento)
+            try:
+                resposta = await evento.requisicao(client)
+                status = resposta.status_code
+            except httpx.HTTPError:
+                status = 0
+            finally:
+                em_andamento -= 1
+            fim = time.perf_counter()
+            resultados.append(Resultado(evento.classe, evento.t_simulado, (fim - agendado) * 1000,
+                                        (enviado - agendado) * 1000, status))
+
+        async def amostrar_metricas():
+            for i in range(args.janelas + 1):
+                await asyncio.sleep(max(0.0, inicio + i * janela_s - time.perf_counter()))
+                metricas_janelas.append(await coletar_metricas(client_metricas))
+
+        amostrador = asyncio.create_task(amostrar_metricas())
+        tarefas = []
+        for evento in eventos:
+            agendado = inicio + (evento.t_simulado - INICIO_SIMULADO) * fator
+            espera = agendado - time.perf_counter()
+            if espera > 0:
+                await asyncio.sleep(espera)
+            tarefas.append(asyncio.create_task(disparar(evento, agendado)))
+        await asyncio.gather(*tarefas)
+        await amostrador
+
+    return resumir(args, resultados, metricas_janelas, pico_em_andamento, fator)
+
+
+def _percentis(latencias: List[float]) -> Dict[str, float]:
+    if not latencias:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    ordenadas = sorted(latencias)
+
+    def p(q):
+        return round(ordenadas[max(0, math.ceil(q / 100 * len(ordenadas)) - 1)], 1)
+    return {"p50_ms": p(50), "p95_ms": p(95), "p99_ms": p(99)}
+
+
+def resumir(args, resultados: List[Resultado], metricas_janelas: List[Dict[str, float]],
+            pico_em_andamento: Dict[int, int], fator: float) -> Dict[str, Any]:
+    por_classe: Dict[str, List[Resultado]] = defaultdict(list)
+    for r in resultados:
+        por_classe[r.classe].append(r)
+    classes = {}
+    for classe in CLASSES:
+        itens = por_classe.get(classe, [])
+        erros = sum(1 for r in itens if r.status == 0 or r.status >= 500 or r.status == 429)
+        classes[classe] = {
+            "requisicoes": len(itens),
+            "erros": erros,
+            "taxa_erro": round(erros / len(itens), 4) if itens else 0.0,
+            **_percentis([r.latencia_ms for r in itens]),
+            "atraso_disparo_p95_ms": _percentis([r.atraso_ms for r in itens])["p95_ms"],
+        }
+
+    duracao_simulada = (FIM_SIMULADO - INICIO_SIMULADO) / args.janelas
+    janela_real = args.duracao / args.janelas
+    janelas = []
+    base_p95: Optional[float] = None
+    saturacao: Optional[Dict[str, Any]] = None
+    for i in range(args.janelas):
+        t0 = INICIO_SIMULADO + i * duracao_simulada
+        itens = [r for r in resultados if t0 <= r.t_simulado < t0 + duracao_simulada]
+        concluidos = [r for r in itens if r.status and r.status < 500]
+        m0 = metricas_janelas[i] if i < len(metricas_janelas) else {}
+        m1 = metricas_janelas[i + 1] if i + 1 < len(metricas_janelas) else {}
+        esperas = m1.get("mongo_pool_wait_seconds_count", 0) - m0.get("mongo_pool_wait_seconds_count", 0)
+        espera_media = ((m1.get("mongo_pool_wait_seconds_sum", 0) - m0.get("mongo_pool_wait_seconds_sum", 0))
+                        / esperas * 1000) if esperas > 0 else 0.0
+        janela = {
+            "inicio": _relogio(t0),
+            "oferecido_rps": round(len(itens) / janela_real, 1),
+            "atendido_rps": round(len(concluidos) / janela_real, 1),
+            **_percentis([r.latencia_ms for r in itens]),
+            "taxa_erro": round(1 - len(concluidos) / len(itens), 4) if itens else 0.0,
+            "em_andamento_cliente_max": pico_em_andamento.get(i, 0),
+            "em_andamento_servidor": m1.get("http_requests_in_flight"),
+            "pool_mongo_em_uso": m1.get("mongo_pool_connections_in_use"),
+            "pool_mongo_espera_media_ms": round(espera_media, 2),
+        }
+        janelas.append(janela)
+        if itens and base_p95 is None:
+            base_p95 = janela["p95_ms"]
+        if saturacao is None and itens and base_p95 is not None and (
+            janela["taxa_erro"] > 0.01 or janela["p95_ms"] > base_p95 * args.limiar_saturacao
+        ):
+            saturacao = {"janela": janela["inicio"], "oferecido_rps": janela["oferecido_rps"],
+                         "p95_ms": janela["p95_ms"], "taxa_erro": janela["taxa_erro"]}
+
+    return {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "config": {"escala": args.escala, "rotas": args.rotas, "pais": args.pais, "polling_s": args.polling_s,
+                   "admins": args.admins, "duracao_s": args.duracao, "compressao": round(1 / fator, 1)},
+        "classes": classes,
+        "janelas": janelas,
+        "saturacao": saturacao,
+    }
+
+
+# ---------- preparação do dia simulado ----------
+
+def criar_viagens_do_dia(db, plano: List[Dict[str, Any]]) -> Dict[Any, str]:
+    """Uma viagem agendada para hoje por rota selecionada"""
+    documentos = [{
+        "_id": ObjectId(),
+        "data_viagem": datetime.combine(date.today(), datetime.min.time()),
+        "status": "Agendada",
+        "rota_id": item["rota_id"],
+        "motorista_id": item["motorista_id"],
+        "veiculo_id": item["veiculo_id"],
+        "incidentes": [],
+    } for item in plano]
+    db.viagens.insert_many(documentos)
+    return {doc["rota_id"]: str(doc["_id"]) for doc in documentos}
+
+
+def remover_viagens_do_dia(db, viagens: Dict[Any, str]):
+    ids = [ObjectId(v) for v in viagens.values()]
+    db.frequencias.delete_many({"viagem_id": {"$in": ids}})
+    db.viagens.delete_many({"_id": {"$in": ids}})
+
+
+def imprimir(relatorio: Dict[str, Any]):
+    print(f"\n{'classe':<12}{'req':>8}{'erro':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'atraso p95':>12}")
+    for classe, c in relatorio["classes"].items():
+        print(f"{classe:<12}{c['requisicoes']:>8}{c['taxa_erro']:>8.1%}{c['p50_ms']:>9}{c['p95_ms']:>9}"
+              f"{c['p99_ms']:>9}{c['atraso_disparo_p95_ms']:>12}")
+    print(f"\n{'janela':<8}{'ofer.':>8}{'atend.':>8}{'p95':>9}{'erro':>7}{'cli':>6}{'srv':>6}{'pool':>6}{'espera':>9}")
+    for j in relatorio["janelas"]:
+        print(f"{j['inicio']:<8}{j['oferecido_rps']:>8}{j['atendido_rps']:>8}{j['p95_ms']:>9}{j['taxa_erro']:>7.1%}"
+              f"{j['em_andamento_cliente_max']:>6}{j['em_andamento_servidor'] or 0:>6.0f}"
+              f"{j['pool_mongo_em_uso'] or 0:>6.0f}{j['pool_mongo_espera_media_ms']:>9}")
+    saturacao = relatorio["saturacao"]
+    if saturacao:
+        print(f"\n⚠️  Saturação a partir de {saturacao['janela']} com {saturacao['oferecido_rps']} req/s oferecidas "
+              f"(p95 {saturacao['p95_ms']} ms, erro {saturacao['taxa_erro']:.1%})")
+    else:
+        print("\n✅ Sem saturação na carga simulada")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Simulador do pico da manhã da API RotaFácil")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--mongodb-url", default=settings.MONGODB_URL)
+    parser.add_argument("--database", default=settings.DATABASE_NAME)
+    parser.add_argument("--escala", choices=ESCALAS, default="pequena", help="Escala usada no gerador de dados")
+    parser.add_argument("--semente", type=int, default=42, help="Semente usada no gerador de dados")
+    parser.add_argument("--rotas", type=int, default=None, help="Tamanho da frota simulada (rotas da manhã)")
+    parser.add_argument("--pais", type=float, default=0.5, help="Fração dos alunos cujos pais acompanham a viagem")
+    parser.add_argument("--polling-s", type=float, default=30, help="Intervalo (simulado) do acompanhamento pelos pais")
+    parser.add_argument("--presenca", type=float, default=0.92)
+    parser.add_argument("--admins", type=int, default=3)
+    parser.add_argument("--relatorio-intervalo-s", type=float, default=300, help="Intervalo médio (simulado) entre relatórios")
+    parser.add_argument("--duracao", type=float, default=180, help="Duração real da simulação em segundos")
+    parser.add_argument("--janelas", type=int, default=12)
+    parser.add_argument("--conexoes", type=int, default=500, help="Conexões HTTP simultâneas do cliente")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--limiar-saturacao", type=float, default=3.0,
+                        help="Janela saturada quando o p95 passa deste múltiplo do p95 inicial")
+    parser.add_argument("--saida", type=Path, help="Arquivo JSON com o relatório")
+    parser.add_argument("--manter", action="store_true", help="Não remove as viagens do dia simulado")
+    args = parser.parse_args()
+
+    config = ConfiguracaoDados(**ESCALAS[args.escala], semente=args.semente)
+    documentos, plano = gerar_dimensoes(config, "")
+    plano = [item for item in plano if item["turno"] == "Manhã"][:args.rotas]
+    args.rotas = len(plano)
+
+    rng = random.Random(args.semente)
+    db = MongoClient(args.mongodb_url)[args.database]
+    if db.alunos.count_documents({"_id": plano[0]["alunos"][0][0]}) == 0:
+        print("❌ Dados não encontrados: gere-os com python -m app.dados_sinteticos usando a mesma escala e semente")
+        return 1
+
+    viagens = criar_viagens_do_dia(db, plano)
+    try:
+        eventos = montar_cenario(args, documentos, plano, viagens, rng)
+        pico = max(statistics.mode(int(e.t_simulado // 60) for e in eventos) * 60, INICIO_SIMULADO)
+        print(f"🚌 {args.rotas} rotas, {len(eventos)} requisições entre {_relogio(INICIO_SIMULADO)} e "
+              f"{_relogio(FIM_SIMULADO)} (pico por volta de {_relogio(pico)}), em {args.duracao:.0f}s reais")
+        relatorio = asyncio.run(executar(args, eventos))
+    finally:
+        if not args.manter:
+            remover_viagens_do_dia(db, viagens)
+
+    imprimir(relatorio)
+    if args.saida:
+        args.saida.write_text(json.dumps(relatorio, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,32 +1,75 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+from pymongo.errors import ConnectionFailure
 from contextlib import asynccontextmanager
 
 from app.core.config import settings
-from app.database import connect_to_mongo, close_mongo_connection
+from app.core.logs import configurar_logging, encerrar_logging
+from app.core.metricas import PrometheusMiddleware, gerar_metricas
+from app.core.contexto import ContextoRequisicaoMiddleware
+from app.core.server_timing import ServerTimingMiddleware, JSONResponseCronometrada
+from app.core.profiler import ProfilerMiddleware
+from app.core.monitor_loop import monitor_loop
+from app.database import (
+    connect_to_mongo, close_mongo_connection,
+    registrar_falha_conexao, retry_after_segundos, estado_conexao
+)
+from app.services.otimizacao_rotas import shutdown_executor
+from app.services.ingestao_frequencias import ingestor_frequencias
+from app.services.posicoes_veiculos import rastreador_posicoes
+from app.services.eventos_viagem import difusor_eventos
+from app.services.manifestos import preparador_manifestos
+from app.services.ocupacao_viagens import reconciliador_ocupacao
+from app.services.spool import replayer_spool, spool_rejeitados
 from app.routers import (
     router_aluno,
     router_motorista,
     router_veiculo,
     router_rota,
     router_viagem,
-    router_auth
+    router_auth,
+    router_frequencia,
+    router_admin,
+    router_eventos,
+    router_relatorio
 )
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    # Logs em JSON escritos por uma thread separada (não bloqueia o event loop)
+    configurar_logging()
+    monitor_loop.start()
     await connect_to_mongo()
+    await replayer_spool.start()
+    await spool_rejeitados.start()
+    ingestor_frequencias.start()
+    rastreador_posicoes.start()
+    await difusor_eventos.start()
+    preparador_manifestos.start()
+    reconciliador_ocupacao.start()
     yield
     # Shutdown
+    await reconciliador_ocupacao.stop()
+    await preparador_manifestos.stop()
+    await difusor_eventos.stop()
+    await rastreador_posicoes.stop()
+    await ingestor_frequencias.stop()
+    await spool_rejeitados.stop()
+    await replayer_spool.stop()
+    shutdown_executor()
     await close_mongo_connection()
+    await monitor_loop.stop()
+    encerrar_logging()
 
 # Criação da aplicação FastAPI
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     description=settings.DESCRIPTION,
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=JSONResponseCronometrada
 )
 
 # Configuração do CORS
@@ -38,6 +81,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Contexto da requisição (request id, endpoint, tempo no MongoDB) e log de acesso
+app.add_middleware(ContextoRequisicaoMiddleware)
+
+# Server-Timing por fase (opt-in via X-Server-Timing: 1 ou por amostragem)
+app.add_middleware(ServerTimingMiddleware)
+
+# Perfil da requisição sob demanda (X-Profile: 1 com token de administrador)
+app.add_middleware(ProfilerMiddleware)
+
+# Métricas de latência, requisições em andamento e erros por rota
+app.add_middleware(PrometheusMiddleware)
+
+# Falhas de conexão não tratadas viram 503 e alimentam o circuit breaker
+@app.exception_handler(ConnectionFailure)
+async def connection_failure_handler(request: Request, exc: ConnectionFailure):
+    registrar_falha_conexao(exc)
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Banco de dados temporariamente indisponível"},
+        headers={"Retry-After": str(retry_after_segundos())}
+    )
+
 # Inclusão dos routers
 app.include_router(router_auth.router, prefix=settings.API_V1_STR)
 app.include_router(router_aluno.router, prefix=settings.API_V1_STR)
@@ -45,6 +110,10 @@ app.include_router(router_motorista.router, prefix=settings.API_V1_STR)
 app.include_router(router_veiculo.router, prefix=settings.API_V1_STR)
 app.include_router(router_rota.router, prefix=settings.API_V1_STR)
 app.include_router(router_viagem.router, prefix=settings.API_V1_STR)
+app.include_router(router_frequencia.router, prefix=settings.API_V1_STR)
+app.include_router(router_admin.router, prefix=settings.API_V1_STR)
+app.include_router(router_eventos.router, prefix=settings.API_V1_STR)
+app.include_router(router_relatorio.router, prefix=settings.API_V1_STR)
 
 # Rota raiz da API
 @app.get(settings.API_V1_STR + "/")
@@ -61,6 +130,29 @@ async def root():
 async def health_check():
     return {"status": "healthy", "message": "API RotaFácil está funcionando"}
 
+# Liveness: o processo está respondendo (não depende do banco)
+@app.get(settings.API_V1_STR + "/health/live")
+async def liveness_check():
+    return {"status": "alive"}
+
+# Readiness: a instância pode receber tráfego (banco conectado, circuito fechado)
+@app.get(settings.API_V1_STR + "/health/ready")
+async def readiness_check():
+    estado = estado_conexao()
+    if not estado["conectado"]:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "not_ready", "mongodb": estado},
+            headers={"Retry-After": str(estado["retry_after"])}
+        )
+    return {"status": "ready", "mongodb": estado}
+
+# Métricas no formato texto do Prometheus
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    conteudo, content_type = gerar_metricas()
+    return Response(content=conteudo, media_type=content_type)
+
 # Rota raiz geral (redireciona para a API)
 @app.get("/")
 async def root_redirect():
@@ -79,5 +171,6 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         reload=True,
-        log_level="info"
+        log_level="info",
+        access_log=False
     ) 
\ No newline at end of file
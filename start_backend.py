@@ -5,8 +5,6 @@ Script para iniciar o backend RotaFácil com dados de exemplo
 
 import subprocess
 import sys
-import os
-import time
 from pathlib import Path
 
 def install_dependencies():
@@ -25,136 +23,9 @@ def create_sample_data():
     """Cria dados de exemplo no banco MongoDB"""
     print("🗄️ Criando dados de exemplo no MongoDB...")
     
-    # Script Python para inserir dados de exemplo no MongoDB
-    sample_data_script = """
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.abspath('.')))
-
-from app.database import get_database
-from app.services.crud_services import (
-    create_aluno, create_motorista, create_veiculo, 
-    create_rota, create_viagem
-)
-from app.models.pydantic_models import (
-    AlunoCreate, MotoristaCreate, VeiculoCreate, 
-    RotaCreate, ViagemCreate
-)
-
-async def create_sample_data():
-    db = get_database()
-    
-    # Criar alunos de exemplo
-    alunos_data = [
-        {
-            "nome_completo": "João Silva",
-            "email": "joao@email.com",
-            "senha": "test123",
-            "matricula": "2024001",
-            "telefone": "(11) 99999-1111"
-        },
-        {
-            "nome_completo": "Maria Santos",
-            "email": "maria@email.com",
-            "senha": "test123",
-            "matricula": "2024002",
-            "telefone": "(11) 99999-2222"
-        },
-        {
-            "nome_completo": "Pedro Oliveira",
-            "email": "pedro@email.com",
-            "senha": "test123",
-            "matricula": "2024003",
-            "telefone": "(11) 99999-3333"
-        }
-    ]
-    
-    # Criar motoristas de exemplo
-    motoristas_data = [
-        {
-            "nome_completo": "Carlos Motorista",
-            "email": "carlos@email.com",
-            "senha": "test123",
-            "cnh": "12345678901",
-            "data_admissao": "2024-01-15",
-            "status_ativo": True
-        },
-        {
-            "nome_completo": "Ana Condutora",
-            "email": "ana@email.com",
-            "senha": "test123",
-            "cnh": "98765432109",
-            "data_admissao": "2024-02-01",
-            "status_ativo": True
-        }
-    ]
-    
-    # Criar veículos de exemplo
-    veiculos_data = [
-        {
-            "placa": "ABC-1234",
-            "modelo": "Mercedes-Benz Sprinter",
-            "capacidade_passageiros": 15,
-            "status_manutencao": "Disponível",
-            "adaptado_pcd": False,
-            "ano_fabricacao": 2020
-        },
-        {
-            "placa": "DEF-5678",
-            "modelo": "Volkswagen Kombi",
-            "capacidade_passageiros": 12,
-            "status_manutencao": "Disponível",
-            "adaptado_pcd": True,
-            "ano_fabricacao": 2019
-        }
-    ]
-    
-    # Criar rotas de exemplo
-    rotas_data = [
-        {
-            "nome_rota": "Rota Centro - Manhã",
-            "descricao": "Rota do centro da cidade para o período matutino",
-            "turno": "Manhã",
-            "ativa": True
-        },
-        {
-            "nome_rota": "Rota Norte - Tarde",
-            "descricao": "Rota da zona norte para o período vespertino",
-            "turno": "Tarde",
-            "ativa": True
-        }
-    ]
-    
-    try:
-        # Inserir alunos
-        for aluno_data in alunos_data:
-            await create_aluno(AlunoCreate(**aluno_data))
-        
-        # Inserir motoristas
-        for motorista_data in motoristas_data:
-            await create_motorista(MotoristaCreate(**motorista_data))
-        
-        # Inserir veículos
-        for veiculo_data in veiculos_data:
-            await create_veiculo(VeiculoCreate(**veiculo_data))
-        
-        # Inserir rotas
-        for rota_data in rotas_data:
-            await create_rota(RotaCreate(**rota_data))
-        
-        print('Dados de exemplo criados com sucesso no MongoDB!')
-        
-    except Exception as e:
-        print(f'Erro ao criar dados de exemplo: {e}')
-
-# Executar a função
-import asyncio
-asyncio.run(create_sample_data())
-    """
-    
+    # Gerador determinístico: rodar de novo não duplica os dados
     try:
-        # Executar o script Python
-        subprocess.run([sys.executable, "-c", sample_data_script], check=True)
+        subprocess.run([sys.executable, "-m", "app.dados_sinteticos", "--escala", "exemplo"], check=True)
         print("✅ Dados de exemplo criados com sucesso!")
     except subprocess.CalledProcessError as e:
         print(f"❌ Erro ao criar dados de exemplo: {e}")
@@ -168,8 +39,8 @@ def start_server():
     print("📚 Documentação: http://localhost:8000/docs")
     print("🔧 ReDoc: http://localhost:8000/redoc")
     print("\n👥 Dados de exemplo criados:")
-    print("   Alunos: joao@email.com, maria@email.com, pedro@email.com")
-    print("   Motoristas: carlos@email.com, ana@email.com")
+    print("   Alunos: aluno0@escola1.rotafacil.dev ... aluno79@escola1.rotafacil.dev")
+    print("   Motoristas: motorista0@rotafacil.dev, motorista1@rotafacil.dev")
     print("   Senha para todos: test123")
     print("\n⏹️  Pressione Ctrl+C para parar o servidor")
     
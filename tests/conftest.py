@@ -0,0 +1,182 @@
+"""
+Dublês mínimos do Motor para testar os serviços sem um MongoDB.
+
+Cada coleção registra as chamadas recebidas; o comportamento de uma
+operação pode ser trocado atribuindo uma função ao atributo de mesmo
+nome (ex.: ``banco.frequencias.insert_many = falhar``). ``find`` e
+``aggregate`` aplicam os filtros com a igualdade do MongoDB (um
+``ObjectId`` não casa com a mesma referência gravada como string).
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+from pymongo import InsertOne
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+OPERADORES = {
+    "$in": lambda valor, lista: valor in lista,
+    "$nin": lambda valor, lista: valor not in lista,
+    "$ne": lambda valor, outro: valor != outro,
+    "$gt": lambda valor, limite: valor is not None and valor > limite,
+    "$gte": lambda valor, limite: valor is not None and valor >= limite,
+    "$lt": lambda valor, limite: valor is not None and valor < limite,
+    "$lte": lambda valor, limite: valor is not None and valor <= limite,
+    "$exists": lambda valor, existe: (valor is not None) == existe,
+}
+
+
+def casa(documento, filtro):
+    for campo, condicao in filtro.items():
+        valor = documento.get(campo)
+        if isinstance(condicao, dict) and condicao and all(c.startswith("$") for c in condicao):
+            if not all(OPERADORES[op](valor, alvo) for op, alvo in condicao.items()):
+                return False
+        elif valor != condicao:
+            return False
+    return True
+
+
+def _valor(documento, expressao):
+    if isinstance(expressao, dict):
+        return {chave: _valor(documento, e) for chave, e in expressao.items()}
+    if isinstance(expressao, str) and expressao.startswith("$"):
+        return documento.get(expressao[1:])
+    return expressao
+
+
+def agrupar(documentos, especificacao):
+    grupos = {}
+    for documento in documentos:
+        chave = _valor(documento, especificacao["_id"])
+        grupo = grupos.setdefault(repr(chave), {"_id": chave})
+        for campo, acumulador in especificacao.items():
+            if campo == "_id":
+                continue
+            [(operador, expressao)] = acumulador.items()
+            valor = _valor(documento, expressao)
+            if operador == "$sum":
+                grupo[campo] = grupo.get(campo, 0) + valor
+            elif operador == "$push":
+                grupo.setdefault(campo, []).append(valor)
+            elif operador == "$addToSet" and valor not in grupo.setdefault(campo, []):
+                grupo[campo].append(valor)
+    return list(grupos.values())
+
+
+class CursorFalso:
+    def __init__(self, documentos):
+        self._documentos = list(documentos)
+
+    def __aiter__(self):
+        return self._iterar()
+
+    async def _iterar(self):
+        for documento in self._documentos:
+            yield documento
+
+    async def to_list(self, length=None):
+        return list(self._documentos)
+
+    def sort(self, chave, direcao=1):
+        ordem = [(chave, direcao)] if isinstance(chave, str) else chave
+        for campo, sentido in reversed(ordem):
+            self._documentos.sort(key=lambda d: str(d.get(campo)), reverse=sentido == -1)
+        return self
+
+    def batch_size(self, tamanho):
+        return self
+
+    async def close(self):
+        pass
+
+
+class ColecaoFalsa:
+    def __init__(self, nome):
+        self.nome = nome
+        self.documentos = []
+        self.chamadas = []
+        self.indices = {}
+
+    async def insert_one(self, documento):
+        self.chamadas.append(("insert_one", documento))
+        self.documentos.append(documento)
+        return SimpleNamespace(inserted_id=documento["_id"])
+
+    async def insert_many(self, documentos, ordered=True):
+        self.chamadas.append(("insert_many", list(documentos)))
+        self.documentos.extend(documentos)
+        return SimpleNamespace(inserted_ids=[d["_id"] for d in documentos])
+
+    async def bulk_write(self, operacoes, ordered=True):
+        self.chamadas.append(("bulk_write", list(operacoes)))
+        for operacao in operacoes:
+            if isinstance(operacao, InsertOne):
+                self.documentos.append(operacao._doc)
+                continue
+            atualizacao = operacao._doc
+            documento = next((d for d in self.documentos if casa(d, operacao._filter)), None)
+            if documento is None:
+                if not operacao._upsert:
+                    continue
+                documento = {chave: valor for chave, valor in operacao._filter.items() if not isinstance(valor, dict)}
+                self.documentos.append(documento)
+            documento.update(atualizacao.get("$set", {}))
+            for campo, incremento in atualizacao.get("$inc", {}).items():
+                documento[campo] = documento.get(campo, 0) + incremento
+        return SimpleNamespace()
+
+    async def create_index(self, chaves, name=None, **opcoes):
+        self.chamadas.append(("create_index", name))
+        self.indices[name] = chaves
+        return name
+
+    async def index_information(self):
+        return dict(self.indices)
+
+    def find(self, filtro=None, projecao=None, **opcoes):
+        return CursorFalso(d for d in self.documentos if casa(d, filtro or {}))
+
+    async def find_one(self, filtro=None, projecao=None, **opcoes):
+        return next((d for d in self.documentos if casa(d, filtro or {})), None)
+
+    def aggregate(self, pipeline, **opcoes):
+        self.chamadas.append(("aggregate", pipeline))
+        documentos = list(self.documentos)
+        for estagio in pipeline:
+            [(operador, especificacao)] = estagio.items()
+            if operador == "$match":
+                documentos = [d for d in documentos if casa(d, especificacao)]
+            elif operador == "$group":
+                documentos = agrupar(documentos, especificacao)
+            elif operador == "$limit":
+                documentos = documentos[:especificacao]
+        return CursorFalso(documentos)
+
+    async def update_many(self, filtro, update):
+        self.chamadas.append(("update_many", filtro))
+        return SimpleNamespace(modified_count=0)
+
+    async def delete_many(self, filtro):
+        self.chamadas.append(("delete_many", filtro))
+        antes = len(self.documentos)
+        self.documentos = [d for d in self.documentos if not casa(d, filtro)]
+        return SimpleNamespace(deleted_count=antes - len(self.documentos))
+
+
+class BancoFalso:
+    def __init__(self):
+        self._colecoes = {}
+
+    def __getitem__(self, nome):
+        if nome not in self._colecoes:
+            self._colecoes[nome] = ColecaoFalsa(nome)
+        return self._colecoes[nome]
+
+    def __getattr__(self, nome):
+        if nome.startswith("_"):
+            raise AttributeError(nome)
+        return self[nome]
@@ -0,0 +1,61 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+from pymongo.errors import ServerSelectionTimeoutError
+
+from app import database
+from app.routers import router_aluno, router_rota
+from main import app
+
+
+class CrudIndisponivel:
+    db = None
+
+    async def create_aluno(self, aluno):
+        raise ServerSelectionTimeoutError("no servers found")
+
+    async def search_rotas(self, **filtros):
+        raise ServerSelectionTimeoutError("no servers found")
+
+
+def test_falha_de_conexao_chega_ao_circuit_breaker(monkeypatch):
+    monkeypatch.setattr(database.db, "falhas_consecutivas", 0)
+    monkeypatch.setattr(database.db, "is_connected", True)
+    app.dependency_overrides[router_aluno.get_crud_service] = CrudIndisponivel
+    app.dependency_overrides[router_rota.get_crud_service] = CrudIndisponivel
+    try:
+        cliente = TestClient(app)
+        resposta = cliente.post("/api/v1/alunos/", json={
+            "nome_completo": "Ana", "email": "ana@escola.com", "senha": "segredo", "matricula": "M1"
+        })
+        assert resposta.status_code == 503 and "Retry-After" in resposta.headers
+        resposta = cliente.get("/api/v1/rotas/ativas")
+        assert resposta.status_code == 503 and "Retry-After" in resposta.headers
+        assert database.db.falhas_consecutivas == 2
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_comando_bem_sucedido_zera_as_falhas(monkeypatch):
+    monkeypatch.setattr(database.db, "falhas_consecutivas", 0)
+    monkeypatch.setattr(database.db, "is_connected", True)
+    database.registrar_falha_conexao(ServerSelectionTimeoutError("no servers found"))
+    database.SucessoMongoListener().succeeded(None)
+    database.registrar_falha_conexao(ServerSelectionTimeoutError("no servers found"))
+    assert database.db.falhas_consecutivas == 1 and database.db.is_connected
+
+
+def test_migracoes_repetidas_enquanto_falharem(monkeypatch):
+    resultados = [False, True]
+    chamadas = []
+
+    async def run_migrations(banco):
+        chamadas.append(banco)
+        return resultados.pop(0)
+    monkeypatch.setattr(database, "run_migrations", run_migrations)
+    monkeypatch.setattr(database.db, "migrations_done", False)
+    monkeypatch.setattr(database.db, "is_connected", True)
+
+    for _ in range(3):
+        asyncio.run(database._marcar_conectado())
+    assert len(chamadas) == 2 and database.db.migrations_done
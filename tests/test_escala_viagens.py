@@ -0,0 +1,31 @@
+import asyncio
+from datetime import date
+
+from bson import ObjectId
+
+from app.models.pydantic_models import ViagemCreate
+from app.services.crud_services import CRUDService
+from app.services.escala_viagens import GeradorEscala
+
+from .conftest import BancoFalso
+
+
+def test_viagem_manual_com_rota_em_string_conta_como_existente():
+    banco = BancoFalso()
+    rota_id = ObjectId()
+    banco.viagens.documentos.append({"_id": ObjectId(), "rota_id": str(rota_id), "data_viagem": date(2026, 3, 2)})
+
+    existentes = asyncio.run(GeradorEscala(banco)._existentes([rota_id], date(2026, 3, 1), date(2026, 3, 31)))
+
+    assert existentes == {(rota_id, date(2026, 3, 2))}
+
+
+def test_viagem_criada_pela_api_grava_referencias_como_objectid():
+    banco = BancoFalso()
+    referencias = {"rota_id": ObjectId(), "motorista_id": ObjectId(), "veiculo_id": ObjectId()}
+    viagem = ViagemCreate(data_viagem=date(2026, 3, 2), **{c: str(v) for c, v in referencias.items()})
+
+    asyncio.run(CRUDService(banco).create_viagem(viagem))
+
+    [gravada] = banco.viagens.documentos
+    assert {campo: gravada[campo] for campo in referencias} == referencias
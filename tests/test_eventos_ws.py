@@ -0,0 +1,38 @@
+import asyncio
+
+from app.routers.router_eventos import assinar_eventos_ws
+from app.services.eventos_viagem import difusor_eventos
+
+
+class WebSocketFalso:
+    def __init__(self, falhar_accept: bool):
+        self.falhar_accept = falhar_accept
+        self.enviadas = []
+
+    async def accept(self):
+        if self.falhar_accept:
+            raise RuntimeError("conexão encerrada durante o handshake")
+
+    async def receive(self):
+        await asyncio.sleep(0.01)
+        return {"type": "websocket.disconnect"}
+
+    async def send_text(self, texto):
+        self.enviadas.append(texto)
+
+    async def close(self, code=1000, reason=None):
+        pass
+
+
+def test_assinatura_cancelada_se_o_handshake_falhar():
+    antes = difusor_eventos.total_assinantes
+    asyncio.run(assinar_eventos_ws(WebSocketFalso(falhar_accept=True), ["v1"], []))
+    assert difusor_eventos.total_assinantes == antes
+    assert "viagem:v1" not in difusor_eventos._canais
+
+
+def test_assinatura_cancelada_quando_o_cliente_desconecta():
+    antes = difusor_eventos.total_assinantes
+    asyncio.run(asyncio.wait_for(assinar_eventos_ws(WebSocketFalso(falhar_accept=False), [], ["r1"]), 5))
+    assert difusor_eventos.total_assinantes == antes
+    assert "rota:r1" not in difusor_eventos._canais
@@ -0,0 +1,109 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.exportacao_colunar import (
+    ConfiguracaoExportacao, _limites_mes, meses_entre, planejar,
+    exportar_frequencias, exportar_frequencias_reaplicadas, exportar_viagens_mes,
+)
+from app.services.spool import aplicar_registros
+
+from .conftest import BancoFalso
+
+
+class ColecaoSincrona:
+    """``find_one``/``aggregate`` do pymongo síncrono, com respostas fixas"""
+
+    def __init__(self, primeiro=None, ultimo=None, grupos=()):
+        self.primeiro, self.ultimo, self.grupos = primeiro, ultimo, list(grupos)
+        self.filtros = []
+
+    def find_one(self, filtro, projecao=None, sort=None):
+        self.filtros.append(filtro)
+        return self.ultimo if sort and sort[0][1] == -1 else self.primeiro
+
+    def aggregate(self, pipeline):
+        return iter(self.grupos)
+
+
+class BancoSincrono:
+    def __init__(self, viagens, frequencias):
+        self.viagens, self.frequencias = viagens, frequencias
+
+
+def _tarefas(tarefas, funcao):
+    return [argumentos for f, argumentos in tarefas if f is funcao]
+
+
+def test_limites_mes():
+    assert _limites_mes("2026-03") == (datetime(2026, 3, 1), datetime(2026, 4, 1))
+    assert _limites_mes("2025-12") == (datetime(2025, 12, 1), datetime(2026, 1, 1))
+
+
+def test_meses_entre():
+    assert meses_entre(datetime(2025, 11, 20), datetime(2026, 2, 3)) == ["2025-11", "2025-12", "2026-01", "2026-02"]
+    assert meses_entre(datetime(2026, 3, 31), datetime(2026, 3, 1)) == ["2026-03"]
+    assert meses_entre(datetime(2026, 4, 1), datetime(2026, 3, 31)) == []
+
+
+def test_planejar_primeira_execucao_exporta_tudo():
+    primeira_frequencia = ObjectId.from_datetime(datetime(2026, 1, 15))
+    banco = BancoSincrono(
+        ColecaoSincrona({"data_viagem": datetime(2025, 12, 1)}, {"data_viagem": datetime(2026, 2, 10)}),
+        ColecaoSincrona({"_id": primeira_frequencia}),
+    )
+    agora = datetime(2026, 3, 5)
+    limite = ObjectId.from_datetime(agora - timedelta(minutes=5))
+
+    tarefas = planejar(banco, ConfiguracaoExportacao(), {}, limite, agora)
+
+    assert _tarefas(tarefas, exportar_viagens_mes) == [("2025-12",), ("2026-01",), ("2026-02",)]
+    assert _tarefas(tarefas, exportar_frequencias) == [
+        (mes, None, str(limite)) for mes in ("2026-01", "2026-02", "2026-03")
+    ]
+    assert _tarefas(tarefas, exportar_frequencias_reaplicadas) == []
+
+
+def test_planejar_incremental_inclui_frequencias_reaplicadas():
+    marca_anterior = ObjectId.from_datetime(datetime(2026, 3, 1))
+    inicio_anterior = datetime(2026, 3, 1, 0, 5)
+    frequencias = ColecaoSincrona({"_id": ObjectId.from_datetime(datetime(2026, 2, 27))})
+    banco = BancoSincrono(ColecaoSincrona(grupos=[{"_id": "2026-05"}, {"_id": None}]), frequencias)
+    agora = datetime(2026, 3, 8)
+    limite = ObjectId.from_datetime(agora - timedelta(minutes=5))
+    marca = {"limite": str(marca_anterior), "inicio": inicio_anterior.isoformat()}
+
+    tarefas = planejar(banco, ConfiguracaoExportacao(meses_abertos=1), marca, limite, agora)
+
+    assert _tarefas(tarefas, exportar_viagens_mes) == [("2026-01",), ("2026-02",), ("2026-03",), ("2026-05",)]
+    assert _tarefas(tarefas, exportar_frequencias) == [("2026-03", str(marca_anterior), str(limite))]
+    assert _tarefas(tarefas, exportar_frequencias_reaplicadas) == [(str(marca_anterior), inicio_anterior, agora)]
+    assert frequencias.filtros[-1] == {
+        "reaplicado_em": {"$gte": inicio_anterior, "$lt": agora}, "_id": {"$lt": marca_anterior}
+    }
+
+
+def test_planejar_sem_reaplicadas_nao_cria_a_tarefa():
+    marca_anterior = ObjectId.from_datetime(datetime(2026, 3, 1))
+    banco = BancoSincrono(ColecaoSincrona(), ColecaoSincrona())
+    agora = datetime(2026, 3, 2)
+
+    # Marca antiga, sem "inicio": a janela começa no instante da própria marca
+    tarefas = planejar(banco, ConfiguracaoExportacao(), {"limite": str(marca_anterior)},
+                       ObjectId.from_datetime(agora), agora)
+
+    assert _tarefas(tarefas, exportar_frequencias_reaplicadas) == []
+    assert banco.frequencias.filtros[-1]["reaplicado_em"]["$gte"] == datetime(2026, 3, 1)
+
+
+def test_replay_do_spool_marca_as_frequencias_reaplicadas():
+    banco = BancoFalso()
+    documento = {"_id": ObjectId.from_datetime(datetime(2026, 2, 27)), "aluno_id": "a", "viagem_id": "v"}
+
+    antes = datetime.utcnow()
+    asyncio.run(aplicar_registros(banco, [{"colecao": "frequencias", "op": "insert", "documento": documento}]))
+
+    [gravado] = banco.frequencias.documentos
+    assert gravado["_id"] == documento["_id"] and gravado["reaplicado_em"] >= antes
+    assert "reaplicado_em" not in documento
@@ -0,0 +1,169 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, AutoReconnect
+
+from app.services import ingestao_frequencias as modulo
+from app.services.ingestao_frequencias import IngestorFrequencias
+from app.services.spool import SpoolDuravel
+
+from .conftest import BancoFalso
+
+
+def _evento(tipo="Embarque"):
+    return {"_id": ObjectId(), "aluno_id": str(ObjectId()), "viagem_id": str(ObjectId()), "tipo_registro": tipo}
+
+
+def _erro_lote(erros, inseridos=0):
+    return BulkWriteError({"writeErrors": erros, "nInserted": inseridos})
+
+
+@pytest.fixture
+def ambiente(tmp_path, monkeypatch):
+    banco = BancoFalso()
+    spool = SpoolDuravel(str(tmp_path), "eventos")
+    rejeitados = SpoolDuravel(str(tmp_path), "rejeitados")
+    spool._abrir()
+    rejeitados._abrir()
+    monkeypatch.setattr(modulo, "get_database", lambda: banco)
+    monkeypatch.setattr(modulo, "spool_eventos", spool)
+    monkeypatch.setattr(modulo, "spool_rejeitados", rejeitados)
+
+    ocupacao = []
+
+    async def registrar(database, documentos):
+        ocupacao.extend(documentos)
+    monkeypatch.setattr(modulo.contador_ocupacao, "registrar", registrar)
+    return banco, spool, rejeitados, ocupacao
+
+
+@pytest.fixture
+def publicados(monkeypatch):
+    frequencias = []
+
+    async def publicar_frequencias(documentos):
+        frequencias.extend(documentos)
+    monkeypatch.setattr(modulo.difusor_eventos, "publicar_frequencias", publicar_frequencias)
+    return frequencias
+
+
+def _registros(spool):
+    asyncio.run(spool.sincronizar())
+    return spool._ler(0, None)[0]
+
+
+def test_duplicatas_descartadas_e_demais_falhas_retidas(ambiente, publicados):
+    banco, spool, rejeitados, ocupacao = ambiente
+    lote = [_evento() for _ in range(4)]
+
+    async def insert_many(documentos, ordered=True):
+        raise _erro_lote([
+            {"index": 1, "code": 11000, "errmsg": "duplicate key"},
+            {"index": 2, "code": 121, "errmsg": "Document failed validation"},
+        ], inseridos=2)
+    banco.frequencias.insert_many = insert_many
+
+    ingestor = IngestorFrequencias(max_tentativas=3)
+    ingestor._pendentes = list(lote)
+    asyncio.run(ingestor._gravar())
+
+    assert ingestor._pendentes == [lote[2]]
+    assert ingestor.duplicados == 1 and ingestor.inseridos == 2
+    assert ocupacao == [lote[0], lote[3]]
+    assert publicados == [lote[0], lote[3]]
+    assert _registros(spool) == [] and _registros(rejeitados) == []
+
+
+def test_falha_persistente_vai_para_rejeitados(ambiente):
+    banco, spool, rejeitados, _ = ambiente
+    evento = _evento()
+
+    async def insert_many(documentos, ordered=True):
+        raise _erro_lote([{"index": 0, "code": 121, "errmsg": "Document failed validation"}])
+    banco.frequencias.insert_many = insert_many
+
+    ingestor = IngestorFrequencias(max_tentativas=3)
+    ingestor._pendentes = [evento]
+    for _ in range(3):
+        asyncio.run(ingestor._gravar())
+
+    assert ingestor._pendentes == [] and ingestor.rejeitados == 1
+    assert ingestor._tentativas == {}
+    [registro] = _registros(rejeitados)
+    assert registro["documento"]["_id"] == evento["_id"] and registro["codigo"] == 121
+    assert not spool.pendente
+
+
+def test_falha_de_conexao_vai_para_o_spool(ambiente, publicados):
+    banco, spool, _, _ = ambiente
+    lote = [_evento(), _evento("Desembarque")]
+
+    async def insert_many(documentos, ordered=True):
+        raise AutoReconnect("primário indisponível")
+    banco.frequencias.insert_many = insert_many
+
+    ingestor = IngestorFrequencias()
+    ingestor._pendentes = list(lote)
+    asyncio.run(ingestor._gravar())
+
+    assert ingestor._pendentes == []
+    assert [r["documento"]["_id"] for r in _registros(spool)] == [e["_id"] for e in lote]
+    assert spool.pendente
+    assert publicados == []
+
+
+def test_stop_envia_ao_spool_o_que_o_banco_recusou(ambiente):
+    banco, spool, _, _ = ambiente
+    evento = _evento()
+
+    async def insert_many(documentos, ordered=True):
+        raise _erro_lote([{"index": 0, "code": 50, "errmsg": "operation exceeded time limit"}])
+    banco.frequencias.insert_many = insert_many
+
+    async def cenario():
+        ingestor = IngestorFrequencias(intervalo_ms=10_000)
+        ingestor.start()
+        ingestor._fila.put_nowait(evento)
+        await asyncio.sleep(0)
+        await ingestor.stop()
+        return ingestor
+
+    ingestor = asyncio.run(cenario())
+    assert ingestor._pendentes == []
+    assert [r["documento"]["_id"] for r in _registros(spool)] == [evento["_id"]]
+
+
+def test_erro_desconhecido_envia_o_lote_ao_spool(ambiente):
+    banco, spool, _, ocupacao = ambiente
+    lote = [_evento(), _evento()]
+
+    async def insert_many(documentos, ordered=True):
+        raise ValueError("erro inesperado do driver")
+    banco.frequencias.insert_many = insert_many
+
+    ingestor = IngestorFrequencias()
+    ingestor._pendentes = list(lote)
+    asyncio.run(ingestor._gravar())
+
+    assert ingestor._pendentes == [] and ocupacao == []
+    assert [r["documento"]["_id"] for r in _registros(spool)] == [e["_id"] for e in lote]
+
+
+def test_lote_mantido_se_o_spool_falhar(ambiente, monkeypatch):
+    banco, spool, _, _ = ambiente
+    lote = [_evento()]
+
+    async def insert_many(documentos, ordered=True):
+        raise ValueError("erro inesperado do driver")
+    banco.frequencias.insert_many = insert_many
+
+    def escrever(dados):
+        raise OSError("disco cheio")
+    monkeypatch.setattr(spool, "_escrever", escrever)
+
+    ingestor = IngestorFrequencias(intervalo_ms=1)
+    ingestor._pendentes = list(lote)
+    asyncio.run(ingestor._gravar())
+
+    assert ingestor._pendentes == lote
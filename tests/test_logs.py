@@ -0,0 +1,22 @@
+import logging
+
+from app.core import logs
+
+
+def test_importar_main_nao_altera_o_logging():
+    antes = logging.getLogger().handlers[:]
+    import main  # noqa: F401
+    assert logging.getLogger().handlers == antes
+
+
+def test_configurar_e_encerrar_restaura_handlers():
+    raiz = logging.getLogger()
+    antes, nivel = raiz.handlers[:], raiz.level
+    logs.configurar_logging()
+    try:
+        assert [type(h) for h in raiz.handlers] == [logs.QueueHandlerSemBloqueio]
+        assert logging.getLogger("uvicorn.access").disabled
+    finally:
+        logs.encerrar_logging()
+    assert raiz.handlers == antes and raiz.level == nivel
+    assert not logging.getLogger("uvicorn.access").disabled
@@ -0,0 +1,71 @@
+import asyncio
+from datetime import date, timedelta
+
+from bson import ObjectId
+
+from app.services.manifestos import ManifestoService, _hash, _resumo_motorista
+
+from .conftest import BancoFalso
+
+
+def _motorista(banco):
+    motorista = {"_id": ObjectId(), "nome_completo": "Ana", "cnh": "123"}
+    banco.motoristas.documentos.append(motorista)
+    return motorista
+
+
+def test_construcao_periodica_mantem_manifesto_de_motorista_sem_viagens():
+    banco = BancoFalso()
+    motorista = _motorista(banco)
+    vazio = _hash({"motorista": _resumo_motorista(motorista), "viagens": []})
+    banco.manifestos.documentos.append({"motorista_id": motorista["_id"], "data": date.today(), "hash": vazio})
+
+    assert asyncio.run(ManifestoService(banco).construir(date.today())) == 0
+    assert banco.manifestos.chamadas == []
+
+
+def test_construcao_periodica_esvazia_manifesto_sem_viagens_e_remove_o_de_motorista_apagado():
+    banco = BancoFalso()
+    motorista = _motorista(banco)
+    removido = ObjectId()
+    banco.manifestos.documentos += [{"motorista_id": motorista["_id"], "data": date.today(), "hash": "antigo"},
+                                    {"motorista_id": removido, "data": date.today(), "hash": "antigo"}]
+
+    assert asyncio.run(ManifestoService(banco).construir(date.today())) == 1
+    [manifesto] = banco.manifestos.documentos
+    assert manifesto["motorista_id"] == motorista["_id"] and manifesto["viagens"] == []
+
+
+def test_viagens_e_frequencias_com_referencias_em_string():
+    """Viagens e frequências criadas pela API antiga guardam as referências como string"""
+    banco = BancoFalso()
+    hoje = date.today()
+    motorista = _motorista(banco)
+    rota = {"_id": ObjectId(), "nome_rota": "Centro", "turno": "Manhã", "pontos_de_parada": []}
+    veiculo = {"_id": ObjectId(), "placa": "ABC1D23", "modelo": "Micro", "capacidade_passageiros": 20,
+               "adaptado_pcd": False, "status_manutencao": "Disponível"}
+    aluno = {"_id": ObjectId(), "nome_completo": "Bia", "matricula": "M1"}
+    banco.rotas.documentos.append(rota)
+    banco.veiculos.documentos.append(veiculo)
+    banco.alunos.documentos.append(aluno)
+    referencias = {"rota_id": str(rota["_id"]), "motorista_id": str(motorista["_id"]),
+                   "veiculo_id": str(veiculo["_id"])}
+    ontem = {"_id": ObjectId(), "data_viagem": hoje - timedelta(days=1), "status": "Concluída", **referencias}
+    viagem = {"_id": ObjectId(), "data_viagem": hoje, "status": "Agendada", **referencias}
+    banco.viagens.documentos += [ontem, viagem]
+    banco.frequencias.documentos.append(
+        {"_id": ObjectId(), "aluno_id": str(aluno["_id"]), "viagem_id": str(ontem["_id"]), "tipo_registro": "Embarque"}
+    )
+    servico = ManifestoService(banco)
+
+    assert asyncio.run(servico.construir(hoje)) == 1
+    [manifesto] = banco.manifestos.documentos
+    [item] = manifesto["viagens"]
+    assert item["viagem_id"] == str(viagem["_id"])
+    assert item["rota"]["nome_rota"] == "Centro" and item["veiculo"]["placa"] == "ABC1D23"
+    assert [a["id"] for a in item["alunos_esperados"]] == [str(aluno["_id"])]
+
+    # Montagem sob demanda (obter / reconstruir_viagem) com o id do motorista em string
+    banco.manifestos.documentos.clear()
+    assert asyncio.run(servico.construir(hoje, [str(motorista["_id"])])) == 1
+    assert len(banco.manifestos.documentos[0]["viagens"]) == 1
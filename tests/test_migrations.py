@@ -0,0 +1,65 @@
+import asyncio
+import json
+
+from bson import ObjectId
+
+from app.migrations import run_migrations, deduplicar_frequencias, INDICES
+
+from .conftest import BancoFalso
+
+
+def _frequencia(_id, aluno_id="a", viagem_id="v", tipo_registro="embarque"):
+    return {"_id": _id, "aluno_id": aluno_id, "viagem_id": viagem_id, "tipo_registro": tipo_registro}
+
+
+def test_falha_de_um_indice_nao_interrompe_os_demais():
+    banco = BancoFalso()
+    criar = banco.frequencias.create_index
+
+    async def create_index(chaves, name=None, **opcoes):
+        if name == "aluno_viagem_tipo_unique":
+            raise RuntimeError("E11000 duplicate key")
+        return await criar(chaves, name=name, **opcoes)
+    banco.frequencias.create_index = create_index
+
+    assert asyncio.run(run_migrations(banco)) is False
+    criados = {nome for colecao, _, opcoes in INDICES for nome in [opcoes["name"]]
+               if nome in banco[colecao].indices}
+    assert criados == {opcoes["name"] for _, _, opcoes in INDICES} - {"aluno_viagem_tipo_unique"}
+    assert ("update_many", {"num_pontos": {"$exists": False}}) in banco.rotas.chamadas
+
+
+def test_migracoes_nao_removem_duplicatas_e_adiam_o_indice_unico():
+    banco = BancoFalso()
+    primeiro, segundo = sorted(ObjectId() for _ in range(2))
+    banco.frequencias.documentos = [_frequencia(primeiro), _frequencia(segundo)]
+
+    assert asyncio.run(run_migrations(banco)) is True
+    assert len(banco.frequencias.documentos) == 2
+    assert "aluno_viagem_tipo_unique" not in banco.frequencias.indices
+    assert "viagem_tipo" in banco.frequencias.indices
+
+
+def test_deduplicacao_mantem_o_primeiro_registro_e_grava_os_removidos(tmp_path):
+    banco = BancoFalso()
+    primeiro, segundo, terceiro = sorted(ObjectId() for _ in range(3))
+    outro = ObjectId()
+    banco.frequencias.documentos = [
+        _frequencia(terceiro), _frequencia(primeiro), _frequencia(outro, aluno_id="b"), _frequencia(segundo)
+    ]
+    caminho = tmp_path / "duplicadas.ndjson"
+
+    assert asyncio.run(deduplicar_frequencias(banco, str(caminho))) == 2
+    assert sorted(d["_id"] for d in banco.frequencias.documentos) == sorted([primeiro, outro])
+    removidas = [json.loads(linha) for linha in caminho.read_text().splitlines()]
+    assert sorted(r["_id"]["$oid"] for r in removidas) == sorted([str(segundo), str(terceiro)])
+
+    assert asyncio.run(run_migrations(banco)) is True
+    assert "aluno_viagem_tipo_unique" in banco.frequencias.indices
+
+
+def test_deduplicacao_ignorada_com_indice_unico_existente(tmp_path):
+    banco = BancoFalso()
+    banco.frequencias.indices["aluno_viagem_tipo_unique"] = []
+    assert asyncio.run(deduplicar_frequencias(banco, str(tmp_path / "duplicadas.ndjson"))) == 0
+    assert not [c for c in banco.frequencias.chamadas if c[0] == "aggregate"]
@@ -0,0 +1,42 @@
+import asyncio
+from datetime import date, timedelta
+
+from bson import ObjectId
+
+from app.services.ocupacao_viagens import ContadorOcupacao, ReconciliadorOcupacao
+
+from .conftest import BancoFalso, CursorFalso
+
+
+class ConsultaFalsa(CursorFalso):
+    async def to_list(self, length=None):
+        return list(self._documentos)
+
+
+def test_viagem_inexistente_nao_fica_em_cache():
+    banco = BancoFalso()
+    viagem = {"_id": ObjectId(), "rota_id": ObjectId(), "veiculo_id": ObjectId(), "data_viagem": date.today()}
+    existentes = []
+    banco.viagens.find = lambda filtro, projecao=None: ConsultaFalsa(
+        v for v in existentes if v["_id"] in filtro["_id"]["$in"])
+    banco.veiculos.find = lambda filtro, projecao=None: ConsultaFalsa([])
+    contador = ContadorOcupacao()
+
+    assert asyncio.run(contador._resolver(banco, [viagem["_id"]])) == {viagem["_id"]: None}
+    existentes.append(viagem)  # Criada depois das primeiras frequências
+    dados = asyncio.run(contador._resolver(banco, [viagem["_id"]]))[viagem["_id"]]
+    assert dados["data_viagem"] == viagem["data_viagem"]
+
+
+def test_reconciliacao_cobre_os_dias_anteriores(monkeypatch):
+    reconciliador = ReconciliadorOcupacao(ContadorOcupacao(), dias_anteriores=2)
+    dias = []
+
+    async def reconciliar(dia=None):
+        dias.append(dia)
+        return 1
+    monkeypatch.setattr(reconciliador, "reconciliar", reconciliar)
+
+    assert asyncio.run(reconciliador.reconciliar_janela()) == 3
+    hoje = date.today()
+    assert dias == [hoje, hoje - timedelta(days=1), hoje - timedelta(days=2)]
@@ -0,0 +1,53 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from app.models.pydantic_models import PosicaoGPS
+from app.services import posicoes_veiculos as modulo
+from app.services.posicoes_veiculos import RastreadorPosicoes, ViagemNaoRastreavel
+
+from .conftest import BancoFalso
+
+
+def _pontos(inicio, quantidade=2):
+    return [PosicaoGPS(lat=-3.1, lon=-60.0, data_hora=inicio + timedelta(minutes=i)) for i in range(quantidade)]
+
+
+def test_viagem_aceita_sem_banco_e_recusada_depois_e_descartada(monkeypatch):
+    banco = BancoFalso()
+    disponivel = []
+    monkeypatch.setattr(modulo, "get_database", lambda: banco if disponivel else None)
+    rastreador = RastreadorPosicoes(amostragem_trajeto_s=0)
+    viagem_id = str(ObjectId())
+    inicio = datetime(2026, 3, 2, 6, 30)
+
+    assert asyncio.run(rastreador.registrar(viagem_id, _pontos(inicio))) == (2, 0)
+    assert rastreador.ultima_posicao(viagem_id) is not None
+
+    disponivel.append(True)
+    asyncio.run(rastreador.persistir())
+    assert banco.trajetos.chamadas == []
+
+    with pytest.raises(ViagemNaoRastreavel):
+        asyncio.run(rastreador.registrar(viagem_id, _pontos(inicio + timedelta(minutes=5))))
+    assert rastreador.ultima_posicao(viagem_id) is None
+
+
+def test_viagem_aceita_sem_banco_e_confirmada_depois_grava_o_trajeto(monkeypatch):
+    banco = BancoFalso()
+    disponivel = []
+    monkeypatch.setattr(modulo, "get_database", lambda: banco if disponivel else None)
+    rastreador = RastreadorPosicoes(amostragem_trajeto_s=0)
+    viagem_id = ObjectId()
+    banco.viagens.documentos = [{"_id": viagem_id, "status": "Em Andamento"}]
+    inicio = datetime(2026, 3, 2, 6, 30)
+
+    asyncio.run(rastreador.registrar(str(viagem_id), _pontos(inicio)))
+    disponivel.append(True)
+    asyncio.run(rastreador.registrar(str(viagem_id), _pontos(inicio + timedelta(minutes=5))))
+    asyncio.run(rastreador.persistir())
+
+    [(_, operacoes)] = banco.trajetos.chamadas
+    assert sum(len(o._doc["$push"]["pontos"]["$each"]) for o in operacoes) == 4
@@ -0,0 +1,56 @@
+import asyncio
+from datetime import date
+
+from bson import ObjectId
+
+from app.services.relatorios import RelatorioFrequencia
+
+from .conftest import BancoFalso, CursorFalso
+
+
+class ConsultaFalsa(CursorFalso):
+    def sort(self, chave, direcao=None):
+        if isinstance(chave, str):
+            self._documentos.sort(key=lambda d: str(d[chave]))
+        return self
+
+    def batch_size(self, tamanho):
+        return self
+
+    async def close(self):
+        pass
+
+
+def _colecao(documentos, campo):
+    return lambda filtro, projecao=None: ConsultaFalsa(
+        d for d in documentos if d[campo] in filtro.get(campo, {}).get("$in", [d[campo]]))
+
+
+def test_linhas_em_ordem_de_data_dentro_do_bloco():
+    banco = BancoFalso()
+    rota = {"_id": ObjectId(), "nome_rota": "Centro", "turno": "Manhã"}
+    # _id da viagem mais antiga é maior: a ordem por _id não é a ordem de data
+    segunda, primeira = ObjectId(), ObjectId()
+    viagens = [
+        {"_id": primeira, "rota_id": rota["_id"], "data_viagem": date(2024, 3, 1)},
+        {"_id": segunda, "rota_id": str(rota["_id"]), "data_viagem": date(2024, 3, 2)},
+    ]
+    frequencias = [
+        {"aluno_id": str(ObjectId()), "viagem_id": str(segunda), "tipo_registro": "Embarque"},
+        {"aluno_id": str(ObjectId()), "viagem_id": primeira, "tipo_registro": "Embarque"},
+        {"aluno_id": str(ObjectId()), "viagem_id": str(primeira), "tipo_registro": "Desembarque"},
+    ]
+    banco.viagens.find = lambda filtro, projecao=None: ConsultaFalsa(viagens)
+    banco.frequencias.find = _colecao(frequencias, "viagem_id")
+    banco.rotas.find = _colecao([rota], "_id")
+    banco.alunos.find = _colecao([], "_id")
+
+    relatorio = RelatorioFrequencia(banco, date(2024, 3, 1), date(2024, 3, 2), tamanho_lote=2)
+
+    async def coletar():
+        return [linha async for lote in relatorio.lotes() for linha in lote]
+
+    linhas = asyncio.run(coletar())
+    assert [l["data_viagem"] for l in linhas] == ["2024-03-01", "2024-03-01", "2024-03-02"]
+    assert {l["nome_rota"] for l in linhas} == {"Centro"}
+    assert list(relatorio._rotas) == [rota["_id"]]
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.server_timing import (
+    JSONResponseCronometrada, RotaCronometrada, ServerTimingMiddleware
+)
+
+
+def _app():
+    router = APIRouter(route_class=RotaCronometrada)
+
+    async def dependencia():
+        return 1
+
+    @router.get("/itens/{item_id}")
+    async def obter_item(item_id: int, valor: int = Depends(dependencia)):
+        """Documentação preservada"""
+        return {"item_id": item_id, "valor": valor}
+
+    @router.get("/sincrono")
+    def sincrono():
+        return {"ok": True}
+
+    app = FastAPI(default_response_class=JSONResponseCronometrada)
+    app.include_router(router)
+    app.add_middleware(ServerTimingMiddleware)
+    return app
+
+
+def _fases(resposta):
+    return {parte.split(";")[0] for parte in resposta.headers["server-timing"].split(", ")}
+
+
+def test_fases_de_dependencias_e_resposta():
+    cliente = TestClient(_app())
+    for caminho in ("/itens/7", "/sincrono"):
+        resposta = cliente.get(caminho, headers={"X-Server-Timing": "1"})
+        assert resposta.status_code == 200
+        assert {"deps", "resposta", "json", "total"} <= _fases(resposta)
+    assert "server-timing" not in cliente.get("/itens/7").headers
+
+
+def test_validacao_com_erro_conta_como_deps():
+    resposta = TestClient(_app()).get("/itens/abc", headers={"X-Server-Timing": "1"})
+    assert resposta.status_code == 422
+    assert "deps" in _fases(resposta) and "resposta" not in _fases(resposta)
+
+
+def test_assinatura_do_endpoint_preservada():
+    esquema = TestClient(_app()).get("/openapi.json").json()
+    operacao = esquema["paths"]["/itens/{item_id}"]["get"]
+    assert operacao["description"] == "Documentação preservada"
+    assert [p["name"] for p in operacao["parameters"]] == ["item_id"]
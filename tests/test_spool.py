@@ -0,0 +1,115 @@
+import asyncio
+import os
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from app.services.spool import SpoolDuravel
+
+from .conftest import BancoFalso
+
+
+def _insert(documento):
+    return {"colecao": "frequencias", "op": "insert", "documento": documento}
+
+
+def test_anexar_so_retorna_depois_do_fsync(tmp_path):
+    async def cenario():
+        spool = SpoolDuravel(str(tmp_path), "eventos", intervalo_fsync_ms=100)
+        await spool.start()
+        anexando = asyncio.create_task(spool.anexar([_insert({"_id": ObjectId()})]))
+        await asyncio.sleep(0.02)
+        antes = (anexando.done(), os.path.getsize(spool.caminho))
+        await anexando
+        depois = os.path.getsize(spool.caminho)
+        await spool.stop()
+        return antes, depois
+
+    (concluido, tamanho_antes), tamanho_depois = asyncio.run(cenario())
+    assert not concluido and tamanho_antes == 0
+    assert tamanho_depois > 0
+
+
+def test_anexar_falha_se_o_disco_falhar(tmp_path, monkeypatch):
+    spool = SpoolDuravel(str(tmp_path), "eventos")
+    spool._abrir()
+
+    def escrever(dados):
+        raise OSError("disco cheio")
+    monkeypatch.setattr(spool, "_escrever", escrever)
+
+    async def cenario():
+        try:
+            await spool.anexar([_insert({"_id": ObjectId()})])
+        except OSError:
+            return True
+        return False
+
+    assert asyncio.run(cenario())
+
+
+def test_cauda_corrompida_descartada_na_abertura(tmp_path):
+    spool = SpoolDuravel(str(tmp_path), "eventos")
+    spool._abrir()
+    asyncio.run(spool.anexar([_insert({"_id": 1}), _insert({"_id": 2})]))
+    with open(spool.caminho, "ab") as arquivo:
+        arquivo.write(b"\x10\x00\x00\x00lixo")
+
+    reaberto = SpoolDuravel(str(tmp_path), "eventos")
+    reaberto._abrir()
+    registros, _ = reaberto._ler(0, None)
+    assert [r["documento"]["_id"] for r in registros] == [1, 2]
+    assert reaberto.pendente
+
+
+def test_drenar_reaplica_em_ordem_e_ignora_ja_aplicados(tmp_path):
+    spool = SpoolDuravel(str(tmp_path), "eventos")
+    spool._abrir()
+    documentos = [{"_id": i} for i in range(5)]
+    asyncio.run(spool.anexar([_insert(d) for d in documentos]))
+
+    banco = BancoFalso()
+    aplicados = []
+
+    async def bulk_write(operacoes, ordered=True):
+        for i, operacao in enumerate(operacoes):
+            if operacao._doc["_id"] == 1 and 1 not in aplicados:
+                # Registro 1 já estava no banco (checkpoint perdido em uma queda)
+                aplicados.append(1)
+                raise BulkWriteError({"writeErrors": [{"index": i, "code": 11000}], "nInserted": i})
+            aplicados.append(operacao._doc["_id"])
+    banco.frequencias.bulk_write = bulk_write
+
+    assert asyncio.run(spool.drenar(banco, tamanho_lote=2)) == 5
+    assert aplicados == [0, 1, 2, 3, 4]
+    assert not spool.pendente
+    assert os.path.getsize(spool.caminho) == 0 and spool._ler_checkpoint() == 0
+
+
+def test_registro_recusado_vai_para_rejeitados_e_nao_trava_o_spool(tmp_path, monkeypatch):
+    from app.services import spool as modulo
+
+    spool = SpoolDuravel(str(tmp_path), "eventos")
+    rejeitados = SpoolDuravel(str(tmp_path), "rejeitados")
+    spool._abrir()
+    rejeitados._abrir()
+    monkeypatch.setattr(modulo, "spool_rejeitados", rejeitados)
+    asyncio.run(spool.anexar([_insert({"_id": i}) for i in range(3)]))
+
+    banco = BancoFalso()
+    aplicados = []
+
+    async def bulk_write(operacoes, ordered=True):
+        for i, operacao in enumerate(operacoes):
+            if operacao._doc["_id"] == 1:
+                raise BulkWriteError({"writeErrors": [
+                    {"index": i, "code": 121, "errmsg": "Document failed validation"}
+                ], "nInserted": i})
+            aplicados.append(operacao._doc["_id"])
+    banco.frequencias.bulk_write = bulk_write
+
+    assert asyncio.run(spool.drenar(banco)) == 3
+    assert aplicados == [0, 2]
+    assert not spool.pendente
+    [registro] = rejeitados._ler(0, None)[0]
+    assert registro["documento"] == {"_id": 1} and registro["codigo"] == 121
@@ -0,0 +1,62 @@
+import asyncio
+from datetime import date
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.models.pydantic_models import ConflitoEscala, StatusViagem, Viagem, ViagemUpdate
+from app.routers import router_viagem
+
+from .conftest import BancoFalso
+
+
+class CrudFalso:
+    def __init__(self, viagem):
+        self.db = BancoFalso()
+        self.viagem = viagem
+        self.atualizada = False
+
+    async def get_viagem(self, viagem_id):
+        return self.viagem
+
+    async def update_viagem(self, viagem_id, update):
+        self.atualizada = True
+        return self.viagem.model_copy(update=update.model_dump(exclude_unset=True))
+
+
+@pytest.fixture
+def verificacoes(monkeypatch):
+    chamadas = []
+
+    async def verificar_viagem(database, viagem, ignorar=()):
+        chamadas.append(viagem)
+        return [ConflitoEscala(tipo="motorista já agendado", recurso_id=str(viagem["motorista_id"]),
+                               rota_id=str(viagem["rota_id"]), data_viagem=viagem["data_viagem"])]
+    monkeypatch.setattr(router_viagem, "verificar_viagem", verificar_viagem)
+    monkeypatch.setattr(router_viagem.ManifestoService, "atualizar_status",
+                        lambda self, viagem_id, status: asyncio.sleep(0))
+    monkeypatch.setattr(router_viagem.difusor_eventos, "publicar_status", lambda viagem: asyncio.sleep(0))
+    return chamadas
+
+
+def _viagem(status):
+    return Viagem(_id=ObjectId(), data_viagem=date.today(), status=status,
+                  rota_id=ObjectId(), motorista_id=ObjectId(), veiculo_id=ObjectId())
+
+
+def test_reativar_viagem_cancelada_confere_conflitos(verificacoes):
+    crud = CrudFalso(_viagem(StatusViagem.CANCELADA))
+    with pytest.raises(HTTPException) as erro:
+        asyncio.run(router_viagem.atualizar_viagem(
+            str(crud.viagem.id), ViagemUpdate(status=StatusViagem.AGENDADA), crud))
+    assert erro.value.status_code == 409
+    assert verificacoes[0]["status"] == StatusViagem.AGENDADA
+    assert not crud.atualizada
+
+
+def test_mudanca_de_status_de_viagem_ativa_nao_confere_conflitos(verificacoes):
+    crud = CrudFalso(_viagem(StatusViagem.AGENDADA))
+    asyncio.run(router_viagem.atualizar_viagem(
+        str(crud.viagem.id), ViagemUpdate(status=StatusViagem.EM_ANDAMENTO), crud))
+    assert verificacoes == [] and crud.atualizada